@@ -0,0 +1,65 @@
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+
+class CircuitBreaker:
+    """Circuit breaker for calls to an external service.
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail fast, once reset_timeout seconds pass a single trial call is let
+    through, and its result closes or re-opens the circuit."""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Returns the current state of the circuit"""
+        with self._lock:
+            return self._get_state()
+
+    def _get_state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def before_call(self) -> None:
+        """Checks that a call may be made, raises CircuitOpenError if not"""
+        with self._lock:
+            state = self._get_state()
+            if state == self.OPEN:
+                raise CircuitOpenError("Circuit is open")
+            if state == self.HALF_OPEN:
+                if self._trial_running:
+                    raise CircuitOpenError("Circuit is half open")
+                self._trial_running = True
+
+    def record_success(self) -> None:
+        """Closes the circuit and resets the failures count"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        """Counts a failure, opens the circuit when reaching the threshold
+        or when the trial call of a half open circuit failed"""
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or \
+                    self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
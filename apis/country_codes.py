@@ -0,0 +1,98 @@
+import functools
+import unicodedata
+import pycountry
+
+# OMDb country spellings which are not names or codes in pycountry,
+# mostly short names and countries that no longer exist
+OMDB_COUNTRY_ALIASES = {
+    "uk": "GB",
+    "uae": "AE",
+    "russia": "RU",
+    "brunei": "BN",
+    "the netherlands": "NL",
+    "the bahamas": "BS",
+    "the gambia": "GM",
+    "east timor": "TL",
+    "u.s. virgin islands": "VI",
+    "england": "GB",
+    "scotland": "GB",
+    "wales": "GB",
+    "northern ireland": "GB",
+    "west germany": "DE",
+    "east germany": "DE",
+    "soviet union": "RU",
+    "czechoslovakia": "CZ",
+    "yugoslavia": "RS",
+    "federal republic of yugoslavia": "RS",
+    "serbia and montenegro": "RS",
+    "kosovo": "XK",
+    "turkey": "TR",
+    "burma": "MM",
+    "swaziland": "SZ",
+    "cape verde": "CV",
+    "ivory coast": "CI",
+    "macedonia": "MK",
+    "republic of north macedonia": "MK",
+    "republic of macedonia": "MK",
+    "democratic republic of the congo": "CD",
+    "democratic republic of congo": "CD",
+    "the democratic republic of congo": "CD",
+    "republic of the congo": "CG",
+    "republic of congo": "CG",
+    "congo": "CG",
+    "occupied palestinian territory": "PS",
+    "palestine": "PS",
+    "palestinian territories": "PS",
+    "vatican": "VA",
+    "vatican city": "VA",
+    "holy see": "VA",
+    "micronesia": "FM",
+    "korea, south": "KR",
+    "korea, north": "KP",
+    "st. lucia": "LC",
+    "st. kitts and nevis": "KN",
+    "st. vincent and the grenadines": "VC",
+}
+
+
+def normalize_country_name(country_name: str) -> str:
+    """Returns country name casefolded and without accents"""
+    decomposed = unicodedata.normalize("NFKD", country_name.strip())
+    return "".join(char for char in decomposed
+                   if not unicodedata.combining(char)).casefold()
+
+
+@functools.lru_cache(maxsize=1)
+def get_country_index() -> dict:
+    """Returns a dict of normalized country name or code to alpha_2 code,
+    built once from pycountry names, official and common names,
+    codes and the OMDb spellings aliases"""
+    index = {}
+    for country in pycountry.countries:
+        for attribute in ("alpha_2", "alpha_3", "name",
+                          "official_name", "common_name"):
+            value = getattr(country, attribute, None)
+            if value:
+                index.setdefault(normalize_country_name(value),
+                                 country.alpha_2)
+    index.update(OMDB_COUNTRY_ALIASES)
+    return index
+
+
+@functools.lru_cache(maxsize=1024)
+def search_country_alpha_2(country_name: str):
+    """Returns alpha_2 code of the best pycountry fuzzy search match,
+    or None if nothing matches, results are memoized"""
+    try:
+        return pycountry.countries.search_fuzzy(country_name)[0].alpha_2
+    except LookupError:
+        return None
+
+
+def get_country_alpha_2(country_name: str):
+    """Returns alpha_2 code of a country name, looked up in the
+    precomputed index, falls back to fuzzy search if there is no match"""
+    alpha_2 = get_country_index().get(normalize_country_name(country_name))
+    if alpha_2 is None:
+        alpha_2 = search_country_alpha_2(country_name.strip())
+    return alpha_2
@@ -1,23 +1,106 @@
+import threading
 import requests
-import pycountry
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+from apis import country_codes
+from apis.circuit_breaker import CircuitBreaker, CircuitOpenError
+from apis.omdb_cache import get_omdb_cache
+from config import OMDB_API_URL, OMDB_API_KEY, OMDB_TIMEOUT, \
+    OMDB_POOL_SIZE, OMDB_MAX_RETRIES, OMDB_RETRY_BACKOFF, \
+    OMDB_BREAKER_FAILURES, OMDB_BREAKER_RESET_TIMEOUT
+
+
+class BreakerRetry(Retry):
+    """Retry which counts every failed attempt that is retried as a failure
+    of the circuit breaker, and stops retrying once the circuit opens.
+    The last failed attempt is counted by the caller, when the request
+    fails."""
+    def __init__(self, *args, breaker=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.breaker = self.breaker
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None,
+                  _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool,
+                                  _stacktrace)
+        self.breaker.record_failure()
+        if self.breaker.state != CircuitBreaker.CLOSED:
+            raise MaxRetryError(_pool, url, CircuitOpenError(
+                "Circuit opened while retrying"))
+        return retry
+
+
+def create_api_session(pool_size=OMDB_POOL_SIZE, max_retries=OMDB_MAX_RETRIES,
+                       backoff_factor=OMDB_RETRY_BACKOFF,
+                       breaker=None) -> requests.Session:
+    """Returns a keep-alive requests session with a connection pool,
+    retrying failed connections and 5xx responses with backoff.
+    If a circuit breaker is provided, failed retries count against it."""
+    retry_options = {"total": max_retries,
+                     "backoff_factor": backoff_factor,
+                     "status_forcelist": (500, 502, 503, 504),
+                     "allowed_methods": frozenset(["GET"]),
+                     "raise_on_status": False}
+    if breaker is None:
+        retry = Retry(**retry_options)
+    else:
+        retry = BreakerRetry(breaker=breaker, **retry_options)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                          max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
 class MovieAPIConnection:
     """Movie API request class, gets movie from the API request
-    and handles any errors."""
-    def __init__(self):
-        self._api_key = '292ab885'
-        self._api_ep = f'http://www.omdbapi.com/?apikey={self._api_key}&type=movie&t='
+    and handles any errors.
+    If a cache is provided, lookups are served from it when possible
+    and both found and not found results are stored in it.
+    Requests go through a pooled session, and a circuit breaker
+    makes lookups fail fast while the api is down."""
+    def __init__(self, cache=None, base_url=OMDB_API_URL,
+                 api_key=OMDB_API_KEY, session=None, breaker=None,
+                 timeout=OMDB_TIMEOUT):
+        self._api_key = api_key
+        self._api_ep = base_url
+        self._cache = cache
+        self._breaker = breaker or CircuitBreaker(OMDB_BREAKER_FAILURES,
+                                                  OMDB_BREAKER_RESET_TIMEOUT)
+        self._session = session or create_api_session(breaker=self._breaker)
+        self._timeout = timeout
 
     def get_movie_data(self, title: str, year) -> dict:
         """Gets a movie title and tries to fetch movie data from api.
         Returns a dict of extracted data, if there is an error the function
         returns a dict with "error" as key and the error as it's value"""
+        if self._cache is not None:
+            cached_data = self._cache.get(title, year)
+            if cached_data is not None:
+                return cached_data
+
         try:
             data = self.get_request_from_api(title, year)
-        except requests.exceptions.ConnectionError:
+        except CircuitOpenError:
+            return {'error': 'Movie service unavailable, try again later'}
+        except (requests.exceptions.RequestException, ValueError):
             return {'error': 'Connection error'}
 
+        movie_data = self.extract_movie_data(data)
+        if self._cache is not None:
+            self._cache.set(title, year, movie_data)
+        return movie_data
+
+    def extract_movie_data(self, data: dict) -> dict:
+        """Extracts the movie fields from api response json,
+        returns a dict with "error" key if the movie was not found"""
         if 'Error' in data:
             return {'error': 'Movie not found!'}
 
@@ -34,20 +117,47 @@ class MovieAPIConnection:
         }
 
     def get_request_from_api(self, title: str, year):
-        """Send a GET requests to API and returns response in json format"""
-        url = self._api_ep + title
+        """Send a GET requests to API and returns response in json format.
+        Connection errors, timeouts and server errors are counted
+        as failures by the circuit breaker, each failed retry too."""
+        params = {'apikey': self._api_key, 'type': 'movie', 't': title}
         if year:
-            url += f"&y={year}"
-        response = requests.get(url, timeout=3)
-        return response.json()
+            params['y'] = year
+
+        self._breaker.before_call()
+        try:
+            response = self._session.get(self._api_ep, params=params,
+                                         timeout=self._timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError):
+            self._breaker.record_failure()
+            raise
+        self._breaker.record_success()
+        return data
 
     @staticmethod
     def get_country_alpha_2(country_name: str) -> str:
         """Takes countries names from api response, and returns
-        the 2-letter code of the first country
+        the 2-letter code of the first country, or None if unknown
         """
+        if not country_name:
+            return None
         if ',' in country_name:
             countries_list = country_name.split(',')
             country_name = countries_list[0].strip()
-        country = pycountry.countries.search_fuzzy(country_name)
-        return country[0].alpha_2
+        return country_codes.get_country_alpha_2(country_name)
+
+
+_shared_connection = None
+_shared_connection_lock = threading.Lock()
+
+
+def get_movie_api_connection() -> MovieAPIConnection:
+    """Returns the process wide api connection, sharing its cache,
+    connection pool and circuit breaker between all requests"""
+    global _shared_connection
+    with _shared_connection_lock:
+        if _shared_connection is None:
+            _shared_connection = MovieAPIConnection(cache=get_omdb_cache())
+        return _shared_connection
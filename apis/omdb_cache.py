@@ -0,0 +1,166 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from apis.utils import normalize_title
+from config import get_omdb_cache_path, OMDB_CACHE_TTL, \
+    OMDB_CACHE_NEGATIVE_TTL, OMDB_CACHE_MAX_ENTRIES, OMDB_CACHE_EVICT_TO, \
+    OMDB_CACHE_ACCESS_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class OmdbResponseCache:
+    """Persistent cache of OMDb lookups, stored in a local sqlite file.
+    Keeps both found movies and "not found" results, keyed by
+    the normalized title and year of the request.
+    Database errors, like a file locked by another process, make
+    lookups a miss and skip storing, the api is asked instead."""
+    def __init__(self, path, ttl=OMDB_CACHE_TTL,
+                 negative_ttl=OMDB_CACHE_NEGATIVE_TTL,
+                 max_entries=OMDB_CACHE_MAX_ENTRIES,
+                 access_interval=OMDB_CACHE_ACCESS_INTERVAL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.access_interval = access_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False,
+                                           isolation_level=None)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS omdb_cache (
+                title_key TEXT NOT NULL,
+                year_key TEXT NOT NULL,
+                data TEXT NOT NULL,
+                is_error INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (title_key, year_key)
+            );
+            CREATE INDEX IF NOT EXISTS ix_omdb_cache_accessed_at
+                ON omdb_cache (accessed_at);
+        """)
+        # Upper bound of the entries count, other processes can add
+        # entries too, so it is counted again before evicting
+        self._size = self._count()
+
+    @staticmethod
+    def make_key(title: str, year) -> tuple:
+        """Returns the cache key of a lookup, (normalized title, year)"""
+        return normalize_title(title), str(year).strip() if year else ""
+
+    def get(self, title: str, year):
+        """Returns the cached lookup result dict,
+        or None if it is not cached or has expired"""
+        key = self.make_key(title, year)
+        now = time.time()
+        with self._lock:
+            try:
+                data = self._get(key, now)
+            except sqlite3.Error:
+                logger.warning("OMDb cache lookup failed", exc_info=True)
+                data = None
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(data)
+
+    def _get(self, key, now):
+        """Returns the cached data of key, None if it is not cached or
+        has expired. Updates the access time once per access interval."""
+        row = self._connection.execute(
+            "SELECT data, is_error, stored_at, accessed_at FROM omdb_cache "
+            "WHERE title_key = ? AND year_key = ?", key).fetchone()
+        if row is None:
+            return None
+
+        data, is_error, stored_at, accessed_at = row
+        ttl = self.negative_ttl if is_error else self.ttl
+        if now - stored_at > ttl:
+            self._connection.execute(
+                "DELETE FROM omdb_cache "
+                "WHERE title_key = ? AND year_key = ?", key)
+            return None
+
+        if now - accessed_at > self.access_interval:
+            self._connection.execute(
+                "UPDATE omdb_cache SET accessed_at = ? "
+                "WHERE title_key = ? AND year_key = ?", (now, *key))
+        return data
+
+    def set(self, title: str, year, result: dict) -> None:
+        """Stores a lookup result dict, results with "error" key
+        are stored as negative results with the shorter ttl.
+        Evicts the least recently used entries above max_entries."""
+        key = self.make_key(title, year)
+        now = time.time()
+        with self._lock:
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO omdb_cache (title_key, year_key, "
+                    "data, is_error, stored_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, json.dumps(result), int('error' in result),
+                     now, now))
+                self._size += 1
+                if self._size > self.max_entries:
+                    self._evict()
+            except sqlite3.Error:
+                logger.warning("OMDb cache store failed", exc_info=True)
+
+    def _count(self) -> int:
+        """Returns the number of cached entries"""
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM omdb_cache").fetchone()[0]
+
+    def _evict(self) -> None:
+        """Removes the least recently used entries if there are more than
+        max_entries, keeping a fraction of max_entries"""
+        self._size = self._count()
+        if self._size <= self.max_entries:
+            return
+        keep = int(self.max_entries * OMDB_CACHE_EVICT_TO)
+        evicted = self._connection.execute(
+            "DELETE FROM omdb_cache WHERE rowid IN ("
+            "SELECT rowid FROM omdb_cache ORDER BY accessed_at DESC "
+            "LIMIT -1 OFFSET ?)", (keep,)).rowcount
+        self.evictions += evicted
+        self._size -= evicted
+
+    def clear(self) -> None:
+        """Removes all cached entries"""
+        with self._lock:
+            self._connection.execute("DELETE FROM omdb_cache")
+            self._size = 0
+
+    def stats(self) -> dict:
+        """Returns cache counters and current size"""
+        with self._lock:
+            size = self._count()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'size': size,
+            'max_entries': self.max_entries
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_omdb_cache() -> OmdbResponseCache:
+    """Returns the process wide OMDb cache, created on first use"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = OmdbResponseCache(get_omdb_cache_path())
+        return _default_cache
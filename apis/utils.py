@@ -0,0 +1,4 @@
+def normalize_title(title: str) -> str:
+    """Returns a normalized form of a movie title for lookups,
+    collapses whitespace and folds case"""
+    return " ".join(title.split()).casefold()
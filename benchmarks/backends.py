@@ -0,0 +1,129 @@
+"""Drivers of the data manager backends, running the same operations
+on every backend by hiding the differences of their methods.
+Used by the conformance tests and the backends benchmark."""
+import os
+import tempfile
+from data_manager.passwords import hash_password, password_hasher
+from data_manager.registry import create_data_manager
+from benchmarks.utils import load_app, SEED_PASSWORD
+
+# Backends are compared on storage, not on password hashing
+DRIVER_BCRYPT_ROUNDS = 4
+
+
+class SqliteBackendDriver:
+    """Runs operations on SqliteDataManager, in an app context
+    of a new empty database"""
+    def __init__(self, data_dir=None):
+        password_hasher.configure(max_workers=0, rounds=DRIVER_BCRYPT_ROUNDS)
+        self.app, self.db = load_app(data_dir)
+        self._context = self.app.app_context()
+        self._context.push()
+        self.db.drop_all()
+        self.db.create_all()
+        self.dm = create_data_manager("sqlite")
+
+    def register(self, index) -> int:
+        """Adds a user, returns its id"""
+        return self.dm.add_user({
+            "name": f"User {index}", "email": f"user{index}@example.com",
+            "password": SEED_PASSWORD, "repeat_password": SEED_PASSWORD}).id
+
+    def add_movie(self, user_id, title) -> int:
+        """Adds a favorite movie to user, returns the movie id"""
+        return self.dm.add_user_movie(user_id, {"title": title}).id
+
+    def review(self, user_id, movie_id, rating, text) -> None:
+        """Adds or updates the user review of a movie"""
+        self.dm.add_movie_review(user_id, movie_id, {
+            "review_rating": rating, "review_text": text, "short_note": ""})
+
+    def list_movies(self, user_id) -> list:
+        """Returns user movies as dicts of id, name and review rating"""
+        return [{"id": movie.id, "name": movie.name,
+                 "rating": review.rating if review else None}
+                for _, movie, review in self.dm.get_user_movies(user_id)]
+
+    def list_users(self) -> list:
+        """Returns the ids of all users"""
+        from data_manager.dm_sqlite import User
+        return [user.id for user in self.dm.get_all_entries_db(User)]
+
+    def delete_movie(self, user_id, movie_id) -> None:
+        """Deletes a favorite movie of user"""
+        self.dm.delete_user_movie(user_id, movie_id)
+
+    def delete_user(self, user_id) -> None:
+        """Deletes a user"""
+        self.dm.delete_user(user_id)
+
+    def close(self) -> None:
+        """Releases the app context"""
+        self.db.session.remove()
+        self._context.pop()
+
+
+class JsonBackendDriver:
+    """Runs operations on JSONDataManager, on a new data file.
+    Movies are looked up with the shared api connection, like
+    SqliteDataManager does for movies it doesn't have."""
+    def __init__(self, data_dir=None):
+        from apis.omdb_api import get_movie_api_connection
+        data_dir = data_dir or tempfile.mkdtemp(prefix="movieweb-bench-")
+        self.dm = create_data_manager(
+            "json", filename=os.path.join(data_dir, "data.json"))
+        self.dm.save_data([])
+        self.api = get_movie_api_connection()
+
+    def register(self, index) -> int:
+        """Adds a user, returns its id"""
+        user_id = self.dm.get_new_id_for()
+        self.dm.add_user({
+            "id": user_id, "name": f"User {index}",
+            "email": f"user{index}@example.com",
+            "hashed_password": hash_password(
+                SEED_PASSWORD, DRIVER_BCRYPT_ROUNDS).decode(),
+            "movies": []})
+        return user_id
+
+    def add_movie(self, user_id, title) -> int:
+        """Adds a favorite movie to user, returns the movie id"""
+        movie_data = self.api.get_movie_data(title, None)
+        if 'error' in movie_data:
+            raise ValueError(movie_data['error'])
+        movie_id = self.dm.get_new_id_for(user_id)
+        self.dm.add_user_movie(user_id, {"id": movie_id, **movie_data})
+        return movie_id
+
+    def review(self, user_id, movie_id, rating, text) -> None:
+        """Adds or updates the user review of a movie"""
+        self.dm.update_user_movie(user_id, movie_id, {
+            "review_rating": float(rating), "note": text})
+
+    def list_movies(self, user_id) -> list:
+        """Returns user movies as dicts of id, name and review rating"""
+        return [{"id": movie["id"], "name": movie["name"],
+                 "rating": movie.get("review_rating")}
+                for movie in self.dm.get_user_movies(user_id)]
+
+    def list_users(self) -> list:
+        """Returns the ids of all users"""
+        return [user["id"] for user in self.dm.get_all_users()]
+
+    def delete_movie(self, user_id, movie_id) -> None:
+        """Deletes a favorite movie of user"""
+        self.dm.delete_user_movie(user_id, movie_id)
+
+    def delete_user(self, user_id) -> None:
+        """Deletes a user"""
+        self.dm.delete_user(user_id)
+
+    def close(self) -> None:
+        """Nothing to release, changes are already in the log"""
+
+
+# Driver of every backend registered in data_manager.registry
+BACKEND_DRIVERS = {
+    "sqlite": SqliteBackendDriver,
+    "json": JsonBackendDriver
+}
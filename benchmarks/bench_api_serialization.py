@@ -0,0 +1,92 @@
+"""Response time of the /api/users and /api/user/<id> endpoints, against
+the previous serialization of loading ORM entries and calling jsonify.
+
+Every size seeds a new database with that many users, and one user
+with that many favorite movies.
+
+Run:
+    python -m benchmarks.bench_api_serialization --sizes 10000 100000
+"""
+import argparse
+from flask import jsonify
+from benchmarks.utils import load_app, seed_database, timed
+
+
+def seed_favorites(db, user_id, movies_count, chunk_size=5000):
+    """Adds the first movies_count movies to user favorites"""
+    from my_app.models.data_models import UserMovies
+    for start in range(0, movies_count, chunk_size):
+        db.session.execute(UserMovies.__table__.insert(), [
+            {"user_id": user_id, "movie_id": movie_id}
+            for movie_id in range(start + 1,
+                                  min(start + chunk_size, movies_count) + 1)])
+    db.session.commit()
+
+
+def orm_users_response(dm):
+    """The previous /api/users response, entries serialized one by one"""
+    from data_manager.dm_sqlite import User
+    from my_app.api.routes import serialize_user_object
+    return jsonify([serialize_user_object(user)
+                    for user in dm.get_all_entries_db(User)]).get_data()
+
+
+def orm_user_movies_response(dm, user_id):
+    """The previous /api/user/<id> response"""
+    from my_app.api.routes import serialize_movie_object
+    return jsonify([serialize_movie_object(movie) for _, movie, __
+                    in dm.get_user_movies(user_id)]).get_data()
+
+
+def get_response(client, url):
+    """Requests url and consumes the whole, maybe streamed, body"""
+    return client.get(url).get_data()
+
+
+def run_size(size, repeat):
+    """Seeds a database of size rows, returns the best timings in ms"""
+    app, db = load_app()
+    from data_manager.dm_sqlite import SqliteDataManager
+    from my_app.api.serializers import json_encoder
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed_database(db, size, size)
+        seed_favorites(db, 1, size)
+        dm = SqliteDataManager(db.session)
+        client = app.test_client()
+
+        cases = {
+            "orm users": lambda: orm_users_response(dm),
+            "api users": lambda: get_response(client, "/api/users"),
+            "orm user movies": lambda: orm_user_movies_response(dm, 1),
+            "api user movies": lambda: get_response(client, "/api/user/1")
+        }
+        results = {}
+        for name, case in cases.items():
+            timings = []
+            for _ in range(repeat):
+                body, elapsed = timed(case)
+                db.session.expire_all()
+                timings.append(elapsed)
+            results[name] = (min(timings) * 1000, len(body))
+
+    print(f"{size} rows, encoder {json_encoder.__module__}")
+    for name, (elapsed_ms, body_size) in results.items():
+        print(f"  {name:16} {elapsed_ms:10.1f} ms {body_size:12} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run_size(size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Throughput and latency of the same workload on every data manager
+backend: register users, add movies, review, list, and delete.
+
+Movies are looked up on the local OMDb stub server through the response
+cache, each user adds the same titles, so only the first user of each
+backend waits for api lookups.
+
+Run:
+    python -m benchmarks.bench_backends --users 200 --movies 5
+"""
+import argparse
+import time
+from data_manager.registry import get_backend_names
+from benchmarks.backends import BACKEND_DRIVERS
+from benchmarks.utils import use_stub_api, summarize
+
+OPERATIONS = ["register", "add_movie", "review", "list_movies",
+              "delete_movie", "delete_user"]
+
+
+def run_workload(driver, users_count, movies_count) -> dict:
+    """Runs the workload, returns the latencies of every operation"""
+    latencies = {operation: [] for operation in OPERATIONS}
+
+    def timed_call(operation, *args):
+        start = time.perf_counter()
+        result = getattr(driver, operation)(*args)
+        latencies[operation].append(time.perf_counter() - start)
+        return result
+
+    for index in range(users_count):
+        user_id = timed_call("register", index)
+        movie_ids = [timed_call("add_movie", user_id, f"Workload Film {number}")
+                     for number in range(movies_count)]
+        for number, movie_id in enumerate(movie_ids):
+            timed_call("review", user_id, movie_id, number % 10 + 1, "Good")
+        timed_call("list_movies", user_id)
+        timed_call("delete_movie", user_id, movie_ids[0])
+        if index % 2:
+            timed_call("delete_user", user_id)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("backends", nargs="*", default=get_backend_names())
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--movies", type=int, default=5)
+    args = parser.parse_args()
+
+    server = use_stub_api()
+    try:
+        for backend_name in args.backends:
+            driver = BACKEND_DRIVERS[backend_name]()
+            start = time.perf_counter()
+            try:
+                latencies = run_workload(driver, args.users, args.movies)
+            finally:
+                driver.close()
+            elapsed = time.perf_counter() - start
+
+            count = sum(len(values) for values in latencies.values())
+            print(f"{backend_name}: {count} operations, "
+                  f"{count / elapsed:.1f} ops/s")
+            for operation, values in latencies.items():
+                stats = summarize(values)
+                print(f"  {operation:13} {stats['ops_per_sec']:10.1f} ops/s  "
+                      f"p50 {stats['p50_ms']:8.3f} ms  "
+                      f"p99 {stats['p99_ms']:8.3f} ms")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Micro-benchmark of country name to alpha_2 lookup,
+the precomputed index against pycountry fuzzy search.
+
+Run:
+    python -m benchmarks.bench_country_lookup --rounds 20
+"""
+import argparse
+import time
+import pycountry
+from apis import country_codes
+
+OMDB_COUNTRIES = [
+    "United States", "United Kingdom", "France", "Germany", "Japan",
+    "Italy", "Canada", "South Korea", "India", "Spain", "USA", "UK",
+    "West Germany", "Soviet Union", "Russia", "Iran", "Czech Republic",
+    "Hong Kong", "Taiwan", "Mexico", "Brazil", "Australia", "China",
+    "Sweden", "Denmark", "Turkey", "Ireland", "New Zealand", "Argentina",
+    "Netherlands"
+]
+
+
+def fuzzy_lookup(country_name):
+    """The previous lookup, pycountry fuzzy search on every call"""
+    try:
+        return pycountry.countries.search_fuzzy(country_name)[0].alpha_2
+    except LookupError:
+        return None
+
+
+def time_lookups(lookup, names, rounds):
+    """Returns the mean seconds per lookup over all rounds"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for name in names:
+            lookup(name)
+    return (time.perf_counter() - start) / (rounds * len(names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    country_codes.get_country_index()
+    build_time = time.perf_counter() - start
+
+    fuzzy = time_lookups(fuzzy_lookup, OMDB_COUNTRIES, args.rounds)
+    indexed = time_lookups(country_codes.get_country_alpha_2,
+                           OMDB_COUNTRIES, args.rounds * 100)
+
+    print(f"index build (once):  {build_time * 1000:10.3f} ms")
+    print(f"fuzzy search:        {fuzzy * 1e6:10.1f} us/lookup")
+    print(f"precomputed index:   {indexed * 1e6:10.1f} us/lookup")
+    print(f"speedup:             {fuzzy / indexed:10.0f}x")
+
+    for name in OMDB_COUNTRIES:
+        fuzzy_code = fuzzy_lookup(name)
+        index_code = country_codes.get_country_alpha_2(name)
+        if fuzzy_code != index_code:
+            print(f"differs: {name!r} fuzzy={fuzzy_code} index={index_code}")
+
+
+if __name__ == "__main__":
+    main()
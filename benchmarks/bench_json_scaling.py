@@ -0,0 +1,89 @@
+"""Per operation latency of JSONDataManager as the number of users grows.
+
+Every size writes a data file of that many users, with one movie each,
+then adds, reads, updates and deletes users and movies. Log compactions
+rewrite the whole data file, they are counted in p99 and reported apart.
+
+Run:
+    python -m benchmarks.bench_json_scaling --sizes 100 1000 10000 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+from benchmarks.utils import summarize
+
+
+def generate_users(users_count) -> list:
+    """Returns users_count user dicts in the data file format"""
+    return [{"id": user_id, "name": f"User {user_id}",
+             "email": f"user{user_id}@example.com", "hashed_password": "",
+             "movies": [{"id": 1, "name": f"Movie {user_id}",
+                         "year": "2000", "rating": "7.0"}]}
+            for user_id in range(1, users_count + 1)]
+
+
+def run_operations(dm, users_count, operations) -> dict:
+    """Runs each operation operations times, returns their latencies"""
+    latencies = {"add_user": [], "get_user": [], "add_movie": [],
+                 "update_movie": [], "delete_movie": [], "delete_user": []}
+
+    def timed_call(name, function, *args):
+        start = time.perf_counter()
+        function(*args)
+        latencies[name].append(time.perf_counter() - start)
+
+    new_ids = []
+    for index in range(operations):
+        user_id = dm.get_new_id_for()
+        new_ids.append(user_id)
+        timed_call("add_user", dm.add_user, {
+            "id": user_id, "name": "New", "email": f"new{index}@example.com",
+            "hashed_password": "", "movies": []})
+        timed_call("get_user", dm.get_user_by_key,
+                   index * 7919 % users_count + 1)
+        movie = {"id": dm.get_new_id_for(user_id), "name": "Added"}
+        timed_call("add_movie", dm.add_user_movie, user_id, movie)
+        timed_call("update_movie", dm.update_user_movie, user_id,
+                   movie["id"], {"rating": "8.0"})
+        timed_call("delete_movie", dm.delete_user_movie, user_id,
+                   movie["id"])
+    for user_id in new_ids:
+        timed_call("delete_user", dm.delete_user, user_id)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[100, 1000, 10000, 100000])
+    parser.add_argument("--operations", type=int, default=500)
+    args = parser.parse_args()
+
+    from data_manager.dm_json import JSONDataManager
+    for size in args.sizes:
+        filename = os.path.join(tempfile.mkdtemp(prefix="movieweb-bench-"),
+                                "data.json")
+        dm = JSONDataManager(filename)
+        dm.save_data(generate_users(size))
+
+        compactions = []
+        compact = dm.compact
+
+        def timed_compact():
+            start = time.perf_counter()
+            compact()
+            compactions.append(time.perf_counter() - start)
+        dm.compact = timed_compact
+
+        latencies = run_operations(dm, size, args.operations)
+        print(f"{size} users, {len(compactions)} compactions of "
+              f"{summarize(compactions)['mean_ms']} ms")
+        for name, values in latencies.items():
+            stats = summarize(values)
+            print(f"  {name:13} p50 {stats['p50_ms'] * 1000:8.1f} us  "
+                  f"p99 {stats['p99_ms'] * 1000:10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
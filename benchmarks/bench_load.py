@@ -0,0 +1,351 @@
+"""Load test of the web app over http, with concurrent clients
+driving a weighted mix of browsing, writes and api requests.
+
+Seeds --users users, each with --favorites favorite movies out of
+--movies movies, serves the app on a local threaded server with the
+OMDb api replaced by the local stub, then runs --clients clients for
+--duration seconds. Every client logs in as its own seeded user and
+picks its next request from the mix with a seeded random generator,
+so runs with the same arguments make the same requests.
+
+Reports throughput and latency percentiles per endpoint, results can
+be saved as json and compared with a previous run.
+
+Run:
+    python -m benchmarks.bench_load --clients 8 --duration 20 \\
+        --mix mixed --output load.json
+    python -m benchmarks.bench_load --compare load.json
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from werkzeug.serving import make_server
+from benchmarks.utils import load_app, seed_database, summarize, \
+    use_stub_api, SEED_PASSWORD
+
+SEARCH_WORDS = ["drama", "comedy", "thriller", "france", "japan",
+                "director 1", "seed movie 4", "sci", "mov"]
+
+# Request mixes, the weight of every action
+MIXES = {
+    "browse": {"home": 10, "all_movies": 35, "movie_page": 25,
+               "user_page": 20, "search": 10},
+    "write": {"profile": 20, "add_movie": 30, "add_review": 40,
+              "movie_page": 10},
+    "api": {"api_users": 30, "api_user": 30, "api_poll": 30,
+            "api_search": 10},
+    "mixed": {"home": 5, "all_movies": 20, "movie_page": 15,
+              "user_page": 10, "search": 5, "profile": 10,
+              "add_movie": 5, "add_review": 10, "api_users": 5,
+              "api_user": 5, "api_poll": 10}
+}
+
+
+class LoadClient:
+    """A logged-in user session making the requests of the mix"""
+    def __init__(self, base_url, user_index, settings, seed):
+        self.base_url = base_url
+        self.user_id = user_index + 1
+        self.user_index = user_index
+        self.settings = settings
+        self.random = random.Random(seed)
+        self.session = requests.Session()
+        self.etags = {}
+        self.added = 0
+
+    def request(self, method, path, **kwargs):
+        """Sends a request, redirects are not followed"""
+        return self.session.request(method, self.base_url + path,
+                                    allow_redirects=False, **kwargs)
+
+    def random_movie_id(self):
+        """Returns the id of a random seeded movie"""
+        return self.random.randint(1, self.settings["movies"])
+
+    def favorite_movie_id(self):
+        """Returns the id of one of the seeded favorites of the user"""
+        index = self.random.randrange(self.settings["favorites"])
+        return get_favorite_movie_id(self.user_index, index,
+                                     self.settings["movies"])
+
+    def login(self):
+        """Logs in as the seeded user"""
+        return self.request("POST", "/login", data={
+            "email": f"user{self.user_index}@example.com",
+            "password": SEED_PASSWORD})
+
+    def home(self):
+        """Home page, users and latest movies"""
+        return self.request("GET", "/")
+
+    def all_movies(self):
+        """A random page of all movies"""
+        after_id = self.random.randint(0, max(0, self.settings["movies"]
+                                              - 30))
+        return self.request("GET", f"/all_movies?limit=30&after_id="
+                                   f"{after_id}")
+
+    def movie_page(self):
+        """Page of a random movie"""
+        return self.request("GET", f"/movie/{self.random_movie_id()}")
+
+    def user_page(self):
+        """Public page of a random user"""
+        user_id = self.random.randint(1, self.settings["users"])
+        return self.request("GET", f"/user/{user_id}")
+
+    def search(self):
+        """Search page of a random query"""
+        return self.request("GET", "/search", params={
+            "q": self.random.choice(SEARCH_WORDS)})
+
+    def profile(self):
+        """Profile page of the logged-in user"""
+        return self.request("GET", "/profile")
+
+    def add_movie(self):
+        """Adds a new movie, looked up in the stub api, or half of
+        the times a seeded movie which is already in the database"""
+        self.added += 1
+        if self.random.random() < 0.5:
+            title = f"Load Movie {self.user_index} {self.added}"
+        else:
+            title = f"Seed Movie {self.random_movie_id() - 1}"
+        return self.request("POST", "/add_movie", data={"title": title})
+
+    def add_review(self):
+        """Adds or updates the review of a favorite movie"""
+        return self.request(
+            "POST", f"/add_review/{self.favorite_movie_id()}", data={
+                "review_rating": self.random.randint(1, 10),
+                "review_text": "Load test review", "short_note": ""})
+
+    def api_users(self):
+        """A random page of the api users list"""
+        after_id = self.random.randint(0, self.settings["users"])
+        return self.request("GET", f"/api/users?limit=100&after_id="
+                                   f"{after_id}")
+
+    def api_user(self):
+        """Favorite movies of a random user from the api"""
+        user_id = self.random.randint(1, self.settings["users"])
+        return self.request("GET", f"/api/user/{user_id}")
+
+    def api_poll(self):
+        """Polls the user favorites with the last etag,
+        like a client keeping a copy up to date"""
+        path = f"/api/user/{self.user_id}"
+        headers = {}
+        if path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+        response = self.request("GET", path, headers=headers)
+        if "ETag" in response.headers:
+            self.etags[path] = response.headers["ETag"]
+        return response
+
+    def api_search(self):
+        """Api search of a random query"""
+        return self.request("GET", "/api/search", params={
+            "q": self.random.choice(SEARCH_WORDS)})
+
+
+def get_favorite_movie_id(user_index, index, movies_count):
+    """Returns the movie id of the index-th seeded favorite of a user"""
+    return (user_index * 7919 + index * 104729) % movies_count + 1
+
+
+def seed_favorites(db, users_count, movies_count, favorites_count,
+                   chunk_size=5000):
+    """Adds favorites_count favorite movies to every seeded user"""
+    from my_app.models.data_models import UserMovies
+    rows = list({(user_index + 1, get_favorite_movie_id(
+        user_index, index, movies_count))
+        for user_index in range(users_count)
+        for index in range(favorites_count)})
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(UserMovies.__table__.insert(), [
+            {"user_id": user_id, "movie_id": movie_id}
+            for user_id, movie_id in rows[start:start + chunk_size]])
+    db.session.commit()
+
+
+def run_client(base_url, user_index, settings, mix, stop_at, seed):
+    """Runs one client until stop_at, returns a dict of action name
+    to (latencies, errors count)"""
+    client = LoadClient(base_url, user_index, settings, seed)
+    results = {}
+
+    def record(action, response, latency):
+        latencies, errors = results.get(action, ([], 0))
+        latencies.append(latency)
+        results[action] = (latencies, errors + (response.status_code >= 400))
+
+    start = time.perf_counter()
+    response = client.login()
+    record("login", response, time.perf_counter() - start)
+    if response.status_code != 302:
+        raise RuntimeError(f"Login failed: {response.status_code}")
+    actions, weights = zip(*mix.items())
+    while time.perf_counter() < stop_at:
+        action = client.random.choices(actions, weights)[0]
+        start = time.perf_counter()
+        try:
+            response = getattr(client, action)()
+        except requests.exceptions.RequestException:
+            latencies, errors = results.get(action, ([], 0))
+            results[action] = (latencies, errors + 1)
+            continue
+        record(action, response, time.perf_counter() - start)
+    return results
+
+
+def run_load(base_url, settings, mix, clients, duration, seed):
+    """Runs clients concurrently for duration seconds,
+    returns the report of every action and of all requests"""
+    stop_at = time.perf_counter() + duration
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        results = list(executor.map(
+            lambda client_index: run_client(
+                base_url, client_index % settings["users"], settings, mix,
+                stop_at, seed + client_index), range(clients)))
+    elapsed = time.perf_counter() - start
+
+    merged = {}
+    for client_results in results:
+        for action, (latencies, errors) in client_results.items():
+            merged_latencies, merged_errors = merged.get(action, ([], 0))
+            merged[action] = (merged_latencies + latencies,
+                              merged_errors + errors)
+
+    endpoints = {action: dict(summarize(latencies, elapsed), errors=errors)
+                 for action, (latencies, errors) in sorted(merged.items())}
+    all_latencies = [latency for latencies, _ in merged.values()
+                     for latency in latencies]
+    total = dict(summarize(all_latencies, elapsed),
+                 errors=sum(errors for _, errors in merged.values()))
+    return {"elapsed_seconds": round(elapsed, 3), "total": total,
+            "endpoints": endpoints}
+
+
+def get_environment() -> dict:
+    """Returns the versions a run depends on"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version, "platform": platform.platform()}
+
+
+def print_report(report):
+    """Prints the per endpoint table of a run"""
+    print(f"{'endpoint':12} {'count':>7} {'req/s':>8} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    rows = list(report["endpoints"].items()) + [("total", report["total"])]
+    for name, stats in rows:
+        print(f"{name:12} {stats['count']:7} {stats['ops_per_sec']:8.1f} "
+              f"{stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} "
+              f"{stats['p99_ms']:8.2f} {stats['errors']:6}")
+
+
+def print_comparison(report, baseline):
+    """Prints the change of throughput and percentiles from baseline"""
+    def change(new, old):
+        return f"{(new - old) / old * 100:+7.1f}%" if old else "     n/a"
+
+    print(f"compared with {baseline['environment'].get('commit')}")
+    changed = sorted(key for key, value in report["settings"].items()
+                     if baseline["settings"].get(key) != value)
+    if changed:
+        print(f"warning, settings differ: {', '.join(changed)}")
+    print(f"{'endpoint':12} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    old_endpoints = dict(baseline["endpoints"], total=baseline["total"])
+    rows = list(report["endpoints"].items()) + [("total", report["total"])]
+    for name, stats in rows:
+        old = old_endpoints.get(name)
+        if old is None:
+            continue
+        print(f"{name:12} {change(stats['ops_per_sec'], old['ops_per_sec'])}"
+              f" {change(stats['p50_ms'], old['p50_ms'])}"
+              f" {change(stats['p95_ms'], old['p95_ms'])}"
+              f" {change(stats['p99_ms'], old['p99_ms'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--favorites", type=int, default=20,
+                        help="Seeded favorite movies of every user")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0,
+                        help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0,
+                        help="Seconds of requests before measuring")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--omdb-latency", type=float, default=0.05,
+                        help="Seconds the stub api waits per lookup")
+    parser.add_argument("--rounds", type=int, default=4,
+                        help="Bcrypt work factor of the seeded users")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Saves the results json here")
+    parser.add_argument("--compare", help="Results json of a previous run")
+    args = parser.parse_args()
+
+    app, db = load_app()
+    from data_manager.passwords import password_hasher
+    from data_manager.dm_sqlite import SqliteDataManager
+    password_hasher.configure(rounds=args.rounds)
+    stub_server = use_stub_api(latency=args.omdb_latency)
+
+    settings = {"users": args.users, "movies": args.movies,
+                "favorites": min(args.favorites, args.movies)}
+    with app.app_context():
+        seed_database(db, args.users, args.movies, rounds=args.rounds)
+        seed_favorites(db, args.users, args.movies, settings["favorites"])
+        SqliteDataManager(db.session).rebuild_movie_stats()
+
+    # Silences the per request log lines of the server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    mix = MIXES[args.mix]
+    try:
+        if args.warmup > 0:
+            run_load(base_url, settings, mix, args.clients, args.warmup,
+                     args.seed + 1000)
+        report = run_load(base_url, settings, mix, args.clients,
+                          args.duration, args.seed)
+    finally:
+        server.shutdown()
+        stub_server.shutdown()
+
+    report = {"environment": get_environment(),
+              "settings": dict(vars(args), output=None, compare=None),
+              **report}
+    print(f"{args.mix} mix, {args.clients} clients, {args.users} users, "
+          f"{args.movies} movies, {report['elapsed_seconds']}s")
+    print_report(report)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            print_comparison(report, json.load(baseline_file))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Login throughput with password checks on the web threads against
+checks in the password hashing process pool.
+
+Concurrent clients log in and out as seeded users. Users are seeded
+with --seed-rounds, when it differs from BCRYPT_LOG_ROUNDS the first
+login of each user also re-hashes the password.
+
+Run:
+    python -m benchmarks.bench_login --clients 8 --logins 200
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.utils import load_app, seed_database, summarize, \
+    SEED_PASSWORD
+
+
+def run_client(app, client_index, users_count, logins):
+    """Logs in and out logins times, returns the login latencies"""
+    client = app.test_client()
+    latencies = []
+    for index in range(logins):
+        user_index = (client_index + index) % users_count
+        start = time.perf_counter()
+        response = client.post("/login", data={
+            "email": f"user{user_index}@example.com",
+            "password": SEED_PASSWORD})
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 302:
+            raise RuntimeError(f"Login failed: {response.status_code}")
+        client.get("/logout")
+    return latencies
+
+
+def run_logins(app, clients, users_count, logins):
+    """Runs clients concurrently, returns the login latencies summary"""
+    per_client = max(1, logins // clients)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        results = executor.map(
+            lambda client_index: run_client(app, client_index, users_count,
+                                            per_client), range(clients))
+        latencies = [latency for result in results for latency in result]
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 4],
+                        help="Hashing processes to compare, 0 is in thread")
+    parser.add_argument("--rounds", type=int, default=None,
+                        help="Work factor, BCRYPT_LOG_ROUNDS by default")
+    parser.add_argument("--seed-rounds", type=int, default=None)
+    args = parser.parse_args()
+
+    app, db = load_app()
+    from data_manager.passwords import password_hasher
+    from my_app.models.data_models import User
+    password_hasher.configure(rounds=args.rounds)
+    seed_rounds = args.seed_rounds or password_hasher.rounds
+
+    for max_workers in args.workers:
+        with app.app_context():
+            db.session.query(User).delete()
+            db.session.commit()
+            seed_database(db, args.users, 0, rounds=seed_rounds)
+        password_hasher.configure(max_workers=max_workers)
+        # Starts the pool outside the measurement
+        password_hasher.check(b"", "")
+        stats = run_logins(app, args.clients, args.users, args.logins)
+        print(f"rounds {password_hasher.rounds} (seeded {seed_rounds}), "
+              f"{max_workers} hashing processes: {stats}")
+
+
+if __name__ == "__main__":
+    main()
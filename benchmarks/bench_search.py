@@ -0,0 +1,83 @@
+"""Latency of movie full-text search (movies_fts), against a naive
+ILIKE '%text%' scan over the same columns.
+
+Seeds a new database with that many movies, every query is timed
+through SqliteDataManager.search_movies and through /api/search.
+
+Run:
+    python -m benchmarks.bench_search --movies 100000
+"""
+import argparse
+from sqlalchemy import or_
+from benchmarks.utils import load_app, seed_database, summarize, timed
+
+QUERIES = [
+    "Seed Movie 4242",
+    "director 42",
+    "drama",
+    "dra",
+    "fra",
+    "sci fi united",
+    "no such movie",
+]
+
+
+def ilike_search(dm, search_text, limit):
+    """The naive search, each word must appear anywhere in a column"""
+    from data_manager.dm_sqlite import Movie
+    query = dm.query(Movie.id)
+    for word in search_text.split():
+        pattern = f"%{word}%"
+        query = query.filter(or_(Movie.name.ilike(pattern),
+                                 Movie.director.ilike(pattern),
+                                 Movie.genre.ilike(pattern),
+                                 Movie.country.ilike(pattern)))
+    return query.limit(limit).all()
+
+
+def measure(function, repeat):
+    """Calls function repeat times, returns its result and latency stats"""
+    latencies = []
+    for _ in range(repeat):
+        result, elapsed = timed(function)
+        latencies.append(elapsed)
+    return result, summarize(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    app, db = load_app()
+    from data_manager.dm_sqlite import SqliteDataManager
+
+    with app.app_context():
+        _, seed_seconds = timed(seed_database, db, 1, args.movies)
+        print(f"seeded {args.movies} movies in {seed_seconds:.1f}s, "
+              f"search limit {args.limit}")
+        dm = SqliteDataManager(db.session)
+        client = app.test_client()
+
+        print(f"  {'query':18} {'results':>7} {'fts p50':>9} {'fts p99':>9} "
+              f"{'api p50':>9} {'api p99':>9} {'ilike p50':>10}")
+        for search_text in QUERIES:
+            dm.movie_catalog.clear()
+            results, fts = measure(lambda: dm.search_movies(
+                search_text, args.limit), args.repeat)
+            _, api = measure(lambda: client.get(
+                "/api/search", query_string={"q": search_text,
+                                             "limit": args.limit}
+            ).get_data(), args.repeat)
+            _, ilike = measure(lambda: ilike_search(
+                dm, search_text, args.limit), max(1, args.repeat // 10))
+            print(f"  {search_text:18} {len(results):7} "
+                  f"{fts['p50_ms']:7.2f}ms {fts['p99_ms']:7.2f}ms "
+                  f"{api['p50_ms']:7.2f}ms {api['p99_ms']:7.2f}ms "
+                  f"{ilike['p50_ms']:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Concurrency benchmark of the sqlite storage profiles.
+
+Reader threads fetch movies by random id while writer threads insert
+and update reviews, each write in its own commit, on a fresh database
+per profile. Reports read and write throughput and "database is locked"
+errors for every profile in config.SQLITE_PROFILES.
+
+Run:
+    python -m benchmarks.bench_sqlite_profile --seconds 5 --writers 4
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from config import SQLITE_PROFILES
+from data_manager.sqlite_profile import apply_storage_profile
+
+MOVIES_COUNT = 10000
+
+
+def create_profile_engine(profile):
+    """Returns an engine on a new seeded database, using the profile"""
+    db_dir = Path(tempfile.mkdtemp(prefix="movieweb-bench-"))
+    db_path = db_dir / "bench.sqlite"
+    engine = create_engine(f"sqlite:///{db_path}",
+                           **profile["engine_options"])
+    apply_storage_profile(engine, profile)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE movies (id INTEGER PRIMARY KEY, name VARCHAR, "
+            "director VARCHAR, genre VARCHAR)"))
+        connection.execute(text(
+            "CREATE TABLE reviews (id INTEGER PRIMARY KEY, "
+            "movie_id INTEGER, rating FLOAT, text VARCHAR)"))
+        connection.execute(
+            text("INSERT INTO movies (name, director, genre) "
+                 "VALUES (:name, 'Director', 'Drama')"),
+            [{"name": f"Movie {index}"} for index in range(MOVIES_COUNT)])
+    return engine
+
+
+def reader(engine, stop, counters):
+    """Reads a movie and its reviews stats until stopped"""
+    while not stop.is_set():
+        try:
+            with engine.connect() as connection:
+                connection.execute(
+                    text("SELECT * FROM movies WHERE id = :id"),
+                    {"id": random.randint(1, MOVIES_COUNT)}).fetchone()
+                connection.execute(
+                    text("SELECT COUNT(*), AVG(rating) FROM reviews "
+                         "WHERE movie_id = :id"),
+                    {"id": random.randint(1, MOVIES_COUNT)}).fetchone()
+            counters["reads"] += 1
+        except OperationalError:
+            counters["errors"] += 1
+
+
+def writer(engine, stop, counters):
+    """Adds a review and updates its movie, one commit each, until stopped"""
+    while not stop.is_set():
+        try:
+            with engine.begin() as connection:
+                movie_id = random.randint(1, MOVIES_COUNT)
+                connection.execute(
+                    text("INSERT INTO reviews (movie_id, rating, text) "
+                         "VALUES (:id, :rating, 'Review')"),
+                    {"id": movie_id, "rating": random.randint(1, 10)})
+                connection.execute(
+                    text("UPDATE movies SET genre = 'Drama' WHERE id = :id"),
+                    {"id": movie_id})
+            counters["writes"] += 1
+        except OperationalError:
+            counters["errors"] += 1
+
+
+def run_profile(profile, seconds, readers, writers):
+    """Runs the readers and writers threads for the duration,
+    returns reads/s, writes/s and errors count"""
+    engine = create_profile_engine(profile)
+    counters = {"reads": 0, "writes": 0, "errors": 0}
+    stop = threading.Event()
+    threads = [threading.Thread(target=reader, args=(engine, stop, counters))
+               for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(engine, stop, counters))
+                for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return {"reads_per_sec": counters["reads"] / seconds,
+            "writes_per_sec": counters["writes"] / seconds,
+            "errors": counters["errors"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'profile':<12}{'reads/s':>12}{'writes/s':>12}{'errors':>8}")
+    for name, profile in SQLITE_PROFILES.items():
+        result = run_profile(profile, args.seconds, args.readers,
+                             args.writers)
+        print(f"{name:<12}{result['reads_per_sec']:>12.1f}"
+              f"{result['writes_per_sec']:>12.1f}{result['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Cold start of the app: import time, app creation and time to the
+first response, each measured in a new python process.
+
+Every run imports my_app, creates the app on a copy of the bundled
+database and gets /login with a test client. Also lists the heaviest
+imports of `python -X importtime`, and which heavy dependencies are
+already loaded, they should load on first use. With --budget-ms the
+exit status is 1 when the median time to first response exceeds it.
+
+Run:
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import json
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import config
+from benchmarks.utils import summarize
+
+# Dependencies the app should only load when they are used
+HEAVY_MODULES = ["requests", "urllib3", "pycountry", "apis.omdb_api",
+                 "multiprocessing", "PIL"]
+
+CHILD_SCRIPT = """
+import json, sys, time
+started_at = time.perf_counter()
+import config
+config.DATA_FILES_PATH = sys.argv[1]
+import my_app
+imported_at = time.perf_counter()
+app = my_app.create_app({"TESTING": True})
+created_at = time.perf_counter()
+loaded_at_create = [name for name in sys.argv[2:] if name in sys.modules]
+response = app.test_client().get("/login")
+responded_at = time.perf_counter()
+print(json.dumps({
+    "status": response.status_code,
+    "import_s": imported_at - started_at,
+    "create_app_s": created_at - imported_at,
+    "first_response_s": responded_at - started_at,
+    "loaded_at_create": loaded_at_create,
+    "loaded_at_response": [name for name in sys.argv[2:]
+                           if name in sys.modules],
+}))
+"""
+
+IMPORTTIME_PATTERN = re.compile(
+    r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run_child(data_dir, importtime=False):
+    """Runs the cold start in a new process, returns its
+    measurements and its stderr"""
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", CHILD_SCRIPT, data_dir, *HEAVY_MODULES]
+    result = subprocess.run(command, cwd=config.get_project_dir_abs_path(),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1]), result.stderr
+
+
+def get_top_imports(importtime_output, top):
+    """Returns the (name, cumulative ms) of the top level imports
+    that took the longest, from the -X importtime output"""
+    imports = []
+    for line in importtime_output.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match and len(match.group(3)) == 1:
+            imports.append((match.group(4), int(match.group(2)) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10,
+                        help="Heaviest top level imports listed")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Max median time to first response")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="movieweb-bench-")
+    shutil.copy(config.get_sqlite_path(), data_dir)
+    # Migrates the copy, so the measured runs start on an up to date schema
+    run_child(data_dir)
+
+    runs = [run_child(data_dir)[0] for _ in range(args.repeat)]
+    if any(run["status"] != 200 for run in runs):
+        raise RuntimeError(f"First response failed: {runs[0]['status']}")
+    print(f"cold start, {args.repeat} runs, median / p95")
+    for key, label in (("import_s", "import my_app"),
+                       ("create_app_s", "create_app()"),
+                       ("first_response_s", "first response")):
+        stats = summarize([run[key] for run in runs])
+        print(f"  {label:16} {stats['p50_ms']:8.1f}ms "
+              f"{stats['p95_ms']:8.1f}ms")
+    print(f"  loaded by create_app: "
+          f"{', '.join(runs[0]['loaded_at_create']) or 'none'}")
+    print(f"  loaded by /login:     "
+          f"{', '.join(runs[0]['loaded_at_response']) or 'none'}")
+
+    _, importtime_output = run_child(data_dir, importtime=True)
+    print("heaviest top level imports (python -X importtime)")
+    for name, cumulative_ms in get_top_imports(importtime_output, args.top):
+        print(f"  {name:40} {cumulative_ms:8.1f}ms")
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+    first_response_ms = summarize(
+        [run["first_response_s"] for run in runs])["p50_ms"]
+    if args.budget_ms is not None and first_response_ms > args.budget_ms:
+        print(f"first response {first_response_ms:.1f}ms is over "
+              f"the {args.budget_ms:.0f}ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Write throughput of SqliteDataManager operations, each operation
+in its own transaction against all of them in one batch transaction.
+
+The workload adds movies already in the database to users favorites,
+reviews them, then deletes them, so no api call is made.
+
+Run:
+    python -m benchmarks.bench_writes --operations 300
+"""
+import argparse
+import time
+from benchmarks.utils import load_app, seed_database
+
+
+def run_workload(dm, users_count, operations):
+    """Adds, reviews and deletes favorites, returns the number of
+    data manager operations made"""
+    done = 0
+    for index in range(operations):
+        user_id = index % users_count + 1
+        movie = dm.add_user_movie(user_id, {"title": f"Seed Movie {index}"})
+        dm.add_movie_review(user_id, movie.id, {
+            "review_rating": index % 10 + 1, "review_text": "Good",
+            "short_note": ""})
+        dm.delete_user_movie(user_id, movie.id)
+        done += 3
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operations", type=int, default=300)
+    parser.add_argument("--users", type=int, default=10)
+    args = parser.parse_args()
+
+    app, db = load_app()
+    from data_manager.dm_sqlite import SqliteDataManager
+    with app.test_request_context():
+        seed_database(db, args.users, args.operations)
+        dm = SqliteDataManager(db.session)
+
+        start = time.perf_counter()
+        count = run_workload(dm, args.users, args.operations)
+        single = count / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with dm.batch():
+            count = run_workload(dm, args.users, args.operations)
+        batched = count / (time.perf_counter() - start)
+
+    print(f"transaction per operation: {single:10.1f} ops/s")
+    print(f"single batch transaction:  {batched:10.1f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Prints the sqlite query plans of the data manager movie lookups,
+before and after the lookup indexes migration.
+
+Works on a temporary copy of the database, the original is not changed.
+
+Run:
+    python -m benchmarks.explain_lookups [path/to/data.sqlite]
+"""
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from sqlalchemy import create_engine, text
+from config import get_sqlite_path
+from data_manager.migrations import add_movie_lookup_indexes
+
+LOOKUPS_BEFORE = {
+    "get_movie_by_name":
+        "SELECT * FROM movies WHERE lower(name) LIKE lower('inception')",
+    "get_user_movies(title=...)":
+        "SELECT * FROM users_movies JOIN movies "
+        "ON movies.id = users_movies.movie_id "
+        "LEFT OUTER JOIN reviews ON reviews.id = users_movies.review_id "
+        "WHERE users_movies.user_id = 1 "
+        "AND lower(movies.name) LIKE lower('inception')",
+    "movie favorites": "SELECT * FROM users_movies WHERE movie_id = 1",
+}
+
+LOOKUPS_AFTER = {
+    "get_movie_by_name":
+        "SELECT * FROM movies WHERE name_key = 'inception'",
+    "get_user_movies(title=...)":
+        "SELECT * FROM users_movies JOIN movies "
+        "ON movies.id = users_movies.movie_id "
+        "LEFT OUTER JOIN reviews ON reviews.id = users_movies.review_id "
+        "WHERE users_movies.user_id = 1 AND movies.name_key = 'inception'",
+    "movie favorites": "SELECT * FROM users_movies WHERE movie_id = 1",
+    "movie by imdb_id": "SELECT * FROM movies WHERE imdb_id = 'tt1375666'",
+}
+
+
+def print_plans(connection, lookups):
+    """Prints the query plan of each lookup query"""
+    for name, query in lookups.items():
+        print(f"  {name}:")
+        for row in connection.execute(text("EXPLAIN QUERY PLAN " + query)):
+            print(f"    {row[-1]}")
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else get_sqlite_path()
+    db_copy = Path(tempfile.mkdtemp()) / "explain.sqlite"
+    shutil.copy(source, db_copy)
+    engine = create_engine(f"sqlite:///{db_copy}")
+
+    with engine.begin() as connection:
+        print("Before:")
+        print_plans(connection, LOOKUPS_BEFORE)
+        add_movie_lookup_indexes(connection)
+        print("After:")
+        print_plans(connection, LOOKUPS_AFTER)
+
+
+if __name__ == "__main__":
+    main()
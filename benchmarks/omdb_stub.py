@@ -0,0 +1,104 @@
+"""Local stub of the OMDb api, for benchmarks and offline development.
+
+Answers every title with a generated movie, except titles starting with
+"missing" which are answered with "Movie not found!". The server can be
+slowed down with a fixed latency, or switched to answer 503 to simulate
+an outage.
+
+Run standalone:
+    python -m benchmarks.omdb_stub --port 8765 --latency 0.2
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+COUNTRIES = ["United States", "United Kingdom", "France", "Germany",
+             "Japan", "Italy", "Canada", "South Korea", "India", "Spain"]
+GENRES = ["Drama", "Comedy", "Action, Adventure", "Sci-Fi, Thriller",
+          "Animation, Family", "Crime, Mystery", "Horror", "Romance"]
+
+
+def generate_movie(title: str, year=None) -> dict:
+    """Returns a deterministic OMDb style movie json for a title"""
+    digest = int(hashlib.sha1(title.casefold().encode()).hexdigest(), 16)
+    return {
+        "Title": title.strip().title(),
+        "Year": str(year or 1950 + digest % 74),
+        "Genre": GENRES[digest % len(GENRES)],
+        "Director": f"Director {digest % 997}",
+        "Country": COUNTRIES[digest % len(COUNTRIES)],
+        "Poster": f"https://example.com/posters/{digest % 100000}.jpg",
+        "imdbRating": f"{1 + digest % 90 / 10:.1f}",
+        "imdbID": f"tt{digest % 10_000_000:07d}",
+        "Response": "True"
+    }
+
+
+class OmdbStubHandler(BaseHTTPRequestHandler):
+    """Request handler answering OMDb title lookups"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests_count += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.down:
+            self._send_json({"Response": "False", "Error": "Down"}, 503)
+            return
+
+        query = parse_qs(urlparse(self.path).query)
+        title = query.get("t", [""])[0]
+        year = query.get("y", [None])[0]
+        if not title or title.casefold().startswith("missing"):
+            self._send_json({"Response": "False",
+                             "Error": "Movie not found!"})
+            return
+        self._send_json(generate_movie(title, year))
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Silences the default per request logging"""
+
+
+def start_stub_server(host="127.0.0.1", port=0, latency=0.0):
+    """Starts the stub server in a daemon thread,
+    returns the server and its base url"""
+    server = ThreadingHTTPServer((host, port), OmdbStubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.down = False
+    server.requests_count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.host, args.port, args.latency)
+    print(f"OMDb stub listening on {url}, set OMDB_API_URL to use it")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
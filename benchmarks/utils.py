@@ -0,0 +1,96 @@
+"""Shared helpers of the benchmark scripts"""
+import statistics
+import tempfile
+import time
+import config
+from apis.utils import normalize_title
+from data_manager.passwords import hash_password
+from benchmarks.omdb_stub import generate_movie
+
+SEED_PASSWORD = "password"
+
+
+def load_app(data_dir=None):
+    """Creates the app with its sqlite database in data_dir,
+    a new temporary directory by default. Returns the app and db."""
+    config.DATA_FILES_PATH = data_dir or \
+        tempfile.mkdtemp(prefix="movieweb-bench-")
+    from my_app import create_app, db
+    return create_app({"TESTING": True}), db
+
+
+def use_stub_api(latency=0.0, data_dir=None):
+    """Starts the OMDb stub server and points the shared api connection
+    at it, with a new response cache in data_dir. Returns the server."""
+    import os
+    from apis import omdb_api
+    from apis.omdb_cache import OmdbResponseCache
+    from benchmarks.omdb_stub import start_stub_server
+
+    server, url = start_stub_server(latency=latency)
+    cache_path = os.path.join(
+        data_dir or tempfile.mkdtemp(prefix="movieweb-bench-"),
+        "omdb_cache.sqlite")
+    omdb_api._shared_connection = omdb_api.MovieAPIConnection(
+        cache=OmdbResponseCache(cache_path), base_url=url)
+    return server
+
+
+def seed_database(db, users_count, movies_count, chunk_size=5000,
+                  rounds=4):
+    """Inserts users_count users, all with SEED_PASSWORD hashed with
+    rounds work factor, and movies_count movies with generated OMDb data"""
+    from my_app.models.data_models import User, Movie
+
+    hashed_password = hash_password(SEED_PASSWORD, rounds)
+    for start in range(0, users_count, chunk_size):
+        db.session.execute(User.__table__.insert(), [
+            {"email": f"user{index}@example.com", "name": f"User {index}",
+             "password": hashed_password}
+            for index in range(start, min(start + chunk_size, users_count))])
+
+    for start in range(0, movies_count, chunk_size):
+        rows = []
+        for index in range(start, min(start + chunk_size, movies_count)):
+            name = f"Seed Movie {index}"
+            data = generate_movie(name)
+            rows.append({"name": name, "name_key": normalize_title(name),
+                         "release_year": data["Year"],
+                         "director": data["Director"],
+                         "imdb_id": f"tt9{index:08d}",
+                         "imdb_rating": float(data["imdbRating"]),
+                         "genre": data["Genre"], "img": data["Poster"],
+                         "country": data["Country"], "country_alpha_2": "US"})
+        db.session.execute(Movie.__table__.insert(), rows)
+    db.session.commit()
+
+
+def percentile(sorted_values, fraction):
+    """Returns the value at fraction (0-1) of sorted values"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed=None):
+    """Returns count, ops/sec and latency percentiles in ms
+    of a list of latencies in seconds"""
+    values = sorted(latencies)
+    elapsed = elapsed or sum(values)
+    return {
+        "count": len(values),
+        "ops_per_sec": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(values) * 1000, 3)
+        if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3)
+    }
+
+
+def timed(function, *args, **kwargs):
+    """Calls function, returns its result and the elapsed seconds"""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
@@ -1,7 +1,10 @@
 import os
 
-DATA_FILES_PATH = "data_manager\\data"
+DATA_FILES_PATH = os.path.join("data_manager", "data")
 SQLITE_FILE_NAME = "data.sqlite"
+OMDB_CACHE_FILE_NAME = "omdb_cache.sqlite"
+JSON_FILE_NAME = "data.json"
+IMAGE_CACHE_DIR_NAME = "images"
 SECRET_KEY = "super secret key"
 
 
@@ -22,3 +25,171 @@ def get_sqlite_path():
 
 def get_sqlite_db_uri():
     return "sqlite:///" + get_sqlite_path()
+
+
+def get_json_path():
+    return os.path.join(get_project_dir_abs_path(),
+                        DATA_FILES_PATH,
+                        JSON_FILE_NAME)
+
+
+def get_image_cache_path():
+    return os.path.join(get_project_dir_abs_path(),
+                        DATA_FILES_PATH,
+                        IMAGE_CACHE_DIR_NAME)
+
+
+def get_omdb_cache_path():
+    return os.path.join(get_project_dir_abs_path(),
+                        DATA_FILES_PATH,
+                        OMDB_CACHE_FILE_NAME)
+
+
+# Pagination
+MOVIES_PAGE_SIZE = 30
+HOME_MOVIES_COUNT = 10
+API_MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 500
+
+
+# Movie search, queries matching more movies than this are ordered
+# by id, ranking every match by relevance would be too slow
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_RANKED_MATCHES = 2000
+
+
+# OMDb response cache
+OMDB_CACHE_TTL = 30 * 24 * 60 * 60
+OMDB_CACHE_NEGATIVE_TTL = 24 * 60 * 60
+OMDB_CACHE_MAX_ENTRIES = 10000
+# Eviction removes entries down to this fraction of max entries,
+# so it doesn't run again on the next stored lookups
+OMDB_CACHE_EVICT_TO = 0.9
+# Seconds before a hit updates the last access time of an entry again,
+# the precision of the least recently used eviction
+OMDB_CACHE_ACCESS_INTERVAL = 60 * 60
+
+
+# OMDb api client
+OMDB_API_URL = os.environ.get("OMDB_API_URL", "http://www.omdbapi.com/")
+OMDB_API_KEY = "292ab885"
+OMDB_TIMEOUT = 3
+OMDB_POOL_SIZE = 10
+OMDB_MAX_RETRIES = 2
+OMDB_RETRY_BACKOFF = 0.2
+OMDB_BREAKER_FAILURES = 5
+OMDB_BREAKER_RESET_TIMEOUT = 30
+
+
+# Background add movie jobs
+ADD_MOVIE_ASYNC = os.environ.get("ADD_MOVIE_ASYNC", "0") == "1"
+ADD_MOVIE_WORKERS = 4
+ADD_MOVIE_MAX_FINISHED_JOBS = 1000
+
+
+# Bulk movies import
+BULK_IMPORT_WORKERS = 8
+BULK_IMPORT_MAX_ITEMS = 1000
+
+
+# Sqlite storage profiles, selected with the STORAGE_PROFILE env var.
+# "pragmas" are set on every new connection, "engine_options"
+# are passed to the SQLAlchemy engine.
+STORAGE_PROFILE = os.environ.get("STORAGE_PROFILE", "default")
+SQLITE_PROFILES = {
+    "default": {
+        "pragmas": {},
+        "engine_options": {}
+    },
+    "production": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -64000,
+            "mmap_size": 256 * 1024 * 1024,
+            "busy_timeout": 5000,
+            "temp_store": "MEMORY"
+        },
+        "engine_options": {
+            "pool_size": 16,
+            "max_overflow": 16,
+            "pool_timeout": 10,
+            "connect_args": {"check_same_thread": False, "timeout": 5}
+        }
+    }
+}
+
+
+def get_storage_profile(profile_name=None):
+    return SQLITE_PROFILES[profile_name or STORAGE_PROFILE]
+
+
+# Rendered pages and fragments cache
+RENDER_CACHE_MAX_ENTRIES = 4096
+
+
+# Conditional GET, Cache-Control of read endpoints
+API_CACHE_CONTROL = "public, no-cache"
+PAGES_CACHE_CONTROL = "private, no-cache"
+
+
+# Json encoder of the api, "auto" uses orjson when it is installed
+JSON_ENCODER = os.environ.get("JSON_ENCODER", "auto")
+
+
+# Logged-in users identity cache, seconds and entries
+USER_CACHE_TTL = 300
+USER_CACHE_MAX_ENTRIES = 1024
+
+
+# Password hashing, bcrypt work factor (log2 rounds) and hashing processes,
+# 0 processes hashes on the calling thread
+BCRYPT_LOG_ROUNDS = int(os.environ.get("BCRYPT_LOG_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS",
+                                           min(4, os.cpu_count() or 1)))
+
+
+# Json append log storage, records kept in the log before it is compacted
+# into the data file, and whether every record is fsynced to disk
+JSON_LOG_COMPACT_THRESHOLD = 1000
+JSON_LOG_FSYNC = False
+
+
+# Movies catalog cache, movie records kept in memory
+MOVIE_CATALOG_MAX_ENTRIES = 50000
+
+
+# Image proxy, remote posters and flags are fetched once and stored on disk.
+# Offline mode never fetches, only images of a pre-seeded cache are served.
+IMAGE_CACHE_OFFLINE = os.environ.get("IMAGE_CACHE_OFFLINE", "").lower() \
+    in ("1", "true")
+IMAGE_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+# Max age of an original image served for a resized variant, when
+# Pillow is missing, so the url gets the thumbnail once it is installed
+IMAGE_UNRESIZED_MAX_AGE = 60 * 60
+IMAGE_FETCH_TIMEOUT = 10
+IMAGE_FETCH_RETRY_AFTER = 60 * 60
+IMAGE_MAX_BYTES = 5 * 1024 * 1024
+IMAGE_SEED_WORKERS = 8
+FLAG_IMAGE_URL = "https://flagsapi.com/{alpha_2}/flat/64.png"
+DEFAULT_AVATAR_IMAGE = os.path.join("images", "blank-profile.webp")
+# Image variants, the max (width, height) of resized images, None
+# is the original image. Resizing needs Pillow (in requirements.txt),
+# without it the original image is served for every variant.
+IMAGE_VARIANTS = {
+    "full": None,
+    "grid": (200, 300),
+    "avatar": (100, 100)
+}
+
+
+# Request instrumentation, off by default. When enabled, responses get
+# a Server-Timing header, every request is logged as a json line and
+# metrics are served at /metrics in Prometheus text format.
+# A statement run at least N_PLUS_ONE_THRESHOLD times in one request
+# is reported as a likely N+1 query.
+INSTRUMENTATION = os.environ.get("INSTRUMENTATION", "").lower() \
+    in ("1", "true")
+N_PLUS_ONE_THRESHOLD = 10
+METRICS_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                            1.0, 2.5, 5.0, 10.0)
@@ -0,0 +1,85 @@
+import threading
+from sqlalchemy import text
+
+# Sets the version of a key to the next value of the database wide
+# sequence, the max version of all keys plus one
+BUMP_STATEMENT = text(
+    "INSERT INTO change_versions (key, version) "
+    "SELECT :key, COALESCE(MAX(version), 0) + 1 FROM change_versions "
+    "WHERE true ON CONFLICT (key) DO UPDATE SET version = excluded.version")
+# The changed keys, and a row without key with the max version of all,
+# lower than the versions read before if the database was replaced
+CHANGED_STATEMENT = text(
+    "SELECT key, version FROM change_versions WHERE version > :version "
+    "UNION ALL SELECT NULL, COALESCE(MAX(version), 0) FROM change_versions")
+
+
+class ChangeVersions:
+    """Version counters of the data, stored in the change_versions table.
+    The data manager bumps the versions of the data it changes in the
+    same transaction as the changes, so every process sees them.
+    Each data manager keeps a copy, refreshed at the start of every
+    request and after its own commits. Caches include the versions of the data
+    they depend on in their keys, so they are never stale.
+    Keys are "movies" and "users" for the tables, "movie:<id>"
+    and "user:<id>" for single entries and their favorites,
+    and "movie_stats" for the stats of any movie."""
+    def __init__(self):
+        self._versions = {}
+        # Highest database version read, versions only increase
+        self._last_version = 0
+        # Added to the database versions, raised when the database
+        # is replaced so the versions given still only increase
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def get(self, key) -> int:
+        """Returns the current version of key"""
+        return self._versions.get(key, self._offset)
+
+    def get_many(self, *keys) -> tuple:
+        """Returns the current versions of keys"""
+        return tuple(self._versions.get(key, self._offset) for key in keys)
+
+    @staticmethod
+    def bump(session, *keys) -> None:
+        """Sets the versions of keys to the next version of the sequence,
+        in the current transaction of session"""
+        if keys:
+            session.execute(BUMP_STATEMENT, [{"key": key} for key in keys])
+
+    def refresh(self, session) -> bool:
+        """Reads the versions changed, by any process, since the last
+        refresh. Sequence values are taken under the database write lock,
+        so they are committed in order and none is missed.
+        A max version lower than the last one read means the database was
+        recreated or restored, then all versions are read again, counted
+        after every version given before, so no cached entry matches.
+        Returns True if the database was replaced."""
+        since = self._last_version
+        rows = self._read_changed(session, since)
+        max_version = rows.pop(None)
+        is_replaced = False
+        with self._lock:
+            # Unless another thread read the replaced database already
+            if max_version < since == self._last_version:
+                self._offset = max(self._offset,
+                                   *self._versions.values()) + 1
+                self._versions = {}
+                rows = self._read_changed(session, 0)
+                max_version = rows.pop(None)
+                self._last_version = 0
+                is_replaced = True
+            for key, version in rows.items():
+                version += self._offset
+                if version > self._versions.get(key, 0):
+                    self._versions[key] = version
+            self._last_version = max(self._last_version, max_version)
+        return is_replaced
+
+    @staticmethod
+    def _read_changed(session, since) -> dict:
+        """Returns a dict of key to version of the keys changed after
+        version since, with the max version of all keys as None key"""
+        return dict(session.execute(CHANGED_STATEMENT,
+                                    {"version": since}).fetchall())
@@ -0,0 +1,353 @@
+import functools
+import json
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from os.path import isfile
+from apis.utils import normalize_title
+from data_manager.dm_interface import DataManagerInterface
+from config import JSON_LOG_COMPACT_THRESHOLD, JSON_LOG_FSYNC
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def synchronized(method):
+    """Runs the decorated data manager method under its locks,
+    on data reloaded if the files were changed by another process"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._locked():
+            self.refresh()
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class JSONLogDataManager(DataManagerInterface):
+    """Data manager class which keeps the JSON data file in memory,
+    with users and their movies indexed by id, and the normalized
+    names of the movies of each user counted to find duplicates.
+    Changes are appended to a log file next to the data file, one json
+    record per line, which is compacted into the data file once it has
+    compact_threshold records. The data file keeps the JSONDataManager
+    format, and is only replaced by an atomic rename.
+    Processes sharing the files take an exclusive lock on a lock file
+    next to them for every operation, so no append is lost to a
+    compaction of another process. Without fcntl (on Windows) only
+    the threads of one process are synchronized."""
+    def __init__(self, filename="data_manager/data/data.json",
+                 compact_threshold=JSON_LOG_COMPACT_THRESHOLD,
+                 fsync=JSON_LOG_FSYNC):
+        self.filename = filename
+        self.log_filename = filename + ".log"
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._lock_file = open(filename + ".lock", "a", encoding="utf-8")
+        self._lock_depth = 0
+        self._users = {}
+        self._movies = {}
+        self._movie_names = {}
+        self._next_user_id = 1
+        self._next_movie_ids = {}
+        self._log_records = 0
+        self._files_state = None
+        with self._locked():
+            if not isfile(filename):
+                self._write_file(filename, json.dumps([]))
+            self.load()
+
+    @contextmanager
+    def _locked(self):
+        """Holds the thread lock, and the lock file of the processes
+        in the outermost block"""
+        with self._lock:
+            is_outermost = self._lock_depth == 0
+            if is_outermost and fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if is_outermost and fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _get_files_state(self) -> tuple:
+        """Returns the modification time and size of the data
+        and log files, to detect changes made by other processes"""
+        state = []
+        for filename in (self.filename, self.log_filename):
+            try:
+                stat = os.stat(filename)
+                state.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+
+    def _write_file(self, filename, text) -> None:
+        """Replaces a file content atomically, by writing a temporary
+        file and renaming it, so a crash never leaves a partial file"""
+        temp_filename = filename + ".tmp"
+        with open(temp_filename, 'w', encoding="utf-8") as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filename, filename)
+
+    def load(self) -> None:
+        """Loads the data file and replays the log into memory"""
+        with self._locked():
+            with open(self.filename, 'r', encoding="utf-8") as file:
+                users_list = json.loads(file.read())
+            self._users = {}
+            self._movies = {}
+            self._movie_names = {}
+            self._next_user_id = 1
+            self._next_movie_ids = {}
+            for user in users_list:
+                self._apply({"op": "put_user", "user": user})
+
+            self._log_records = 0
+            is_log_damaged = False
+            if isfile(self.log_filename):
+                with open(self.log_filename, 'r', encoding="utf-8") as file:
+                    for line in file:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # A partial record of a crashed write
+                            is_log_damaged = True
+                            break
+                        self._apply(record)
+                        if record["op"] != "counters":
+                            self._log_records += 1
+            self._files_state = self._get_files_state()
+            if is_log_damaged:
+                self._compact()
+
+    def refresh(self) -> None:
+        """Reloads the data if the files were changed by another process"""
+        with self._locked():
+            if self._get_files_state() != self._files_state:
+                self.load()
+
+    def compact(self) -> None:
+        """Writes all data to the data file and starts a new log
+        with the id counters, as ids of deleted entries are not reused"""
+        with self._locked():
+            self.refresh()
+            self._compact()
+
+    def _compact(self) -> None:
+        """Compacts the log, the data must be up to date
+        and the locks held since it was refreshed"""
+        self._write_file(self.filename,
+                         json.dumps(self._get_users_list(), indent=4))
+        self._write_file(self.log_filename, json.dumps(
+            self._get_counters_record(), separators=(",", ":")) + "\n")
+        self._log_records = 0
+        self._files_state = self._get_files_state()
+
+    def _get_counters_record(self) -> dict:
+        """Returns a log record of the next user and movies ids"""
+        return {"op": "counters", "users": self._next_user_id,
+                "movies": list(self._next_movie_ids.items())}
+
+    def _count_movie_id(self, user_id, movie_id) -> None:
+        """Moves the next movie id of user past movie_id"""
+        self._next_movie_ids[user_id] = max(
+            self._next_movie_ids.get(user_id, 1), movie_id + 1)
+
+    def _count_movie_name(self, user_id, movie, count) -> None:
+        """Adds count to the movies of user with the name of movie"""
+        names = self._movie_names[user_id]
+        name_key = normalize_title(movie['name'])
+        names[name_key] += count
+        if names[name_key] <= 0:
+            del names[name_key]
+
+    def _apply(self, record) -> None:
+        """Applies a log record to the in-memory data. Records hold
+        the new state of an entry, so applying one twice is harmless."""
+        operation = record["op"]
+        if operation == "put_user":
+            user = dict(record["user"])
+            movies = user.pop("movies", None)
+            self._users[user["id"]] = user
+            self._next_user_id = max(self._next_user_id, user["id"] + 1)
+            if movies is not None:
+                self._movies[user["id"]] = {movie["id"]: movie
+                                            for movie in movies}
+                self._movie_names[user["id"]] = Counter(
+                    normalize_title(movie['name']) for movie in movies)
+                for movie in movies:
+                    self._count_movie_id(user["id"], movie["id"])
+            else:
+                self._movies.setdefault(user["id"], {})
+                self._movie_names.setdefault(user["id"], Counter())
+        elif operation == "delete_user":
+            self._users.pop(record["id"], None)
+            self._movies.pop(record["id"], None)
+            self._movie_names.pop(record["id"], None)
+            self._next_movie_ids.pop(record["id"], None)
+        elif operation == "put_movie":
+            user_id, movie = record["user_id"], record["movie"]
+            user_movies = self._movies.get(user_id)
+            if user_movies is not None:
+                old_movie = user_movies.get(movie["id"])
+                if old_movie is not None:
+                    self._count_movie_name(user_id, old_movie, -1)
+                user_movies[movie["id"]] = movie
+                self._count_movie_name(user_id, movie, 1)
+                self._count_movie_id(user_id, movie["id"])
+        elif operation == "delete_movie":
+            movie = self._movies.get(record["user_id"], {}).pop(record["id"],
+                                                                None)
+            if movie is not None:
+                self._count_movie_name(record["user_id"], movie, -1)
+        elif operation == "counters":
+            self._next_user_id = max(self._next_user_id, record["users"])
+            for user_id, next_movie_id in record["movies"]:
+                if user_id in self._users:
+                    self._count_movie_id(user_id, next_movie_id - 1)
+
+    def _append(self, record) -> None:
+        """Applies a record and appends it to the log,
+        compacts the log once it reaches compact_threshold records"""
+        self._apply(record)
+        with open(self.log_filename, 'a', encoding="utf-8") as file:
+            file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        self._log_records += 1
+        if self._log_records >= self.compact_threshold:
+            self._compact()
+        else:
+            self._files_state = self._get_files_state()
+
+    def _get_user_dict(self, user_id) -> dict:
+        """Returns a copy of a user dict with its movies list"""
+        user = dict(self._users[user_id])
+        user["movies"] = [dict(movie)
+                          for movie in self._movies[user_id].values()]
+        return user
+
+    def _get_users_list(self) -> list:
+        """Returns a list of all users dicts, in the data file format"""
+        return [self._get_user_dict(user_id) for user_id in self._users]
+
+    @synchronized
+    def save_data(self, new_data) -> None:
+        """Replaces all data with the provided list of users"""
+        self._write_file(self.filename, json.dumps(new_data, indent=4))
+        self._write_file(self.log_filename, "")
+        self.load()
+
+    @synchronized
+    def get_all_users(self) -> list:
+        """Returns a list of all users from data file,
+        each user data as a dict object."""
+        return self._get_users_list()
+
+    @synchronized
+    def is_user_key_exists(self, val, key='id'):
+        """Checks if specific user key-val pair exists in data file,
+        Returns boolean value accordingly"""
+        return self.get_user_by_key(val, key) is not None
+
+    @synchronized
+    def add_user(self, user_dict) -> None:
+        """Adds a new user to data file"""
+        if user_dict['id'] not in self._users:
+            self._append({"op": "put_user",
+                          "user": {"movies": [], **user_dict}})
+
+    @synchronized
+    def delete_user(self, user_id) -> None:
+        """Deletes a user from data file"""
+        if user_id in self._users:
+            self._append({"op": "delete_user", "id": user_id})
+
+    @synchronized
+    def update_user(self, user_id, update_dict) -> None:
+        """Update user data in data file"""
+        if user_id in self._users:
+            user = {**self._users[user_id], **update_dict, "id": user_id}
+            self._append({"op": "put_user", "user": user})
+
+    @synchronized
+    def get_user_by_key(self, search_val, key='id') -> dict:
+        """Returns a user dict based on specified key,
+        by default key is 'id'"""
+        if key == 'id':
+            if search_val in self._users:
+                return self._get_user_dict(search_val)
+            return None
+        for user_id, user in self._users.items():
+            if user.get(key) == search_val:
+                return self._get_user_dict(user_id)
+        return None
+
+    @synchronized
+    def get_user_movies(self, user_id) -> list:
+        """Returns a list of user movies based on input user_id,
+        each movie data as a dict object."""
+        return [dict(movie) for movie in self._movies[user_id].values()]
+
+    @synchronized
+    def get_user_single_movie(self, user_id, movie_id) -> dict:
+        """Returns a dictionary with the specific user movie"""
+        movie = self._movies.get(user_id, {}).get(movie_id)
+        return dict(movie) if movie is not None else None
+
+    @synchronized
+    def add_user_movie(self, user_id, form_dict) -> None:
+        """Adds a new movie to specific user in data file,
+        movie names are compared normalized"""
+        movie_names = self._movie_names.get(user_id)
+        if movie_names is None:
+            return
+        if normalize_title(form_dict['name']) in movie_names:
+            raise ValueError("Movie already exists, try again")
+        self._append({"op": "put_movie", "user_id": user_id,
+                      "movie": dict(form_dict)})
+
+    @synchronized
+    def is_movie_id_exists(self, user_id, movie_id) -> bool:
+        """Checks if movie_id exists in users movies list,
+        Returns boolean value accordingly"""
+        return movie_id in self._movies.get(user_id, {})
+
+    @synchronized
+    def delete_user_movie(self, user_id, movie_id) -> None:
+        """Deletes a movie from specific user in data file"""
+        if movie_id in self._movies.get(user_id, {}):
+            self._append({"op": "delete_movie", "user_id": user_id,
+                          "id": movie_id})
+
+    @synchronized
+    def update_user_movie(self, user_id, movie_id, update_dict) -> None:
+        """Update a movie from specific user in data file"""
+        movie = self._movies.get(user_id, {}).get(movie_id)
+        if movie is None:
+            return
+        movie = {**movie, **update_dict, "id": movie_id}
+        if not update_dict.get('note'):
+            movie.pop('note', None)
+        self._append({"op": "put_movie", "user_id": user_id, "movie": movie})
+
+    @synchronized
+    def get_new_id_for(self, user_id=None):
+        """If user_id is None returns new id for users, otherwise,
+        returns new id for movies of specific user. Ids are counted,
+        ids of deleted entries are never returned again"""
+        if user_id is None:
+            return self._next_user_id
+        if user_id not in self._movies:
+            raise KeyError(user_id)
+        return self._next_movie_ids.get(user_id, 1)
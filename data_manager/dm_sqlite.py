@@ -1,22 +1,114 @@
-from flask import flash
+import functools
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from data_manager.dm_interface import DataManagerInterface
-from my_app.models.data_models import Movie, User, UserMovies, Review
-from my_app import bcrypt
-from apis.omdb_api import MovieAPIConnection
+from data_manager.change_versions import ChangeVersions
+from data_manager.movie_catalog import MovieRecord, MovieCatalog
+from data_manager.migrations import rebuild_movie_stats
+from my_app.models.data_models import Movie, User, UserMovies, Review, \
+    MovieStats
+from data_manager.passwords import password_hasher
+from apis.utils import normalize_title
+from config import STREAM_BATCH_SIZE, BULK_IMPORT_WORKERS, \
+    SEARCH_MAX_RANKED_MATCHES
+
+logger = logging.getLogger(__name__)
+
+
+def transactional(method):
+    """Runs the decorated data manager method as one transaction"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.transaction():
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class SqliteDataManager(DataManagerInterface):
-    """Data manager class which interfaces with the sqlite database"""
+    """Data manager class which interfaces with the sqlite database,
+    with the change versions and movie catalog of its database"""
 
     def __init__(self, db_session):
         self.db_session = db_session
         self.query = db_session.query
+        self.change_versions = ChangeVersions()
+        self.movie_catalog = MovieCatalog()
+
+    @property
+    def in_transaction(self):
+        """True while running inside a transaction block"""
+        return self.db_session.info.get("transaction_depth", 0) > 0
+
+    @contextmanager
+    def transaction(self):
+        """Runs the block as one atomic transaction, committed once when
+        the outermost block ends and rolled back if it raises.
+        Nested blocks join the outer transaction."""
+        info = self.db_session.info
+        depth = info.get("transaction_depth", 0)
+        info["transaction_depth"] = depth + 1
+        try:
+            yield
+            if depth == 0:
+                self.change_versions.bump(
+                    self.db_session, *sorted(info.pop("changed_keys", ())))
+                self.db_session.commit()
+                self.refresh_change_versions()
+                for callback in info.pop("after_commit", ()):
+                    callback()
+        except BaseException:
+            if depth == 0:
+                self.db_session.rollback()
+                info.pop("changed_keys", None)
+                info.pop("after_commit", None)
+            raise
+        finally:
+            info["transaction_depth"] = depth
+
+    def refresh_change_versions(self):
+        """Reads the data versions changed by any process, empties
+        the movie catalog if the database was replaced"""
+        if self.change_versions.refresh(self.db_session):
+            self.movie_catalog.clear()
+
+    def touch(self, *keys):
+        """Marks data keys as changed (see ChangeVersions), their versions
+        are bumped in the database, committed or rolled back with
+        the changes"""
+        if self.in_transaction:
+            self.db_session.info.setdefault("changed_keys", set()).update(keys)
+        else:
+            self.change_versions.bump(self.db_session, *keys)
+
+    def after_commit(self, callback):
+        """Calls callback once the current transaction is committed,
+        it is dropped if the transaction is rolled back"""
+        if self.in_transaction:
+            self.db_session.info.setdefault("after_commit", []).append(
+                callback)
+        else:
+            callback()
+
+    def batch(self):
+        """Opt-in batch mode, all data manager operations called in the
+        block share a single commit, if one fails none is saved"""
+        return self.transaction()
 
     def save_data(self, new_data=None):
-        """Saves the provided data to database"""
+        """Saves the provided data to database, inside a transaction
+        the data is only flushed and committed with the transaction"""
         if new_data:
             self.db_session.add(new_data)
-        self.db_session.commit()
+        if self.in_transaction:
+            self.db_session.flush()
+        else:
+            self.db_session.commit()
 
     @staticmethod
     def passwords_match(password, repeat_password):
@@ -29,9 +121,7 @@ class SqliteDataManager(DataManagerInterface):
     def authenticate_password(user, input_password):
         """Check that password matches encrypted password
         in user entry in database"""
-        if bcrypt.check_password_hash(user.password, input_password):
-            return True
-        return False
+        return password_hasher.check(user.password, input_password)
 
     def authenticate_login(self, login_dict):
         """Authenticates user login attempt, if valid return user,
@@ -40,8 +130,18 @@ class SqliteDataManager(DataManagerInterface):
         password = login_dict.get("password")
         user = self.get_user_by_email(email)
         if user and self.authenticate_password(user, password):
+            if password_hasher.needs_rehash(user.password):
+                self.rehash_password(user, password)
             return user
 
+    @transactional
+    def rehash_password(self, user, password):
+        """Re-hashes the password of an authenticated user
+        with the configured bcrypt work factor"""
+        user.password = password_hasher.hash(password)
+        self.touch("users", f"user:{user.id}")
+        self.save_data()
+
     def is_email_unique(self, email):
         """Check that email is not in users database"""
         user = self.get_user_by_email(email)
@@ -54,15 +154,91 @@ class SqliteDataManager(DataManagerInterface):
         """Returns a user entry based on user email"""
         return User.query.filter_by(email=email).first()
 
+    def get_entry_by_id(self, model_id, db_model=User):
+        """Returns an entry based on id from provided db_model,
+        movies are returned as read-only records from the movie catalog"""
+        if db_model is Movie:
+            return self.get_movie_record(model_id)
+        return self.db_session.get(db_model, int(model_id))
+
+    def get_movie_records(self, movie_ids, chunk_size=500) -> dict:
+        """Returns a dict of movie id to movie record, from the movie
+        catalog, the missing records are read from database and cached"""
+        records = self.movie_catalog.get_many(movie_ids)
+        missing_ids = list({movie_id for movie_id in movie_ids
+                            if movie_id not in records})
+        for start in range(0, len(missing_ids), chunk_size):
+            rows = self.query(*MovieRecord.get_columns())\
+                .filter(Movie.id.in_(missing_ids[start:start + chunk_size]))
+            for row in rows:
+                record = MovieRecord(*row)
+                # Rows of an open transaction may still be rolled back
+                if not self.in_transaction:
+                    self.movie_catalog.put(record)
+                records[record.id] = record
+        return records
+
+    def get_movie_record(self, movie_id):
+        """Returns the record of a movie by id, or None"""
+        return self.get_movie_records([int(movie_id)]).get(int(movie_id))
+
+    def get_movie_records_page(self, limit, after_id=None) -> list:
+        """Returns up to limit movie records ordered by id,
+        starting after after_id (keyset pagination)"""
+        movie_ids = [movie_id for movie_id, in
+                     self.get_rows_page([Movie.id], limit, after_id)]
+        records = self.get_movie_records(movie_ids)
+        return [records[movie_id] for movie_id in movie_ids]
+
+    def get_user_movie_records(self, user_id) -> list:
+        """Returns a list of (user movie, movie record, review) tuples
+        of user favorite movies"""
+        user_movies = self.query(UserMovies, Review)\
+            .outerjoin(Review, UserMovies.review_id == Review.id)\
+            .filter(UserMovies.user_id == user_id).all()
+        records = self.get_movie_records([user_movie.movie_id
+                                          for user_movie, _ in user_movies])
+        return [(user_movie, records[user_movie.movie_id], review)
+                for user_movie, review in user_movies]
+
     @staticmethod
-    def get_entry_by_id(model_id, db_model=User):
-        """Returns an entry based on id from provided db_model"""
-        return db_model.query.filter_by(id=int(model_id)).first()
+    def get_search_match(search_text: str):
+        """Returns the fts5 match expression of user search text, all words
+        must match and the last one may be the beginning of a word,
+        or None if the text has no words"""
+        words = re.findall(r"\w+", search_text or "")
+        if not words:
+            return None
+        return " ".join(f'"{word}"' for word in words) + "*"
+
+    def search_movies(self, search_text, limit, offset=0,
+                      max_ranked=SEARCH_MAX_RANKED_MATCHES) -> list:
+        """Returns up to limit movie records matching search text in
+        name, director, genre or country, best matches first,
+        skipping the first offset results.
+        Queries matching more than max_ranked movies are too broad
+        to rank, their results are ordered by id instead."""
+        match = self.get_search_match(search_text)
+        if match is None:
+            return []
+        params = {"match": match, "limit": int(limit),
+                  "offset": int(offset), "max_ranked": max_ranked}
+        matches_count = self.db_session.execute(text(
+            "SELECT COUNT(*) FROM (SELECT rowid FROM movies_fts "
+            "WHERE movies_fts MATCH :match LIMIT :max_ranked + 1)"),
+            params).scalar()
+        order = "rank" if matches_count <= max_ranked else "rowid"
+        movie_ids = [movie_id for movie_id, in self.db_session.execute(text(
+            f"SELECT rowid FROM movies_fts WHERE movies_fts MATCH :match "
+            f"ORDER BY {order} LIMIT :limit OFFSET :offset"), params)]
+        records = self.get_movie_records(movie_ids)
+        return [records[movie_id] for movie_id in movie_ids]
 
     @staticmethod
     def get_movie_by_name(movie_name):
         """Checks if movie exists in database, if it does then returns it"""
-        return Movie.query.filter(Movie.name.ilike(movie_name)).first()
+        return Movie.query.filter_by(name_key=normalize_title(movie_name))\
+            .first()
 
     def get_user_movie_by_ids(self, user_id, movie_id, join=None):
         """Returns a user movie entry based on user id and movie id"""
@@ -78,48 +254,146 @@ class SqliteDataManager(DataManagerInterface):
         """Returns a list of all users from database"""
         return self.query(db_model).all()
 
-    def add_user(self, user_dict, api=False):
-        """Adds a new user to data file"""
+    def get_all_users(self):
+        """Returns a list of all user entries"""
+        return self.get_all_entries_db(User)
+
+    def get_rows_page(self, columns, limit, after_id=None):
+        """Returns up to limit rows of the provided columns as tuples,
+        without loading entries, ordered by the first column which must
+        be an id column, starting after after_id (keyset pagination)"""
+        id_column = columns[0]
+        query = self.query(*columns).order_by(id_column)
+        if after_id is not None:
+            query = query.filter(id_column > int(after_id))
+        return query.limit(int(limit)).all()
+
+    def iter_rows(self, columns, batch_size=STREAM_BATCH_SIZE):
+        """Yields all rows of the provided columns as tuples,
+        loading batch_size rows per query"""
+        after_id = None
+        while True:
+            page = self.get_rows_page(columns, batch_size, after_id)
+            yield from page
+            if len(page) < batch_size:
+                return
+            after_id = page[-1][0]
+
+    def iter_user_movie_rows(self, user_id, columns,
+                             batch_size=STREAM_BATCH_SIZE):
+        """Yields rows of the provided movie columns as tuples,
+        for all favorite movies of user.
+        The query is made on first iteration, so a streamed response
+        uses the session of the streaming context, which is closed
+        when the stream ends."""
+        yield from self.query(*columns)\
+            .join(UserMovies, UserMovies.movie_id == Movie.id)\
+            .filter(UserMovies.user_id == user_id)\
+            .yield_per(batch_size)
+
+    @transactional
+    def add_user(self, user_dict):
+        """Adds a new user to data file, returns the new user.
+        Raises ValueError if the passwords don't match or the email exists"""
         name = user_dict.get("name")
         email = user_dict.get("email")
         password = user_dict.get("password")
         repeat_password = user_dict.get("repeat_password")
 
-        try:
-            if self.passwords_match(password, repeat_password)\
-                    and self.is_email_unique(email):
-                new_user = User(email=email, password=password, name=name)
-                flash(f"Successfully registered {new_user}", "success")
-                self.save_data(new_user)
-                return new_user
-        except ValueError as error:
-            if api:
-                raise ValueError(error) from error
-            flash(str(error), "danger")
-
+        self.passwords_match(password, repeat_password)
+        self.is_email_unique(email)
+        new_user = User(email=email, password=password, name=name)
+        self.touch("users")
+        self.save_data(new_user)
+        return new_user
+
+    def get_movie_stats(self, movie_id):
+        """Returns the stats entry of a movie, None if it has none"""
+        return self.db_session.get(MovieStats, int(movie_id))
+
+    def get_movies_stats(self, movie_ids) -> dict:
+        """Returns a dict of movie id to stats entry of movies"""
+        movie_ids = list(set(movie_ids))
+        if not movie_ids:
+            return {}
+        return {stats.movie_id: stats for stats in self.query(MovieStats)
+                .filter(MovieStats.movie_id.in_(movie_ids))}
+
+    def change_movies_stats(self, stats_changes) -> None:
+        """Adds the changes to movies stats, in the current transaction.
+        stats_changes is a list of dicts with "movie_id" and the deltas
+        of "favorites_count", "reviews_count" and "rating_sum"."""
+        if not stats_changes:
+            return
+        rows = [{"movie_id": change["movie_id"],
+                 "favorites_count": change.get("favorites_count", 0),
+                 "reviews_count": change.get("reviews_count", 0),
+                 "rating_sum": float(change.get("rating_sum") or 0)}
+                for change in stats_changes]
+        statement = sqlite_insert(MovieStats.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=[MovieStats.movie_id],
+            set_={name: getattr(MovieStats, name) +
+                  getattr(statement.excluded, name)
+                  for name in ("favorites_count", "reviews_count",
+                               "rating_sum")})
+        self.db_session.execute(statement, rows)
+        self.touch("movie_stats",
+                   *(f"movie:{row['movie_id']}" for row in rows))
+
+    def get_all_stats_values(self) -> dict:
+        """Returns a dict of movie id to the stats values of all movies"""
+        return {movie_id: values for movie_id, *values in self.query(
+            MovieStats.movie_id, MovieStats.favorites_count,
+            MovieStats.reviews_count, MovieStats.rating_sum)}
+
+    @transactional
+    def rebuild_movie_stats(self):
+        """Recomputes the stats of all movies from favorites and reviews,
+        the versions of the movies whose stats changed are bumped"""
+        old_stats = self.get_all_stats_values()
+        rebuild_movie_stats(self.db_session.connection())
+        new_stats = self.get_all_stats_values()
+        changed_ids = {movie_id for movie_id in old_stats.keys() | new_stats
+                       if old_stats.get(movie_id) != new_stats.get(movie_id)}
+        self.touch("movie_stats", "movies",
+                   *(f"movie:{movie_id}" for movie_id in changed_ids))
+
+    @transactional
     def delete_user(self, user_id):
-        """Deletes a user from data file"""
-        self.db_session.query(UserMovies).\
+        """Deletes a user from data file, with its favorites and reviews"""
+        self.touch("users", f"user:{user_id}")
+        favorites = self.query(UserMovies.movie_id, Review.rating)\
+            .outerjoin(Review, UserMovies.review_id == Review.id)\
+            .filter(UserMovies.user_id == user_id)
+        self.change_movies_stats([
+            {"movie_id": movie_id, "favorites_count": -1,
+             "reviews_count": -1 if rating is not None else 0,
+             "rating_sum": -(rating or 0)}
+            for movie_id, rating in favorites])
+        review_ids = self.query(UserMovies.review_id)\
+            .filter(UserMovies.user_id == user_id,
+                    UserMovies.review_id.isnot(None))
+        self.query(Review).filter(Review.id.in_(review_ids.scalar_subquery()))\
+            .delete(synchronize_session=False)
+        self.query(UserMovies).\
             filter(UserMovies.user_id == user_id).delete()
-        self.save_data()
 
         user = self.get_entry_by_id(user_id)
         self.db_session.delete(user)
         self.save_data()
-        flash("User successfully deleted", "success")
 
+    @transactional
     def update_user(self, user_id, update_dict):
-        """Update user data in data file"""
+        """Update user data in data file,
+        returns True if any user detail was changed"""
         user = self.get_entry_by_id(user_id)
         password = update_dict.get("password")
-        print(f"pass {password}")
         email = update_dict.get("user_email")
-        print(f"Email {email}")
         name = update_dict.get("user_name")
-        print(f"Name {name}")
 
         if password:
-            hashed_pass = bcrypt.generate_password_hash(password)
+            hashed_pass = password_hasher.hash(password)
             user.password = hashed_pass
 
         if name:
@@ -129,8 +403,10 @@ class SqliteDataManager(DataManagerInterface):
             user.email = email
 
         if password or name or email:
+            self.touch("users", f"user:{user_id}")
             self.save_data()
-            flash("Successfully updated user details", "success")
+            return True
+        return False
 
     def get_user_movies(self, user_id, title=None):
         """Returns a list of user favorite movies based on user_id,
@@ -139,63 +415,222 @@ class SqliteDataManager(DataManagerInterface):
         if title:
             return self.query(UserMovies, Movie, Review).join(Movie).outerjoin(Review)\
                 .filter(UserMovies.user_id == user_id,
-                        Movie.name.ilike(title)).first()
+                        Movie.name_key == normalize_title(title)).first()
         return self.query(UserMovies, Movie, Review).join(Movie).outerjoin(Review)\
             .filter(UserMovies.user_id == user_id).all()
 
+    @transactional
     def add_user_movie(self, user_id, form_dict):
-        """Adds a new movie to specific user in data file"""
+        """Adds a new movie to specific user in data file,
+        returns the movie. Raises ValueError if the movie is not found
+        or is already a favorite of user"""
         movie_name = form_dict.get("title")
         year = form_dict.get("release_year")
 
-        movie = self.get_user_movies(user_id, title=movie_name)
-        if movie:
-            raise ValueError("Movie already favorite by user")
-
         new_movie = self.get_movie_by_name(movie_name)
         if new_movie is None:
-            movie_from_api = self.add_movie_from_api(movie_name, year)
-            new_movie = self.get_movie_by_name(movie_from_api.name)
+            new_movie = self.add_movie_from_api(movie_name, year)
+        if self.get_user_movie_by_ids(user_id, new_movie.id):
+            raise ValueError("Movie already favorite by user")
 
         user_movie = UserMovies(user_id=user_id,
                                 movie_id=new_movie.id)
-        self.save_data(user_movie)
-        flash(f"New movie {new_movie.name} successfully added to user",
-              "success")
+        self.touch(f"user:{user_id}")
+        try:
+            self.save_data(user_movie)
+        except IntegrityError as error:
+            # The same movie was added to user by a concurrent request
+            raise ValueError("Movie already favorite by user") from error
+        self.change_movies_stats([{"movie_id": new_movie.id,
+                                   "favorites_count": 1}])
         return new_movie
 
+    def get_movies_by_names(self, movie_names, chunk_size=500):
+        """Returns a dict of normalized movie name to movie entry,
+        for all movies in database matching the provided names"""
+        name_keys = list({normalize_title(name) for name in movie_names})
+        movies = {}
+        for start in range(0, len(name_keys), chunk_size):
+            chunk = name_keys[start:start + chunk_size]
+            for movie in self.query(Movie)\
+                    .filter(Movie.name_key.in_(chunk)):
+                movies[movie.name_key] = movie
+        return movies
+
+    @transactional
+    def bulk_add_user_movies(self, user_id, movies_list,
+                             max_workers=BULK_IMPORT_WORKERS):
+        """Adds many movies to specific user favorites in one transaction.
+        movies_list items are (title, release_year) tuples, titles already
+        in database are found with one query, the missing ones are fetched
+        from api concurrently with up to max_workers parallel requests.
+        An item whose lookup fails, even by raising, is reported in errors
+        and the others are still added.
+        Returns a report dict with counts, per item errors and throughput."""
+        start_time = time.perf_counter()
+        items = {}
+        for title, year in movies_list:
+            title = title.strip()
+            if title:
+                items.setdefault(normalize_title(title), (title, year))
+
+        existing = self.get_movies_by_names(items)
+        favorite_ids = {movie_id for movie_id, in self.query(
+            UserMovies.movie_id).filter(UserMovies.user_id == user_id)}
+        missing = [item for key, item in items.items() if key not in existing]
+
+        errors = []
+        fetched = []
+        from apis.omdb_api import get_movie_api_connection
+        connection = get_movie_api_connection()
+
+        def get_movie_data(item):
+            try:
+                return connection.get_movie_data(*item)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Movie lookup of %r failed", item[0])
+                return {'error': 'Movie lookup failed'}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(get_movie_data, missing)
+            for (title, _), movie_data in zip(missing, results):
+                if 'error' in movie_data:
+                    errors.append({"title": title,
+                                   "error": movie_data['error']})
+                else:
+                    fetched.append((title, movie_data))
+
+        # Fetched movies may already be in database under another title
+        movies_data = [movie_data for _, movie_data in fetched]
+        new_movies_count = self.upsert_movies(movies_data)
+        by_imdb_id = self.get_movies_by_imdb_ids(
+            movie_data['imdbID'] for movie_data in movies_data)
+        by_name = self.get_movies_by_names(
+            movie_data['name'] for movie_data in movies_data)
+        resolved = dict(existing)
+        for title, movie_data in fetched:
+            resolved[normalize_title(title)] = \
+                by_imdb_id.get(movie_data['imdbID']) or \
+                by_name.get(normalize_title(movie_data['name']))
+
+        added_ids = []
+        already_favorite = 0
+        for key in items:
+            movie = resolved.get(key)
+            if movie is None:
+                continue
+            if movie.id in favorite_ids:
+                already_favorite += 1
+                continue
+            favorite_ids.add(movie.id)
+            self.db_session.add(UserMovies(user_id=user_id,
+                                           movie_id=movie.id))
+            added_ids.append(movie.id)
+        if added_ids:
+            self.touch(f"user:{user_id}")
+        self.save_data()
+        self.change_movies_stats([{"movie_id": movie_id, "favorites_count": 1}
+                                  for movie_id in added_ids])
+
+        elapsed = time.perf_counter() - start_time
+        return {
+            "requested": len(items),
+            "added": len(added_ids),
+            "already_favorite": already_favorite,
+            "new_movies": new_movies_count,
+            "failed": len(errors),
+            "errors": errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "items_per_second": round(len(items) / elapsed, 1)
+            if elapsed else None
+        }
+
+    def get_movies_by_imdb_ids(self, imdb_ids, chunk_size=500):
+        """Returns a dict of imdb id to movie entry,
+        for all movies in database with the provided imdb ids"""
+        imdb_ids = list(set(imdb_ids))
+        movies = {}
+        for start in range(0, len(imdb_ids), chunk_size):
+            chunk = imdb_ids[start:start + chunk_size]
+            for movie in self.query(Movie).filter(Movie.imdb_id.in_(chunk)):
+                movies[movie.imdb_id] = movie
+        return movies
+
+    @staticmethod
+    def get_movie_values(movie_data):
+        """Returns movies table column values from api movie data dict"""
+        return {
+            "name": movie_data['name'],
+            "name_key": normalize_title(movie_data['name']),
+            "release_year": movie_data['year'],
+            "director": movie_data['director'],
+            "imdb_id": movie_data['imdbID'],
+            "imdb_rating": movie_data['rating'],
+            "genre": movie_data['genre'],
+            "img": movie_data['img'],
+            "country": movie_data['country'],
+            "country_alpha_2": movie_data['alpha_2']
+        }
+
+    def upsert_movies(self, movies_data, chunk_size=500):
+        """Inserts movies from api movie data dicts in one statement
+        per chunk, skipping movies whose imdb id or normalized name
+        is already in database. Returns the number of inserted movies."""
+        inserted = 0
+        for start in range(0, len(movies_data), chunk_size):
+            chunk = movies_data[start:start + chunk_size]
+            statement = sqlite_insert(Movie)\
+                .values([self.get_movie_values(data) for data in chunk])\
+                .on_conflict_do_nothing()
+            inserted += self.db_session.execute(statement).rowcount
+        if inserted:
+            self.touch("movies")
+        return inserted
+
+    def upsert_movie(self, movie_data):
+        """Inserts a movie from api movie data dict, unless a movie with
+        the same imdb id or normalized name exists, atomically.
+        Returns the movie entry and whether it was inserted."""
+        inserted = self.upsert_movies([movie_data]) == 1
+        movie = self.query(Movie)\
+            .filter_by(imdb_id=movie_data['imdbID']).first()
+        if movie is None:
+            movie = self.get_movie_by_name(movie_data['name'])
+        return movie, inserted
+
+    @transactional
     def add_movie_from_api(self, movie_name, year):
-        """Get movie from api and add to movies database"""
-        connection = MovieAPIConnection()
+        """Get movie from api and add to movies database,
+        if the movie is already in database returns the existing entry,
+        the record from the movie catalog when it is cached"""
+        from apis.omdb_api import get_movie_api_connection
+        connection = get_movie_api_connection()
         new_movie = connection.get_movie_data(movie_name, year)
 
         if 'error' in new_movie:
             raise ValueError(new_movie['error'])
 
-        movie_obj = Movie(name=new_movie['name'],
-                          release_year=new_movie['year'],
-                          director=new_movie['director'],
-                          imdb_id=new_movie['imdbID'],
-                          imdb_rating=new_movie['rating'],
-                          genre=new_movie['genre'],
-                          img=new_movie['img'],
-                          country=new_movie['country'],
-                          country_alpha_2=new_movie['alpha_2'])
-
-        # Check if fetched movie name already in database
-        movie_from_api = self.get_movie_by_name(movie_obj.name)
-        if movie_from_api:
-            return movie_from_api
-
-        self.save_data(movie_obj)
-        flash(f"Successfully registered {movie_obj.name} to database", "success")
+        # Cached movies are in database, movies are never deleted
+        cached_record = self.movie_catalog.get_by_imdb_id(
+            new_movie['imdbID'])
+        if cached_record is not None:
+            return cached_record
+        movie_obj, _ = self.upsert_movie(new_movie)
+        record = MovieRecord.from_entry(movie_obj)
+        self.after_commit(lambda: self.movie_catalog.put(record))
         return movie_obj
 
     def update_user_movie(self, user_id, movie_id, update_dict):
-        """Update a movie from specific user in UserMovies database"""
+        """Update a movie from specific user in UserMovies database,
+        the user data of a favorite movie is its review, see
+        add_movie_review. Returns the review."""
+        review, _ = self.add_movie_review(user_id, movie_id, update_dict)
+        return review
 
+    @transactional
     def add_movie_review(self, user_id, movie_id, update_dict):
-        """Update a movie from specific user in UserMovies database"""
+        """Adds or updates the user review of a favorite movie,
+        returns the review and True if it was added"""
         review_rating = update_dict.get("review_rating")
         review_text = update_dict.get("review_text")
         short_note = update_dict.get("short_note")
@@ -204,30 +639,42 @@ class SqliteDataManager(DataManagerInterface):
         if user_movie.review_id:
             movie_review = self.get_entry_by_id(user_movie.review_id,
                                                 db_model=Review)
+            stats_change = {"movie_id": user_movie.movie_id,
+                            "rating_sum": float(review_rating) -
+                            (movie_review.rating or 0)}
             movie_review.rating = review_rating
             movie_review.text = review_text
             if short_note != "":
                 movie_review.short_note = short_note
-            operation = "updated"
-            self.save_data()
+            created = False
         else:
             movie_review = Review(rating=review_rating, text=review_text)
-            operation = "added"
+            stats_change = {"movie_id": user_movie.movie_id,
+                            "reviews_count": 1,
+                            "rating_sum": float(review_rating)}
+            created = True
             if short_note != "":
                 movie_review.short_note = short_note
             self.save_data(movie_review)
 
         user_movie.review_id = movie_review.id
+        self.touch(f"user:{user_id}")
         self.save_data()
-        flash(f"Successfully {operation} {movie_review}", "success")
+        self.change_movies_stats([stats_change])
+        return movie_review, created
 
+    @transactional
     def delete_user_movie(self, user_id, movie_id):
         """Deletes a movie from specific user in data file"""
         user_movie = self.get_user_movie_by_ids(user_id, movie_id)
+        stats_change = {"movie_id": user_movie.movie_id,
+                        "favorites_count": -1}
         if user_movie.review_id:
             review = self.get_entry_by_id(user_movie.review_id, Review)
+            stats_change.update(reviews_count=-1,
+                                rating_sum=-(review.rating or 0))
             self.db_session.delete(review)
-            self.save_data()
         self.db_session.delete(user_movie)
+        self.touch(f"user:{user_id}")
         self.save_data()
-        flash("User favorite movie successfully deleted", "success")
+        self.change_movies_stats([stats_change])
@@ -0,0 +1,202 @@
+from sqlalchemy import inspect, text
+from apis.utils import normalize_title
+
+
+def get_schema_version(connection) -> int:
+    """Returns the schema version stored in the sqlite user_version pragma"""
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+
+def set_schema_version(connection, version: int) -> None:
+    """Stores the schema version in the sqlite user_version pragma"""
+    connection.execute(text(f"PRAGMA user_version = {int(version)}"))
+
+
+def get_column_names(connection, table_name) -> set:
+    """Returns the names of the columns of a table"""
+    return {column["name"]
+            for column in inspect(connection).get_columns(table_name)}
+
+
+def merge_duplicate_movies(connection, keep_id, duplicate_id) -> None:
+    """Moves users favorites from duplicate movie to the kept movie,
+    then deletes the duplicate movie. A user with both movies keeps
+    the review of the kept favorite, or else the duplicate's one."""
+    favorites = connection.execute(text(
+        "SELECT user_id, review_id FROM users_movies WHERE movie_id = :id"),
+        {"id": duplicate_id}).fetchall()
+    for user_id, review_id in favorites:
+        kept_favorite = connection.execute(text(
+            "SELECT review_id FROM users_movies "
+            "WHERE user_id = :user_id AND movie_id = :movie_id"),
+            {"user_id": user_id, "movie_id": keep_id}).fetchone()
+        if kept_favorite is None:
+            connection.execute(text(
+                "UPDATE users_movies SET movie_id = :keep_id "
+                "WHERE user_id = :user_id AND movie_id = :duplicate_id"),
+                {"keep_id": keep_id, "user_id": user_id,
+                 "duplicate_id": duplicate_id})
+            continue
+        if kept_favorite.review_id is None and review_id is not None:
+            connection.execute(text(
+                "UPDATE users_movies SET review_id = :review_id "
+                "WHERE user_id = :user_id AND movie_id = :keep_id"),
+                {"review_id": review_id, "user_id": user_id,
+                 "keep_id": keep_id})
+        elif review_id is not None:
+            connection.execute(text("DELETE FROM reviews WHERE id = :id"),
+                               {"id": review_id})
+        connection.execute(text(
+            "DELETE FROM users_movies "
+            "WHERE user_id = :user_id AND movie_id = :duplicate_id"),
+            {"user_id": user_id, "duplicate_id": duplicate_id})
+    connection.execute(text("DELETE FROM movies WHERE id = :id"),
+                       {"id": duplicate_id})
+
+
+def add_movie_lookup_indexes(connection) -> None:
+    """Adds movies.name_key, the normalized movie name, with a unique index,
+    and indexes on movies.imdb_id and users_movies.movie_id.
+    Movies with the same normalized name and imdb id are merged into
+    the oldest one. Other movies with the name of an older movie, like
+    remakes, are kept without a name_key, so name lookups find the oldest."""
+    if "name_key" not in get_column_names(connection, "movies"):
+        connection.execute(text(
+            "ALTER TABLE movies ADD COLUMN name_key VARCHAR"))
+
+    kept_movies = {}
+    movies = connection.execute(text(
+        "SELECT id, name, name_key, imdb_id FROM movies ORDER BY id"))\
+        .fetchall()
+    for movie_id, name, name_key, imdb_id in movies:
+        new_name_key = normalize_title(name)
+        if new_name_key in kept_movies:
+            kept_id, kept_imdb_id = kept_movies[new_name_key]
+            if imdb_id is not None and imdb_id == kept_imdb_id:
+                merge_duplicate_movies(connection, kept_id, movie_id)
+            elif name_key is not None:
+                connection.execute(text(
+                    "UPDATE movies SET name_key = NULL WHERE id = :id"),
+                    {"id": movie_id})
+            continue
+        kept_movies[new_name_key] = movie_id, imdb_id
+        if name_key != new_name_key:
+            connection.execute(text(
+                "UPDATE movies SET name_key = :name_key WHERE id = :id"),
+                {"name_key": new_name_key, "id": movie_id})
+
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_movies_name_key "
+        "ON movies (name_key)"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_movies_imdb_id ON movies (imdb_id)"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_users_movies_movie_id "
+        "ON users_movies (movie_id)"))
+
+
+def make_imdb_id_unique(connection) -> None:
+    """Makes movies.imdb_id a unique key, movies with the same imdb id
+    are merged into the oldest one"""
+    duplicates = connection.execute(text(
+        "SELECT movies.id, kept.id FROM movies JOIN ("
+        "SELECT imdb_id, MIN(id) AS id FROM movies "
+        "WHERE imdb_id IS NOT NULL GROUP BY imdb_id HAVING COUNT(*) > 1"
+        ") AS kept ON kept.imdb_id = movies.imdb_id "
+        "WHERE movies.id != kept.id")).fetchall()
+    for duplicate_id, keep_id in duplicates:
+        merge_duplicate_movies(connection, keep_id, duplicate_id)
+
+    connection.execute(text("DROP INDEX IF EXISTS ix_movies_imdb_id"))
+    connection.execute(text(
+        "CREATE UNIQUE INDEX ix_movies_imdb_id ON movies (imdb_id)"))
+
+
+def rebuild_movie_stats(connection) -> None:
+    """Recomputes the movie_stats table from favorites and reviews,
+    with a row for every movie"""
+    connection.execute(text("DELETE FROM movie_stats"))
+    connection.execute(text(
+        "INSERT INTO movie_stats "
+        "(movie_id, favorites_count, reviews_count, rating_sum) "
+        "SELECT movies.id, COUNT(users_movies.user_id), COUNT(reviews.id), "
+        "COALESCE(SUM(reviews.rating), 0) FROM movies "
+        "LEFT JOIN users_movies ON users_movies.movie_id = movies.id "
+        "LEFT JOIN reviews ON reviews.id = users_movies.review_id "
+        "GROUP BY movies.id"))
+
+
+def add_movie_search(connection) -> None:
+    """Adds movies_fts, a full-text index of movies name, director, genre
+    and country with prefix indexes, kept in sync with movies by triggers,
+    then indexes the existing movies. Results are ranked by bm25
+    with matches in name and director weighted higher."""
+    connection.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5("
+        "name, director, genre, country, "
+        "content='movies', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"))
+    connection.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS movies_fts_insert "
+        "AFTER INSERT ON movies BEGIN "
+        "INSERT INTO movies_fts (rowid, name, director, genre, country) "
+        "VALUES (new.id, new.name, new.director, new.genre, new.country); "
+        "END"))
+    connection.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS movies_fts_delete "
+        "AFTER DELETE ON movies BEGIN "
+        "INSERT INTO movies_fts "
+        "(movies_fts, rowid, name, director, genre, country) VALUES "
+        "('delete', old.id, old.name, old.director, old.genre, old.country); "
+        "END"))
+    connection.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS movies_fts_update "
+        "AFTER UPDATE OF name, director, genre, country ON movies BEGIN "
+        "INSERT INTO movies_fts "
+        "(movies_fts, rowid, name, director, genre, country) VALUES "
+        "('delete', old.id, old.name, old.director, old.genre, old.country); "
+        "INSERT INTO movies_fts (rowid, name, director, genre, country) "
+        "VALUES (new.id, new.name, new.director, new.genre, new.country); "
+        "END"))
+    connection.execute(text(
+        "INSERT INTO movies_fts (movies_fts, rank) "
+        "VALUES ('rank', 'bm25(10.0, 5.0, 1.0, 1.0)')"))
+    connection.execute(text(
+        "INSERT INTO movies_fts (movies_fts) VALUES ('rebuild')"))
+
+
+def clear_default_profile_images(connection) -> None:
+    """Clears profile images set to the old hotlinked default avatar,
+    users without a profile image get the bundled default avatar"""
+    connection.execute(text(
+        "UPDATE users SET profile_img = NULL WHERE profile_img = :url"),
+        {"url": "https://cdn.pixabay.com/photo/2015/10/05/22/37/"
+                "blank-profile-picture-973460_1280.png"})
+
+
+# Ordered schema migrations, each one must be safe to run
+# on a database that already has the change
+MIGRATIONS = [
+    (1, add_movie_lookup_indexes),
+    (2, make_imdb_id_unique),
+    # The movie_stats table itself is created by create_all
+    (3, rebuild_movie_stats),
+    (4, add_movie_search),
+    (5, clear_default_profile_images),
+]
+
+
+def migrate(engine, metadata) -> int:
+    """Brings the database schema up to date, creates the missing tables,
+    then applies all pending migrations in one transaction.
+    Returns the schema version."""
+    with engine.begin() as connection:
+        metadata.create_all(connection)
+
+        version = get_schema_version(connection)
+        for migration_version, upgrade in MIGRATIONS:
+            if migration_version > version:
+                upgrade(connection)
+                version = migration_version
+        set_schema_version(connection, version)
+    return version
@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+from my_app.models.data_models import Movie
+from config import MOVIE_CATALOG_MAX_ENTRIES
+
+
+class MovieRecord:
+    """Compact read-only copy of a movie row, with the attributes
+    of a Movie entry used for rendering and serialization"""
+    __slots__ = ("id", "name", "release_year", "director", "imdb_id",
+                 "imdb_rating", "genre", "img", "country", "country_alpha_2")
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def get_columns(cls) -> list:
+        """Returns the Movie columns to select for a record"""
+        return [getattr(Movie, name) for name in cls.__slots__]
+
+    @classmethod
+    def from_entry(cls, movie):
+        """Returns a record with the values of a Movie entry"""
+        return cls(*(getattr(movie, name) for name in cls.__slots__))
+
+    def __repr__(self):
+        return f"<MovieRecord(id = {self.id}, name = {self.name}, " \
+               f"release_year = {self.release_year})>"
+
+    def __str__(self):
+        return f"Name: {self.name}, id: {self.id}"
+
+
+class MovieCatalog:
+    """Cache of movie records by id and imdb id, the least
+    recently used are evicted above max_entries. Movies don't change
+    once added, so records are only replaced by put or invalidate."""
+    def __init__(self, max_entries=MOVIE_CATALOG_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._records = OrderedDict()
+        self._ids_by_imdb_id = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, movie_ids) -> dict:
+        """Returns a dict of id to record of the cached movies of ids"""
+        records = {}
+        with self._lock:
+            for movie_id in movie_ids:
+                record = self._records.get(movie_id)
+                if record is None:
+                    self.misses += 1
+                    continue
+                self._records.move_to_end(movie_id)
+                records[movie_id] = record
+                self.hits += 1
+        return records
+
+    def get(self, movie_id):
+        """Returns the cached record of movie_id, or None"""
+        return self.get_many([movie_id]).get(movie_id)
+
+    def get_by_imdb_id(self, imdb_id):
+        """Returns the cached record of the movie with imdb_id, or None"""
+        movie_id = self._ids_by_imdb_id.get(imdb_id)
+        return self.get(movie_id) if movie_id is not None else None
+
+    def put(self, record) -> MovieRecord:
+        """Caches a record, evicting the least recently used records
+        above max_entries, returns the record"""
+        with self._lock:
+            self._records[record.id] = record
+            self._records.move_to_end(record.id)
+            if record.imdb_id:
+                self._ids_by_imdb_id[record.imdb_id] = record.id
+            while len(self._records) > self.max_entries:
+                _, evicted = self._records.popitem(last=False)
+                self._ids_by_imdb_id.pop(evicted.imdb_id, None)
+                self.evictions += 1
+        return record
+
+    def invalidate(self, movie_id) -> None:
+        """Removes the record of movie_id"""
+        with self._lock:
+            record = self._records.pop(movie_id, None)
+            if record is not None:
+                self._ids_by_imdb_id.pop(record.imdb_id, None)
+
+    def clear(self) -> None:
+        """Removes all records"""
+        with self._lock:
+            self._records.clear()
+            self._ids_by_imdb_id.clear()
+
+    def stats(self) -> dict:
+        """Returns cache counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self._records),
+            "max_entries": self.max_entries
+        }
+
@@ -0,0 +1,94 @@
+import hmac
+import threading
+import bcrypt
+from config import BCRYPT_LOG_ROUNDS, PASSWORD_HASH_WORKERS
+
+
+def to_bytes(value) -> bytes:
+    """Encodes str values to utf-8 bytes"""
+    return value.encode("utf-8") if isinstance(value, str) else value
+
+
+def hash_password(password, rounds=BCRYPT_LOG_ROUNDS) -> bytes:
+    """Returns the bcrypt hash of password with 2^rounds work factor"""
+    if not password:
+        raise ValueError("Password must be non-empty.")
+    return bcrypt.hashpw(to_bytes(password), bcrypt.gensalt(rounds=rounds))
+
+
+def check_password(password_hash, password) -> bool:
+    """Checks that password matches the bcrypt password hash"""
+    if not password or not password_hash:
+        return False
+    password_hash = to_bytes(password_hash)
+    try:
+        return hmac.compare_digest(
+            bcrypt.hashpw(to_bytes(password), password_hash), password_hash)
+    except ValueError:
+        return False
+
+
+def get_hash_rounds(password_hash) -> int:
+    """Returns the work factor of a bcrypt hash, "$2b$<rounds>$..." """
+    return int(to_bytes(password_hash).split(b"$")[2])
+
+
+def needs_rehash(password_hash, rounds=BCRYPT_LOG_ROUNDS) -> bool:
+    """Checks if a bcrypt hash work factor differs from rounds"""
+    return get_hash_rounds(password_hash) != rounds
+
+
+class PasswordHasher:
+    """Runs bcrypt hashing and checks in a bounded pool of processes,
+    so they use other cores and never hold the GIL of the web threads.
+    The pool is started on first use, with max_workers 0 the work
+    runs on the calling thread."""
+    def __init__(self, max_workers=PASSWORD_HASH_WORKERS,
+                 rounds=BCRYPT_LOG_ROUNDS):
+        self.max_workers = max_workers
+        self.rounds = rounds
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _run(self, function, *args):
+        """Runs function in the pool and waits for its result"""
+        if not self.max_workers:
+            return function(*args)
+        with self._lock:
+            if self._pool is None:
+                # Imported here, multiprocessing is slow to import
+                # and not needed with max_workers 0
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # Spawned workers only import this module, not the app
+                self._pool = ProcessPoolExecutor(
+                    self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"))
+        return self._pool.submit(function, *args).result()
+
+    def hash(self, password) -> bytes:
+        """Returns the bcrypt hash of password"""
+        return self._run(hash_password, password, self.rounds)
+
+    def check(self, password_hash, password) -> bool:
+        """Checks that password matches the bcrypt password hash"""
+        return self._run(check_password, password_hash, password)
+
+    def needs_rehash(self, password_hash) -> bool:
+        """Checks if the hash work factor differs from the configured one"""
+        return needs_rehash(password_hash, self.rounds)
+
+    def configure(self, max_workers=None, rounds=None) -> None:
+        """Changes the pool size and/or the work factor,
+        a running pool is shut down and restarted on next use"""
+        with self._lock:
+            if max_workers is not None:
+                self.max_workers = max_workers
+                if self._pool is not None:
+                    self._pool.shutdown()
+                    self._pool = None
+            if rounds is not None:
+                self.rounds = rounds
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,45 @@
+from config import get_json_path
+
+# Data manager backends by name, for the scripts and tests running the
+# same operations on every backend. The web app always uses the sqlite
+# backend, its blueprints need ORM entries, while the json backend
+# gives users with their movies as dicts.
+_backends = {}
+
+
+def register_backend(name, factory) -> None:
+    """Registers a data manager backend,
+    factory(**options) returns a new data manager"""
+    _backends[name] = factory
+
+
+def get_backend_names() -> list:
+    """Returns the names of the registered backends"""
+    return list(_backends)
+
+
+def create_data_manager(backend_name, **options):
+    """Returns a new data manager of the backend_name backend"""
+    if backend_name not in _backends:
+        raise ValueError(f"Unknown data manager backend {backend_name}, "
+                         f"expected one of {get_backend_names()}")
+    return _backends[backend_name](**options)
+
+
+def create_sqlite_data_manager(db_session=None):
+    """Returns a sqlite data manager, on the app session by default"""
+    from data_manager.dm_sqlite import SqliteDataManager
+    if db_session is None:
+        from my_app import db
+        db_session = db.session
+    return SqliteDataManager(db_session)
+
+
+def create_json_data_manager(filename=None, **options):
+    """Returns a json data manager, on the data folder file by default"""
+    from data_manager.dm_json import JSONDataManager
+    return JSONDataManager(filename or get_json_path(), **options)
+
+
+register_backend("sqlite", create_sqlite_data_manager)
+register_backend("json", create_json_data_manager)
@@ -0,0 +1,21 @@
+from sqlalchemy import event
+
+
+def set_sqlite_pragmas(dbapi_connection, pragmas: dict) -> None:
+    """Sets the provided pragmas on a sqlite connection"""
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+def apply_storage_profile(engine, profile: dict) -> None:
+    """Sets the pragmas of a storage profile on every new connection
+    of the engine"""
+    pragmas = profile.get("pragmas")
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, _connection_record):
+        set_sqlite_pragmas(dbapi_connection, pragmas)
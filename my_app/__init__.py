@@ -1,32 +1,103 @@
-from flask import Flask
+from flask import Flask, current_app
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
+from werkzeug.local import LocalProxy
 from config import get_sqlite_db_uri, SECRET_KEY,\
-    get_folder_path_in_root_by_name
+    get_folder_path_in_root_by_name, get_storage_profile, INSTRUMENTATION
+from data_manager.sqlite_profile import apply_storage_profile
 
 
-app = Flask(__name__,
-            static_folder=get_folder_path_in_root_by_name("static"),
-            template_folder=get_folder_path_in_root_by_name("templates"))
-
-app.config['SQLALCHEMY_DATABASE_URI'] = get_sqlite_db_uri()
-app.secret_key = SECRET_KEY
-
-bcrypt = Bcrypt(app)
-db = SQLAlchemy(app)
-login_manager = LoginManager(app)
+db = SQLAlchemy()
+login_manager = LoginManager()
 login_manager.login_view = "auth.login"
 login_manager.login_message_category = "danger"
 
 
-# Registering blueprints
-from my_app.auth.routes import auth_bp
-from my_app.main.routes import main_bp
-from my_app.user.routes import user_bp
-from my_app.api.routes import api_bp
+def get_data_manager():
+    """Returns the data manager of the current app,
+    one instance shared by all its blueprints"""
+    return current_app.extensions["data_manager"]
+
+
+# The data manager of the current app, for the blueprints
+dm = LocalProxy(get_data_manager)
+
+
+def refresh_change_versions():
+    """Reads the data versions changed by any process since
+    the last request, before caches are looked up"""
+    get_data_manager().refresh_change_versions()
+
+
+def create_app(config_overrides=None) -> Flask:
+    """Returns a new app on the configured database, brought up to date.
+    Blueprints are imported here, so importing the package stays cheap,
+    and the OMDb client and the bcrypt pool load on first use."""
+    app = Flask(__name__,
+                static_folder=get_folder_path_in_root_by_name("static"),
+                template_folder=get_folder_path_in_root_by_name("templates"))
+
+    storage_profile = get_storage_profile()
+    app.config['SQLALCHEMY_DATABASE_URI'] = get_sqlite_db_uri()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = \
+        dict(storage_profile["engine_options"])
+    app.secret_key = SECRET_KEY
+    app.config.update(config_overrides or {})
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    with app.app_context():
+        apply_storage_profile(db.engine, storage_profile)
+
+    from data_manager.registry import create_sqlite_data_manager
+    app.extensions["data_manager"] = create_sqlite_data_manager()
+
+    # Caches and background jobs of the app, on its own database
+    from my_app.render_cache import RenderCache
+    from my_app.user_cache import UserCache
+    from my_app.jobs import AddMovieJobQueue
+
+    app.extensions["render_cache"] = RenderCache()
+    app.extensions["user_cache"] = UserCache()
+    app.extensions["add_movie_jobs"] = AddMovieJobQueue()
+
+    # Cached movie boxes for the movies grids
+    from my_app.render_cache import render_movie_box
+
+    app.add_template_global(render_movie_box)
+
+    # Proxied image urls
+    from my_app.images.routes import poster_url, flag_url, avatar_url
+
+    app.add_template_global(poster_url)
+    app.add_template_global(flag_url)
+    app.add_template_global(avatar_url)
+
+    # Registering blueprints
+    from my_app.auth.routes import auth_bp
+    from my_app.main.routes import main_bp
+    from my_app.user.routes import user_bp
+    from my_app.api.routes import api_bp
+    from my_app.images.routes import images_bp
+
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(main_bp)
+    app.register_blueprint(user_bp)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(images_bp)
+
+    # Bringing database schema up to date
+    from data_manager.migrations import migrate
+
+    with app.app_context():
+        migrate(db.engine, db.metadata)
+    app.before_request(refresh_change_versions)
+
+    # Opt-in request instrumentation, not even imported when disabled
+    if INSTRUMENTATION:
+        from my_app.instrumentation import init_instrumentation
+
+        with app.app_context():
+            init_instrumentation(app, db.engine)
 
-app.register_blueprint(auth_bp)
-app.register_blueprint(main_bp)
-app.register_blueprint(user_bp)
-app.register_blueprint(api_bp)
+    return app
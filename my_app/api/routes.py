@@ -1,9 +1,23 @@
-from flask import Blueprint, jsonify, request
-from my_app import db
-from data_manager.dm_sqlite import SqliteDataManager, User
+import csv
+import io
+import click
+from flask import Blueprint, jsonify, request, url_for, Response, \
+    stream_with_context, current_app
+from my_app.jobs import add_movie_jobs, DONE
+from my_app.pagination import get_page_args, get_next_after_id, \
+    get_offset_page_args
+from my_app.http_cache import conditional_get
+from my_app.render_cache import render_cache
+from my_app.user_cache import user_cache
+from my_app.image_cache import get_image_cache
+from my_app.api.serializers import USER_FIELDS, MOVIE_FIELDS, get_columns, \
+    encode_rows, stream_rows
+from data_manager.dm_sqlite import Movie
+from my_app import dm
+from config import API_MAX_PAGE_SIZE, ADD_MOVIE_ASYNC, \
+    BULK_IMPORT_WORKERS, BULK_IMPORT_MAX_ITEMS, SEARCH_PAGE_SIZE
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
-dm = SqliteDataManager(db.session)
 ADD_MOVIE_FIELDS = ["title", "release_year"]
 ADD_USER_FIELDS = ["name", "email", "password", "repeat_password"]
 
@@ -40,24 +54,102 @@ def serialize_user_object(user_object):
     }
 
 
+def parse_movies_csv(text):
+    """Returns a list of (title, release_year) tuples from csv text,
+    one movie per row with an optional release year column,
+    a "title" header row is skipped"""
+    movies_list = []
+    for row in csv.reader(io.StringIO(text)):
+        if not row or not row[0].strip() or \
+                (not movies_list and row[0].strip().lower() == "title"):
+            continue
+        year = row[1].strip() if len(row) > 1 and row[1].strip() else None
+        movies_list.append((row[0], year))
+    return movies_list
+
+
+def parse_movies_json(json_request):
+    """Returns a list of (title, release_year) tuples from json request,
+    accepts a list, or a dict with "titles" list, of title strings
+    or of objects with "title" and optional "release_year" keys"""
+    if isinstance(json_request, dict):
+        json_request = json_request.get("titles")
+    if not isinstance(json_request, list):
+        raise ValueError("Expected a list of titles")
+
+    movies_list = []
+    for item in json_request:
+        if isinstance(item, str):
+            movies_list.append((item, None))
+        elif isinstance(item, dict) and validate_data(item, ADD_MOVIE_FIELDS) \
+                and isinstance(item.get("title"), str):
+            movies_list.append((item["title"], item.get("release_year")))
+        else:
+            raise ValueError(f"Invalid movie item: {item}")
+    return movies_list
+
+
+def json_response(body, status=200):
+    """Returns a json response of already encoded body,
+    or of a generator streaming it"""
+    return Response(body, status=status, mimetype="application/json")
+
+
 @api_bp.route('/users', methods=["GET"])
+@conditional_get("users")
 def get_users():
-    """Returns all users from database to user"""
-    users = dm.get_all_entries_db(User)
-    users_json = []
-    for user in users:
-        users_json.append(serialize_user_object(user))
-    return jsonify(users_json)
+    """Returns users from database to user.
+    With "limit" and/or "after_id" query params returns a single page,
+    the next page url is sent in the "Link" response header.
+    Without them streams all users as one json array."""
+    columns = get_columns(USER_FIELDS)
+    if "limit" not in request.args and "after_id" not in request.args:
+        users = dm.iter_rows(columns)
+        return json_response(stream_with_context(
+            stream_rows(USER_FIELDS, users)))
+
+    limit, after_id = get_page_args(API_MAX_PAGE_SIZE)
+    users = dm.get_rows_page(columns, limit, after_id)
+    response = json_response(encode_rows(USER_FIELDS, users))
+    next_after_id = get_next_after_id(users, limit)
+    if next_after_id is not None:
+        next_url = url_for("api.get_users", limit=limit,
+                           after_id=next_after_id, _external=True)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
 
 
 @api_bp.route('/user/<int:user_id>', methods=["GET"])
+@conditional_get("user:{user_id}")
 def get_user_movies(user_id):
-    """Returns all favorite movies of specified user"""
-    user_movies = [movie for _, movie, __ in dm.get_user_movies(user_id)]
-    user_movies_json = []
-    for movie in user_movies:
-        user_movies_json.append(serialize_movie_object(movie))
-    return jsonify(user_movies_json)
+    """Returns all favorite movies of specified user,
+    streamed as one json array"""
+    movies = dm.iter_user_movie_rows(user_id, get_columns(MOVIE_FIELDS))
+    return json_response(stream_with_context(
+        stream_rows(MOVIE_FIELDS, movies)))
+
+
+@api_bp.route('/search', methods=["GET"])
+@conditional_get("movies")
+def search_movies():
+    """Returns movies matching the "q" query param in name, director,
+    genre or country, best matches first, the last word matches as
+    the beginning of a word.
+    Paginated with "limit" and "page" query params,
+    the next page url is sent in the "Link" response header."""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Missing search query \"q\""}), 400
+
+    limit, page, offset = get_offset_page_args(SEARCH_PAGE_SIZE)
+    movies = dm.search_movies(query, limit + 1, offset)
+    response = jsonify([serialize_movie_object(movie)
+                        for movie in movies[:limit]])
+    if len(movies) > limit:
+        next_url = url_for("api.search_movies", q=query, limit=limit,
+                           page=page + 1, _external=True)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
 
 
 @api_bp.route('/user/<int:user_id>/add_movie', methods=["POST"])
@@ -65,11 +157,21 @@ def add_user_movie(user_id):
     """Adds favorite movie to user, if movie not in db, gets it from api
     The request body should be in json and must have "title" key,
     also the request might have the optional key "release_year".
-    Any other keys in request body will cause an error."""
+    Any other keys in request body will cause an error.
+    In async mode (ADD_MOVIE_ASYNC config, or "async=true" query param)
+    the lookup runs in the background and a job is returned with 202,
+    its status can be polled at the job url."""
     new_movie_json = request.get_json()
     if not validate_data(new_movie_json, ADD_MOVIE_FIELDS):
         return jsonify({"error": "Bad Request"}), 400
 
+    if request.args.get("async", str(ADD_MOVIE_ASYNC)).lower() in \
+            ("1", "true"):
+        job = add_movie_jobs.submit(current_app._get_current_object(),
+                                    user_id, new_movie_json)
+        job_url = url_for("api.get_job", job_id=job["id"])
+        return jsonify(job), 202, {"Location": job_url}
+
     try:
         new_movie = dm.add_user_movie(user_id, new_movie_json)
         return jsonify(serialize_movie_object(new_movie)), 201
@@ -78,6 +180,78 @@ def add_user_movie(user_id):
         return jsonify({"error": str(error)})
 
 
+@api_bp.route('/user/<int:user_id>/movies:batch', methods=["POST"])
+def add_user_movies_batch(user_id):
+    """Adds many favorite movies to user in a single transaction,
+    movies missing from db are fetched from api concurrently.
+    The request body is either json, a list of titles or of objects with
+    "title" and optional "release_year" keys, or text/csv with
+    a title and an optional release year per row.
+    Returns a report with counts, per title errors and throughput."""
+    try:
+        if request.mimetype == "text/csv":
+            movies_list = parse_movies_csv(request.get_data(as_text=True))
+        else:
+            movies_list = parse_movies_json(request.get_json())
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    if len(movies_list) > BULK_IMPORT_MAX_ITEMS:
+        return jsonify({"error": f"Too many movies, the limit is "
+                                 f"{BULK_IMPORT_MAX_ITEMS}"}), 413
+    if dm.get_entry_by_id(user_id) is None:
+        return jsonify({"error": "User not found"}), 404
+
+    report = dm.bulk_add_user_movies(user_id, movies_list)
+    return jsonify(report)
+
+
+@api_bp.cli.command("import-movies")
+@click.argument("user_id", type=int)
+@click.argument("csv_file", type=click.File("r", encoding="utf-8"))
+@click.option("--workers", default=BULK_IMPORT_WORKERS, show_default=True,
+              help="Max parallel api requests.")
+def import_movies_command(user_id, csv_file, workers):
+    """Imports favorite movies of USER_ID from CSV_FILE,
+    one title and an optional release year per row."""
+    if dm.get_entry_by_id(user_id) is None:
+        raise click.ClickException(f"User {user_id} not found")
+
+    report = dm.bulk_add_user_movies(user_id, parse_movies_csv(
+        csv_file.read()), max_workers=workers)
+    for error in report["errors"]:
+        click.echo(f"Failed: {error['title']} - {error['error']}", err=True)
+    click.echo(f"Imported {report['added']} of {report['requested']} movies "
+               f"({report['new_movies']} new, {report['already_favorite']} "
+               f"already favorite, {report['failed']} failed) in "
+               f"{report['elapsed_seconds']}s, "
+               f"{report['items_per_second']} movies/s")
+
+
+@api_bp.route('/jobs/<job_id>', methods=["GET"])
+def get_job(job_id):
+    """Returns the status of a background add movie job,
+    when the job is done includes the added movie"""
+    job = add_movie_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] == DONE:
+        movie = dm.get_entry_by_id(job["movie_id"], db_model=Movie)
+        job["movie"] = serialize_movie_object(movie)
+    return jsonify(job)
+
+
+@api_bp.route('/cache_stats', methods=["GET"])
+def get_cache_stats():
+    """Returns hit rates and sizes of the in-process caches"""
+    return jsonify({
+        "image_cache": get_image_cache().stats(),
+        "movie_catalog": dm.movie_catalog.stats(),
+        "render_cache": render_cache.stats(),
+        "user_cache": user_cache.stats()
+    })
+
+
 @api_bp.route('/add_user', methods=["POST"])
 def add_user():
     """Signs new user to database, request body must be in json,
@@ -89,7 +263,7 @@ def add_user():
         return jsonify({"error": "Bad Request"}), 400
 
     try:
-        new_user = dm.add_user(new_user_json, api=True)
+        new_user = dm.add_user(new_user_json)
         return jsonify(serialize_user_object(new_user)), 201
 
     except ValueError as error:
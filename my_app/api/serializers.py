@@ -0,0 +1,79 @@
+import json
+from my_app.models.data_models import User, Movie
+from config import JSON_ENCODER, STREAM_BATCH_SIZE
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Api response keys and the columns they are selected from,
+# the id column must be first for keyset pagination
+USER_FIELDS = (
+    ("id", User.id),
+    ("name", User.name),
+    ("email", User.email)
+)
+MOVIE_FIELDS = (
+    ("id", Movie.id),
+    ("name", Movie.name),
+    ("release_year", Movie.release_year),
+    ("director", Movie.director),
+    ("genre", Movie.genre),
+    ("imdb_rating", Movie.imdb_rating),
+    ("country", Movie.country),
+    ("img_url", Movie.img),
+    ("imdb_id", Movie.imdb_id)
+)
+
+
+def get_columns(fields):
+    """Returns the columns to select for fields"""
+    return [column for _, column in fields]
+
+
+def std_json_dumps(data) -> bytes:
+    """Encodes data with the standard library json module"""
+    return json.dumps(data, separators=(",", ":"),
+                      ensure_ascii=False).encode()
+
+
+def get_json_encoder(encoder_name=JSON_ENCODER):
+    """Returns a function encoding data to json bytes, "orjson" or "json",
+    "auto" picks orjson if it is installed"""
+    if encoder_name in ("auto", "orjson") and orjson is not None:
+        return orjson.dumps
+    if encoder_name == "orjson":
+        raise ImportError("JSON_ENCODER is orjson, but it is not installed")
+    return std_json_dumps
+
+
+json_encoder = get_json_encoder()
+
+
+def rows_to_dicts(fields, rows) -> list:
+    """Converts selected rows to dictionaries with the fields keys"""
+    keys = [key for key, _ in fields]
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def encode_rows(fields, rows) -> bytes:
+    """Encodes selected rows as a json array of objects"""
+    return json_encoder(rows_to_dicts(fields, rows))
+
+
+def stream_rows(fields, rows, batch_size=STREAM_BATCH_SIZE):
+    """Generates a json array of objects from rows, encoded batch_size
+    rows at a time, so the whole array is never held in memory"""
+    yield b"["
+    separator = b""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield separator + encode_rows(fields, batch)[1:-1]
+            separator = b","
+            batch = []
+    if batch:
+        yield separator + encode_rows(fields, batch)[1:-1]
+    yield b"]"
@@ -1,16 +1,16 @@
 from flask import Blueprint, request, render_template, redirect, url_for, flash
 from flask_login import logout_user, login_user, login_required, current_user
-from my_app import db, login_manager
-from data_manager.dm_sqlite import SqliteDataManager
+from my_app import db, login_manager, dm
+from my_app.user_cache import user_cache
 
 auth_bp = Blueprint('auth', __name__)
-dm = SqliteDataManager(db.session)
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Fetches user by id from database and loads it to session"""
-    return dm.get_entry_by_id(user_id)
+    """Loads user by id to session, from the users cache
+    or otherwise from database"""
+    return user_cache.load(db.session, user_id, dm.get_entry_by_id)
 
 
 @auth_bp.route('/register', methods=["GET", "POST"])
@@ -24,10 +24,13 @@ def register():
         flash("You are already logged in.", "info")
         return redirect(url_for("main.home"))
     if request.method == "POST":
-        new_user = dm.add_user(request.form)
-        if new_user:
+        try:
+            new_user = dm.add_user(request.form)
+            flash(f"Successfully registered {new_user}", "success")
             login_user(new_user)
             return redirect(url_for("main.home"))
+        except ValueError as error:
+            flash(str(error), "danger")
     return render_template("auth/register.html")
 
 
@@ -0,0 +1,56 @@
+import functools
+import hashlib
+from flask import request, session, make_response
+from flask_login import current_user
+from my_app import dm
+from config import API_CACHE_CONTROL, PAGES_CACHE_CONTROL
+
+
+def make_etag(*parts) -> str:
+    """Returns a strong etag value from parts"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+
+def conditional_get(*version_keys, per_user=False,
+                    cache_control=API_CACHE_CONTROL):
+    """Decorates a GET view with ETag and If-None-Match support.
+    The etag is derived from the change versions of version_keys,
+    which are formatted with the view arguments ("user:{user_id}"),
+    and from the request query string. Versions are stored with the data,
+    so every process gives the same etag for the same data.
+    With per_user the logged-in user is part of the etag too,
+    for pages which show it.
+    A matching If-None-Match is answered with 304 before the view runs."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            keys = [key.format(**kwargs) for key in version_keys]
+            parts = [request.endpoint,
+                     request.query_string,
+                     dm.change_versions.get_many(*keys)]
+            if per_user:
+                # Pending flash messages must be shown, never 304
+                if "_flashes" in session:
+                    return make_response(view(*args, **kwargs))
+                parts.append(current_user.get_id())
+            etag = make_etag(*parts)
+
+            if request.if_none_match.contains(etag):
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = cache_control
+            if per_user:
+                response.vary.add("Cookie")
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_page(*version_keys):
+    """conditional_get for html pages, which depend on the logged-in user"""
+    return conditional_get(*version_keys, per_user=True,
+                           cache_control=PAGES_CACHE_CONTROL)
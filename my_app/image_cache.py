@@ -0,0 +1,225 @@
+import hashlib
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from config import get_image_cache_path, IMAGE_CACHE_OFFLINE, \
+    IMAGE_FETCH_TIMEOUT, IMAGE_MAX_BYTES, IMAGE_VARIANTS, \
+    IMAGE_FETCH_RETRY_AFTER
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+ORIGINAL = "full"
+
+
+class ImageCache:
+    """Disk cache of images, fetched once from their source url.
+    Image files are content-addressed, stored by the sha256 of their
+    bytes, so an image shared by many sources is stored once.
+    An index in a local sqlite file maps (source, variant) to a file.
+    Resized variants are made from the original with Pillow,
+    when it is installed."""
+    def __init__(self, path, offline=IMAGE_CACHE_OFFLINE,
+                 timeout=IMAGE_FETCH_TIMEOUT, max_bytes=IMAGE_MAX_BYTES,
+                 variants=IMAGE_VARIANTS,
+                 retry_after=IMAGE_FETCH_RETRY_AFTER, session=None):
+        self.path = path
+        self.offline = offline
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.variants = variants
+        self.retry_after = retry_after
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.errors = 0
+        self._session = session
+        self._lock = threading.Lock()
+        # Failed sources and the time of their last failed fetch
+        self._failures = {}
+        os.makedirs(os.path.join(path, "objects"), exist_ok=True)
+        self._connection = sqlite3.connect(os.path.join(path, "index.sqlite"),
+                                           check_same_thread=False,
+                                           isolation_level=None)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                source TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                mimetype TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (source, variant)
+            )
+        """)
+
+    @property
+    def resizing(self) -> bool:
+        """True if variants are resized, Pillow is installed"""
+        return Image is not None
+
+    def get_file_path(self, digest: str) -> str:
+        """Returns the path of the image file with digest"""
+        return os.path.join(self.path, "objects", digest[:2], digest)
+
+    def store_bytes(self, data: bytes) -> str:
+        """Writes image bytes to their content-addressed file,
+        unless it exists, and returns their digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        file_path = self.get_file_path(digest)
+        if not os.path.exists(file_path):
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            file_descriptor, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(file_path))
+            with os.fdopen(file_descriptor, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, file_path)
+        return digest
+
+    def lookup(self, source: str, variant: str):
+        """Returns the cached (digest, mimetype) of source variant,
+        or None if it is not cached"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT digest, mimetype FROM images "
+                "WHERE source = ? AND variant = ?", (source, variant)
+            ).fetchone()
+        if row is None or not os.path.exists(self.get_file_path(row[0])):
+            return None
+        return row
+
+    def save(self, source: str, variant: str, digest: str,
+             mimetype: str) -> None:
+        """Maps source variant to the image file with digest"""
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO images "
+                "(source, variant, digest, mimetype, stored_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (source, variant, digest, mimetype, time.time()))
+
+    def fetch(self, url: str):
+        """Downloads an image, returns (bytes, mimetype),
+        or None if it is not an image, too large, or the request failed.
+        A failed url is not fetched again for retry_after seconds."""
+        failed_at = self._failures.get(url)
+        if failed_at is not None and \
+                time.monotonic() - failed_at < self.retry_after:
+            return None
+        # Imported on the first fetch, offline caches never need them
+        import requests
+        with self._lock:
+            if self._session is None:
+                from apis.omdb_api import create_api_session
+                self._session = create_api_session()
+        self.fetches += 1
+        try:
+            with self._session.get(url, timeout=self.timeout,
+                                   stream=True) as response:
+                response.raise_for_status()
+                mimetype = response.headers.get("Content-Type", "")\
+                    .split(";")[0].strip()
+                if not mimetype.startswith("image/"):
+                    raise ValueError(f"Not an image: {mimetype}")
+                data = response.raw.read(self.max_bytes + 1,
+                                         decode_content=True)
+                if len(data) > self.max_bytes:
+                    raise ValueError("Image too large")
+        except (requests.exceptions.RequestException, ValueError):
+            self.errors += 1
+            self._failures[url] = time.monotonic()
+            return None
+        self._failures.pop(url, None)
+        return data, mimetype
+
+    def resize(self, data: bytes, size):
+        """Returns (bytes, mimetype) of the image shrunk to fit in size,
+        or None if it already fits or can't be resized"""
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                if image.width <= size[0] and image.height <= size[1]:
+                    return None
+                image.thumbnail(size)
+                output = io.BytesIO()
+                image.save(output, format="WEBP", quality=80)
+        except (OSError, ValueError, KeyError, Image.DecompressionBombError):
+            # Not an image, or too many pixels to decode safely
+            return None
+        return output.getvalue(), "image/webp"
+
+    def get(self, source: str, variant=ORIGINAL, loader=None):
+        """Returns (file path, digest, mimetype) of source variant,
+        the original is loaded with loader(source), by default fetched
+        from the source url unless offline. Returns None if the image
+        is not cached and can't be loaded."""
+        cached = self.lookup(source, variant)
+        if cached is not None:
+            self.hits += 1
+            return self.get_file_path(cached[0]), *cached
+        self.misses += 1
+
+        original = self.lookup(source, ORIGINAL)
+        if original is None:
+            if loader is None and self.offline:
+                return None
+            loaded = (loader or self.fetch)(source)
+            if loaded is None:
+                return None
+            data, mimetype = loaded
+            original = self.store_bytes(data), mimetype
+            self.save(source, ORIGINAL, *original)
+        if variant == ORIGINAL:
+            return self.get_file_path(original[0]), *original
+
+        if Image is None:
+            # Not saved, the variant is made once Pillow is installed
+            return self.get_file_path(original[0]), *original
+
+        with open(self.get_file_path(original[0]), "rb") as image_file:
+            resized = self.resize(image_file.read(), self.variants[variant])
+        image = original if resized is None else \
+            (self.store_bytes(resized[0]), resized[1])
+        self.save(source, variant, *image)
+        return self.get_file_path(image[0]), *image
+
+    def clear(self) -> None:
+        """Removes all cached entries, image files are kept on disk"""
+        with self._lock:
+            self._connection.execute("DELETE FROM images")
+        self._failures.clear()
+
+    def stats(self) -> dict:
+        """Returns cache counters and current size"""
+        with self._lock:
+            size, files = self._connection.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT digest) FROM images"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "fetches": self.fetches,
+            "errors": self.errors,
+            "size": size,
+            "files": files,
+            "offline": self.offline,
+            "resizing": self.resizing
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageCache:
+    """Returns the process wide image cache, created on first use"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ImageCache(get_image_cache_path())
+        return _default_cache
@@ -0,0 +1,180 @@
+import functools
+import hashlib
+import mimetypes
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+import click
+from flask import Blueprint, abort, send_file, url_for, current_app
+from my_app.image_cache import get_image_cache
+from data_manager.dm_sqlite import Movie, User
+from my_app import dm
+from config import IMAGE_VARIANTS, IMAGE_CACHE_MAX_AGE, IMAGE_SEED_WORKERS, \
+    FLAG_IMAGE_URL, DEFAULT_AVATAR_IMAGE, IMAGE_UNRESIZED_MAX_AGE
+
+images_bp = Blueprint("images", __name__, url_prefix="/images")
+ALPHA_2_PATTERN = re.compile(r"[A-Z]{2}")
+
+
+def is_remote_image(url) -> bool:
+    """True if url is an http(s) image url, OMDb uses "N/A"
+    for movies without a poster"""
+    return bool(url) and url.startswith(("http://", "https://"))
+
+
+def get_source_version(source: str) -> str:
+    """Returns a short hash of source, image urls include it so they
+    change when the source changes, and can be cached forever"""
+    return hashlib.sha1(source.encode()).hexdigest()[:10]
+
+
+def poster_url(movie, variant="grid") -> str:
+    """Returns the proxied url of a movie poster variant"""
+    return url_for("images.poster", movie_id=movie.id, variant=variant,
+                   v=get_source_version(movie.img or ""))
+
+
+def flag_url(alpha_2):
+    """Returns the proxied url of a country flag,
+    or None for an unknown country"""
+    if not alpha_2:
+        return None
+    return url_for("images.flag", alpha_2=alpha_2,
+                   v=get_source_version(FLAG_IMAGE_URL.format(
+                       alpha_2=alpha_2)))
+
+
+def avatar_url(user, variant="avatar") -> str:
+    """Returns the proxied url of a user profile image variant,
+    or of the default avatar"""
+    if not is_remote_image(user.profile_img):
+        return url_for("images.default_avatar", variant=variant,
+                       v=get_static_file_version(current_app.static_folder,
+                                                 DEFAULT_AVATAR_IMAGE))
+    return url_for("images.avatar", user_id=user.id, variant=variant,
+                   v=get_source_version(user.profile_img))
+
+
+@functools.lru_cache(maxsize=16)
+def get_static_file_version(static_folder, file_name) -> str:
+    """Returns a short hash of a static file content, read once,
+    static files change with a new release of the app"""
+    with open(os.path.join(static_folder, file_name), "rb") as static_file:
+        return hashlib.sha1(static_file.read()).hexdigest()[:10]
+
+
+def get_default_avatar_source() -> str:
+    """Returns the image cache source of the bundled default avatar,
+    with its version, so a new avatar file is not served from cache"""
+    version = get_static_file_version(current_app.static_folder,
+                                      DEFAULT_AVATAR_IMAGE)
+    return f"{DEFAULT_AVATAR_IMAGE}?v={version}"
+
+
+def load_default_avatar(source):
+    """Returns (bytes, mimetype) of the bundled default avatar"""
+    file_name = source.partition("?")[0]
+    with open(os.path.join(current_app.static_folder, file_name), "rb") \
+            as image_file:
+        return image_file.read(), mimetypes.guess_type(file_name)[0]
+
+
+def send_image(source, variant, loader=None):
+    """Returns the cached image of source variant, with headers caching it
+    for a long time, image urls change with their source. Originals served
+    for resized variants without Pillow are only cached for a short time.
+    Aborts with 404 if the image can't be loaded."""
+    if variant not in IMAGE_VARIANTS:
+        abort(404)
+    image_cache = get_image_cache()
+    image = image_cache.get(source, variant, loader)
+    if image is None:
+        abort(404)
+
+    final = IMAGE_VARIANTS[variant] is None or image_cache.resizing
+    file_path, digest, mimetype = image
+    response = send_file(file_path, mimetype=mimetype, etag=digest,
+                         max_age=IMAGE_CACHE_MAX_AGE if final
+                         else IMAGE_UNRESIZED_MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = final
+    return response
+
+
+@images_bp.route('/poster/<int:movie_id>/<variant>')
+def poster(movie_id, variant):
+    """Returns a variant of the poster of a movie"""
+    movie = dm.get_entry_by_id(movie_id, db_model=Movie)
+    if movie is None or not is_remote_image(movie.img):
+        abort(404)
+    return send_image(movie.img, variant)
+
+
+@images_bp.route('/flag/<alpha_2>')
+def flag(alpha_2):
+    """Returns the flag of a country by its 2-letter code"""
+    if not ALPHA_2_PATTERN.fullmatch(alpha_2):
+        abort(404)
+    return send_image(FLAG_IMAGE_URL.format(alpha_2=alpha_2), "full")
+
+
+@images_bp.route('/avatar/<int:user_id>/<variant>')
+def avatar(user_id, variant):
+    """Returns a variant of the profile image of a user"""
+    user = dm.get_entry_by_id(user_id)
+    if user is None or not is_remote_image(user.profile_img):
+        abort(404)
+    return send_image(user.profile_img, variant)
+
+
+@images_bp.route('/avatar/default/<variant>')
+def default_avatar(variant):
+    """Returns a variant of the bundled default avatar"""
+    return send_image(get_default_avatar_source(), variant,
+                      load_default_avatar)
+
+
+def get_seed_sources():
+    """Returns the (source, variants, loader) of every image
+    the pages can show"""
+    sources = [(get_default_avatar_source(), IMAGE_VARIANTS,
+                load_default_avatar)]
+    alpha_2_codes = set()
+    for _, img, alpha_2 in dm.iter_rows([Movie.id, Movie.img,
+                                         Movie.country_alpha_2]):
+        if is_remote_image(img):
+            sources.append((img, ("full", "grid"), None))
+        if alpha_2 and ALPHA_2_PATTERN.fullmatch(alpha_2):
+            alpha_2_codes.add(alpha_2)
+    for alpha_2 in sorted(alpha_2_codes):
+        sources.append((FLAG_IMAGE_URL.format(alpha_2=alpha_2),
+                        ("full",), None))
+    for _, profile_img in dm.iter_rows([User.id, User.profile_img]):
+        if is_remote_image(profile_img):
+            sources.append((profile_img, ("avatar",), None))
+    return sources
+
+
+@images_bp.cli.command("seed")
+@click.option("--workers", default=IMAGE_SEED_WORKERS, show_default=True,
+              help="Max parallel image downloads.")
+def seed_images_command(workers):
+    """Fetches the posters, flags and avatars of all movies and users
+    into the image cache, so the app can serve them offline."""
+    image_cache = get_image_cache()
+    app = current_app._get_current_object()
+
+    def seed_source(source, variants, loader):
+        with app.app_context():
+            return all(image_cache.get(source, variant, loader) is not None
+                       for variant in variants)
+
+    sources = get_seed_sources()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(lambda args: seed_source(*args),
+                                    sources))
+    for (source, _, __), cached in zip(sources, results):
+        if not cached:
+            click.echo(f"Failed: {source}", err=True)
+    click.echo(f"Cached {sum(results)} of {len(sources)} images "
+               f"in {image_cache.path}")
@@ -0,0 +1,271 @@
+import functools
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from flask import Response, g, request, has_request_context, \
+    before_render_template, template_rendered
+from sqlalchemy import event
+from apis.omdb_api import MovieAPIConnection
+from data_manager.passwords import PasswordHasher
+from config import N_PLUS_ONE_THRESHOLD, METRICS_DURATION_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+# Calls timed as sections of the request, (class, method name, section)
+TIMED_METHODS = [
+    (MovieAPIConnection, "get_request_from_api", "omdb"),
+    (PasswordHasher, "hash", "bcrypt"),
+    (PasswordHasher, "check", "bcrypt"),
+]
+
+
+def format_labels(labels) -> str:
+    """Returns labels, (name, value) pairs, in Prometheus text format"""
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"')
+               .replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value
+                          in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    """Process wide counters and histograms,
+    rendered in the Prometheus text exposition format"""
+    def __init__(self, buckets=METRICS_DURATION_BUCKETS):
+        self.buckets = buckets
+        self._counters = defaultdict(float)
+        # (name, labels) to [bucket counts, sum, count]
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels=(), value=1.0) -> None:
+        """Adds value to a counter"""
+        with self._lock:
+            self._counters[name, labels] += value
+
+    def observe(self, name, labels, value) -> None:
+        """Adds an observed value to a histogram"""
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = [[0] * len(self.buckets), 0.0, 0]
+                self._histograms[name, labels] = histogram
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render(self) -> str:
+        """Returns all metrics in Prometheus text format"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(counts), total, count))
+                                for key, (counts, total, count)
+                                in self._histograms.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{format_labels(labels)} {value:g}")
+        for (name, labels), (counts, total, count) in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            for bound, bucket_count in zip(self.buckets, counts):
+                bucket_labels = format_labels(labels + (("le", bound),))
+                lines.append(f"{name}_bucket{bucket_labels} {bucket_count}")
+            bucket_labels = format_labels(labels + (("le", "+Inf"),))
+            lines.append(f"{name}_bucket{bucket_labels} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total:g}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        """Resets all metrics"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+metrics = Metrics()
+
+
+class RequestProfile:
+    """Timings of the sections of one request, and its sql statements"""
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.sections = defaultdict(float)
+        self.statements = Counter()
+        self.template_starts = []
+
+    @property
+    def queries_count(self) -> int:
+        """Number of sql statements run"""
+        return sum(self.statements.values())
+
+    def get_n_plus_one(self, threshold=N_PLUS_ONE_THRESHOLD) -> dict:
+        """Returns the statements run at least threshold times,
+        with their counts"""
+        return {statement: count
+                for statement, count in self.statements.items()
+                if count >= threshold}
+
+    def get_server_timing(self, duration) -> str:
+        """Returns the Server-Timing header value, durations in ms"""
+        timings = [f"app;dur={duration * 1000:.2f}",
+                   f'sql;dur={self.sections["sql"] * 1000:.2f};'
+                   f'desc="{self.queries_count} queries"']
+        for section, seconds in self.sections.items():
+            if section != "sql":
+                timings.append(f"{section};dur={seconds * 1000:.2f}")
+        return ", ".join(timings)
+
+
+def get_profile():
+    """Returns the profile of the current request, or None
+    outside of requests, like in the bulk import threads"""
+    if not has_request_context():
+        return None
+    return g.get("profile")
+
+
+def record_section(section, seconds) -> None:
+    """Adds the time spent in a section to the current request
+    and to the section duration metric"""
+    profile = get_profile()
+    if profile is not None:
+        profile.sections[section] += seconds
+    metrics.observe("movieweb_section_duration_seconds",
+                    (("section", section),), seconds)
+
+
+def timed_method(method, section):
+    """Returns method wrapped to record its time as section"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started_at = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            record_section(section, time.perf_counter() - started_at)
+    wrapper.instrumented = True
+    return wrapper
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    """Marks the start of a sql statement"""
+    conn.info.setdefault("statement_starts", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context,
+                         executemany):
+    """Records the time and text of a finished sql statement"""
+    started_at = conn.info["statement_starts"].pop()
+    record_section("sql", time.perf_counter() - started_at)
+    profile = get_profile()
+    if profile is not None:
+        profile.statements[statement] += 1
+
+
+def handle_error(exception_context):
+    """Drops the start mark of a failed sql statement"""
+    starts = exception_context.connection.info.get("statement_starts") \
+        if exception_context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def before_template(sender, template, context, **extra):
+    """Marks the start of a template render"""
+    profile = get_profile()
+    if profile is not None:
+        profile.template_starts.append(time.perf_counter())
+
+
+def after_template(sender, template, context, **extra):
+    """Records the time of a finished template render"""
+    profile = get_profile()
+    if profile is not None and profile.template_starts:
+        record_section("template",
+                       time.perf_counter() - profile.template_starts.pop())
+
+
+def start_request_profile():
+    """Starts the profile of the request"""
+    g.profile = RequestProfile()
+
+
+def finish_request_profile(response):
+    """Adds the Server-Timing header, updates the request metrics
+    and logs the request as a json line. Streamed bodies are sent
+    after this, their time is not included."""
+    profile = g.pop("profile", None)
+    if profile is None:
+        return response
+    duration = time.perf_counter() - profile.started_at
+    endpoint = request.endpoint or "none"
+    n_plus_one = profile.get_n_plus_one()
+    response.headers["Server-Timing"] = profile.get_server_timing(duration)
+
+    metrics.inc("movieweb_http_requests_total",
+                (("endpoint", endpoint), ("method", request.method),
+                 ("status", response.status_code)))
+    metrics.observe("movieweb_http_request_duration_seconds",
+                    (("endpoint", endpoint),), duration)
+    metrics.inc("movieweb_db_queries_total", (("endpoint", endpoint),),
+                profile.queries_count)
+    if n_plus_one:
+        metrics.inc("movieweb_n_plus_one_requests_total",
+                    (("endpoint", endpoint),))
+
+    logger.log(logging.WARNING if n_plus_one else logging.INFO, json.dumps({
+        "method": request.method,
+        "path": request.path,
+        "endpoint": endpoint,
+        "status": response.status_code,
+        "duration_ms": round(duration * 1000, 3),
+        "queries": profile.queries_count,
+        "sections_ms": {section: round(seconds * 1000, 3)
+                        for section, seconds in profile.sections.items()},
+        "n_plus_one": [{"statement": statement[:200], "count": count}
+                       for statement, count in n_plus_one.items()]
+    }))
+    return response
+
+
+def metrics_view():
+    """Returns the metrics in Prometheus text format"""
+    return Response(metrics.render(),
+                    mimetype="text/plain; version=0.0.4")
+
+
+def init_instrumentation(app, engine) -> None:
+    """Installs the request, sql, template and timed methods hooks,
+    and the /metrics endpoint. Nothing is installed unless this is
+    called, so disabled instrumentation has no overhead."""
+    for cls, name, section in TIMED_METHODS:
+        method = getattr(cls, name)
+        if not getattr(method, "instrumented", False):
+            setattr(cls, name, timed_method(method, section))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+    before_render_template.connect(before_template, app)
+    template_rendered.connect(after_template, app)
+    app.before_request(start_request_profile)
+    app.after_request(finish_request_profile)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
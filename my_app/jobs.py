@@ -0,0 +1,100 @@
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from werkzeug.local import LocalProxy
+from config import ADD_MOVIE_WORKERS, ADD_MOVIE_MAX_FINISHED_JOBS
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class AddMovieJobQueue:
+    """Runs add movie requests in a background thread pool, so the
+    OMDb lookup doesn't block the request thread.
+    Jobs run in the process that queued them, their state is stored in
+    the add_movie_jobs table, so any worker process can report it.
+    Finished jobs are deleted oldest first above max_finished."""
+    def __init__(self, max_workers=ADD_MOVIE_WORKERS,
+                 max_finished=ADD_MOVIE_MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="add-movie")
+
+    @staticmethod
+    def _session() -> Session:
+        """Returns a new session on the database of the current app,
+        separate from the session of the request or the job"""
+        from my_app import db
+        return Session(db.engine)
+
+    def submit(self, app, user_id, form_dict) -> dict:
+        """Enqueues adding a movie to user favorites, returns the new job"""
+        from my_app.models.data_models import AddMovieJob
+
+        job = AddMovieJob(id=uuid.uuid4().hex, status=QUEUED,
+                          user_id=user_id, title=form_dict.get("title"),
+                          release_year=form_dict.get("release_year"),
+                          created_at=time.time())
+        queued_job = job.to_dict()
+        with self._session() as session, session.begin():
+            session.add(job)
+        self._executor.submit(self._run, app, queued_job["id"], user_id,
+                              dict(form_dict))
+        return queued_job
+
+    def get(self, job_id) -> dict:
+        """Returns the job as a dict, or None if job id is unknown"""
+        from my_app.models.data_models import AddMovieJob
+
+        with self._session() as session:
+            job = session.get(AddMovieJob, job_id)
+            return job.to_dict() if job else None
+
+    def _update(self, job_id, **changes):
+        from my_app.models.data_models import AddMovieJob
+
+        with self._session() as session, session.begin():
+            job = session.get(AddMovieJob, job_id)
+            for name, value in changes.items():
+                setattr(job, name, value)
+            if job.status in (DONE, FAILED):
+                job.finished_at = time.time()
+                kept_ids = select(AddMovieJob.id)\
+                    .where(AddMovieJob.finished_at.is_not(None))\
+                    .order_by(AddMovieJob.finished_at.desc())\
+                    .limit(self.max_finished)
+                session.execute(
+                    delete(AddMovieJob)
+                    .where(AddMovieJob.finished_at.is_not(None))
+                    .where(AddMovieJob.id.not_in(kept_ids)))
+
+    def _run(self, app, job_id, user_id, form_dict):
+        """Resolves the movie and links it to the user,
+        inside an app context with its own database session"""
+        from my_app import db, get_data_manager
+
+        with app.app_context():
+            self._update(job_id, status=RUNNING)
+            dm = get_data_manager()
+            try:
+                movie = dm.add_user_movie(user_id, form_dict)
+                self._update(job_id, status=DONE, movie_id=movie.id)
+            except ValueError as error:
+                db.session.rollback()
+                self._update(job_id, status=FAILED, error=str(error))
+            except Exception:  # pylint: disable=broad-except
+                db.session.rollback()
+                logger.exception("Add movie job %s failed", job_id)
+                self._update(job_id, status=FAILED, error="Internal error")
+
+
+# The add movie jobs of the current app
+add_movie_jobs = LocalProxy(lambda: current_app.extensions["add_movie_jobs"])
@@ -1,41 +1,106 @@
-from flask import Blueprint, render_template
+import click
+from flask import Blueprint, render_template, abort, request
 from flask_login import login_required
-from my_app import db
-from data_manager.dm_sqlite import SqliteDataManager, User, Movie
+from data_manager.dm_sqlite import User, Movie
+from my_app import dm
+from my_app.pagination import get_page_args, get_next_after_id, \
+    get_offset_page_args
+from my_app.render_cache import cached_render, render_fragment, \
+    render_user_movies_grid
+from my_app.http_cache import conditional_page
+from config import MOVIES_PAGE_SIZE, HOME_MOVIES_COUNT, SEARCH_PAGE_SIZE
 
 main_bp = Blueprint("main", __name__)
-dm = SqliteDataManager(db.session)
 
 
 @main_bp.route('/')
 @login_required
 def home():
-    """Renders home page"""
-    users = dm.get_all_entries_db(User)
-    movies = dm.get_all_entries_db(Movie)
-    return render_template("main/index.html", users=users, movies=movies[:10])
+    """Renders home page, the users and movies grids are cached
+    until users or movies change"""
+    def render_grids():
+        users = dm.get_all_entries_db(User)
+        movies = dm.get_movie_records_page(limit=HOME_MOVIES_COUNT)
+        movie_stats = dm.get_movies_stats(movie.id for movie in movies)
+        return (render_fragment("comp/users_grid.html", users=users),
+                render_fragment("comp/movies_grid.html", movies=movies,
+                                movie_stats=movie_stats))
+
+    users_grid, movies_grid = cached_render(
+        render_grids, "home",
+        *dm.change_versions.get_many("users", "movies", "movie_stats"))
+    return render_template("main/index.html", users_grid=users_grid,
+                           movies_grid=movies_grid)
 
 
 @main_bp.route('/all_movies')
+@conditional_page("movies", "movie_stats")
 def all_movies():
-    """Renders all movies page"""
-    movies = dm.get_all_entries_db(Movie)
-    return render_template("main/all_movies.html", movies=movies)
+    """Renders all movies page, one page of movies at a time,
+    optional query params: "limit" and "after_id" (last movie id seen)"""
+    limit, after_id = get_page_args(MOVIES_PAGE_SIZE)
+
+    def render_grid():
+        movies = dm.get_movie_records_page(limit, after_id)
+        movie_stats = dm.get_movies_stats(movie.id for movie in movies)
+        return (render_fragment("comp/movies_grid.html", movies=movies,
+                                movie_stats=movie_stats),
+                get_next_after_id(movies, limit))
+
+    movies_grid, next_after_id = cached_render(
+        render_grid, "all_movies", limit, after_id,
+        *dm.change_versions.get_many("movies", "movie_stats"))
+    return render_template("main/all_movies.html", movies_grid=movies_grid,
+                           limit=limit, next_after_id=next_after_id)
+
+
+@main_bp.route('/search')
+@conditional_page("movies", "movie_stats")
+def search():
+    """Renders movies matching the "q" query param, best matches first,
+    optional query params: "limit" and "page" (numbered from 1)"""
+    query = request.args.get("q", "").strip()
+    limit, page, offset = get_offset_page_args(SEARCH_PAGE_SIZE)
+    # One extra result tells if there is a next page
+    movies = dm.search_movies(query, limit + 1, offset)
+    has_next = len(movies) > limit
+    movies = movies[:limit]
+    movie_stats = dm.get_movies_stats(movie.id for movie in movies)
+    movies_grid = render_fragment("comp/movies_grid.html", movies=movies,
+                                  movie_stats=movie_stats)
+    return render_template("main/search.html", movies_grid=movies_grid,
+                           query=query, limit=limit, page=page,
+                           has_next=has_next)
 
 
 @main_bp.route('/user/<int:user_id>')
+@conditional_page("users", "user:{user_id}", "movie_stats")
 def user_public_profile(user_id):
     """Renders user public page"""
-    user_movies = dm.get_user_movies(user_id=user_id)
     public_user_page = dm.get_entry_by_id(user_id)
-    return render_template("user/profile.html", user_movies=user_movies, user=public_user_page)
+    if public_user_page is None:
+        abort(404)
+    movies_grid = render_user_movies_grid(dm, public_user_page)
+    return render_template("user/profile.html", movies_grid=movies_grid,
+                           user=public_user_page)
 
 
 @main_bp.route('/movie/<int:movie_id>')
+@conditional_page("movie:{movie_id}")
 def movie_page(movie_id):
-    """Renders movie public page"""
+    """Renders movie public page, with its favorites and reviews stats"""
     movie = dm.get_entry_by_id(movie_id, db_model=Movie)
-    return render_template("main/movie.html", movie=movie)
+    if movie is None:
+        abort(404)
+    return render_template("main/movie.html", movie=movie,
+                           stats=dm.get_movie_stats(movie_id))
+
+
+@main_bp.cli.command("rebuild-movie-stats")
+def rebuild_movie_stats_command():
+    """Recomputes the favorites and reviews stats of all movies."""
+    dm.rebuild_movie_stats()
+    click.echo("Movie stats rebuilt")
 
 
 @main_bp.app_errorhandler(404)
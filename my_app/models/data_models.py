@@ -1,5 +1,8 @@
 from flask_login import UserMixin
-from my_app import bcrypt, db
+from sqlalchemy.orm import validates
+from my_app import db
+from data_manager.passwords import password_hasher
+from apis.utils import normalize_title
 
 
 class Movie(db.Model):
@@ -10,16 +13,24 @@ class Movie(db.Model):
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String, nullable=False)
+    name_key = db.Column(db.String, unique=True, index=True)
     release_year = db.Column(db.String(4), nullable=False)
     director = db.Column(db.String, nullable=False)
 
-    imdb_id = db.Column(db.String)
+    imdb_id = db.Column(db.String, unique=True, index=True)
     imdb_rating = db.Column(db.Float)
     genre = db.Column(db.String)
     img = db.Column(db.String)
     country = db.Column(db.String)
     country_alpha_2 = db.Column(db.String(2))
 
+    @validates("name")
+    def validate_name(self, key, name):
+        """Keeps name_key, the normalized name used for lookups,
+        in sync with the movie name"""
+        self.name_key = normalize_title(name)
+        return name
+
     def __repr__(self):
         return f"<Movie(id = {self.id}, name = {self.name}, " \
                f"release_year = {self.release_year})>"
@@ -42,10 +53,10 @@ class User(UserMixin, db.Model):
 
     def __init__(self, email, password, name):
         self.email = email
-        self.password = bcrypt.generate_password_hash(password)
+        self.password = password_hasher.hash(password)
         self.name = name
-        self.profile_img = "https://cdn.pixabay.com/photo/2015/10/" \
-                           "05/22/37/blank-profile-picture-973460_1280.png"
+        # Users without a profile image get the bundled default avatar
+        self.profile_img = None
 
     def __repr__(self):
         return f"<User(id = {self.id}, email = {self.email})>"
@@ -64,7 +75,7 @@ class UserMovies(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"),
                         nullable=False)
     movie_id = db.Column(db.Integer, db.ForeignKey("movies.id"),
-                         nullable=False)
+                         nullable=False, index=True)
     review_id = db.Column(db.Integer, db.ForeignKey("reviews.id"),
                           nullable=True)
 
@@ -95,3 +106,72 @@ class Review(db.Model):
 
     def __str__(self):
         return f"review: {self.id}"
+
+
+class MovieStats(db.Model):
+    """
+    MovieStats model class, which sets the columns for "movie_stats" table.
+    Aggregates of movie favorites and reviews, kept up to date by
+    the data manager in the same transaction as the changes.
+    """
+    __tablename__ = "movie_stats"
+
+    movie_id = db.Column(db.Integer, db.ForeignKey("movies.id"),
+                         primary_key=True)
+    favorites_count = db.Column(db.Integer, nullable=False, default=0)
+    reviews_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+    @property
+    def rating_avg(self):
+        """Average review rating, None if the movie has no reviews"""
+        if not self.reviews_count:
+            return None
+        return self.rating_sum / self.reviews_count
+
+    def __repr__(self):
+        return f"<MovieStats(movie_id = {self.movie_id}, " \
+               f"favorites_count = {self.favorites_count})>"
+
+
+class ChangeVersion(db.Model):
+    """
+    ChangeVersion model class, which sets the columns for
+    "change_versions" table. The version of a data key is the value
+    of a database wide sequence when the data last changed,
+    see ChangeVersions.
+    """
+    __tablename__ = "change_versions"
+
+    key = db.Column(db.String, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<ChangeVersion(key = {self.key}, version = {self.version})>"
+
+
+class AddMovieJob(db.Model):
+    """
+    AddMovieJob model class, which sets the columns for "add_movie_jobs"
+    table. The state of background add movie jobs, stored in the database
+    so any worker process can report it, see AddMovieJobQueue.
+    """
+    __tablename__ = "add_movie_jobs"
+
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String)
+    release_year = db.Column(db.String)
+    movie_id = db.Column(db.Integer)
+    error = db.Column(db.String)
+    created_at = db.Column(db.Float, nullable=False)
+    finished_at = db.Column(db.Float, index=True)
+
+    def to_dict(self) -> dict:
+        """Returns the job as a dict, in the format of the jobs api"""
+        return {column.name: getattr(self, column.name)
+                for column in self.__table__.columns}
+
+    def __repr__(self):
+        return f"<AddMovieJob(id = {self.id}, status = {self.status})>"
@@ -0,0 +1,27 @@
+from flask import request
+from config import API_MAX_PAGE_SIZE
+
+
+def get_page_args(default_limit, max_limit=API_MAX_PAGE_SIZE):
+    """Reads keyset pagination "limit" and "after_id" query parameters,
+    the limit is clamped between 1 and max_limit"""
+    limit = request.args.get("limit", default_limit, type=int)
+    after_id = request.args.get("after_id", None, type=int)
+    return max(1, min(limit, max_limit)), after_id
+
+
+def get_next_after_id(page, limit):
+    """Returns the cursor of the next page, or None if page is the last one"""
+    if len(page) < limit:
+        return None
+    return page[-1].id
+
+
+def get_offset_page_args(default_limit, max_limit=API_MAX_PAGE_SIZE):
+    """Reads offset pagination "limit" and "page" query parameters,
+    for results which are not ordered by id, returns (limit, page, offset),
+    pages are numbered from 1"""
+    limit = request.args.get("limit", default_limit, type=int)
+    limit = max(1, min(limit, max_limit))
+    page = max(1, request.args.get("page", 1, type=int))
+    return limit, page, (page - 1) * limit
@@ -0,0 +1,133 @@
+import threading
+from collections import OrderedDict
+from flask import render_template, current_app
+from flask_login import current_user
+from markupsafe import Markup
+from werkzeug.local import LocalProxy
+from my_app import dm
+from config import RENDER_CACHE_MAX_ENTRIES
+
+
+class LRUCacheBackend:
+    """Bounded in-process least recently used cache backend.
+    Other backends (like a shared cache server client) need the same
+    get, set and clear methods."""
+    def __init__(self, max_entries=RENDER_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value of key, or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        """Stores value, evicting the least recently used entries
+        above max_entries"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes all cached values"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RenderCache:
+    """Cache of rendered pages and template fragments.
+    Keys must include the change versions of the data rendered,
+    so a write makes the old entries unreachable instead of stale."""
+    def __init__(self, backend=None):
+        self.backend = backend or LRUCacheBackend()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        """Returns the cached value of key, or calls render,
+        caches and returns its value"""
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = render()
+        self.backend.set(key, value)
+        return value
+
+    def stats(self) -> dict:
+        """Returns cache counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self.backend)
+        }
+
+
+# The render cache of the current app
+render_cache = LocalProxy(lambda: current_app.extensions["render_cache"])
+
+
+def cached_render(render, *key_parts):
+    """Returns the cached result of render for key_parts,
+    which must include the change versions of the rendered data.
+    Versions are stored in the database, so keys are the same
+    in every process and a shared backend can serve them all."""
+    return render_cache.get_or_render(key_parts, render)
+
+
+def render_fragment(template_name, **context):
+    """Renders a template fragment, to be inserted in a page"""
+    return Markup(render_template(template_name, **context))
+
+
+def is_owner(user):
+    """True if user is the logged-in user"""
+    return bool(user) and current_user.is_authenticated \
+        and current_user.id == user.id
+
+
+def render_movie_box(movie, review=None, user=None, stats=None):
+    """Template global rendering the movie box of a grid, cached per movie
+    (its version changes with its stats), review, and whether
+    the logged-in user owns the grid"""
+    review = review or None
+    user = user or None
+    owner = is_owner(user)
+    if review or owner:
+        user_version = dm.change_versions.get(f"user:{user.id}")
+    else:
+        user_version = None
+    return cached_render(
+        lambda: render_fragment("comp/movie_box.html", movie=movie,
+                                review=review, user=user, stats=stats),
+        "movie_box", movie.id, dm.change_versions.get(f"movie:{movie.id}"),
+        review.id if review else None, owner, user_version)
+
+
+def render_user_movies_grid(dm, user):
+    """Renders the favorite movies grid of user, cached per user,
+    whether the logged-in user is its owner and the movies stats"""
+    def render_grid():
+        user_movies = dm.get_user_movie_records(user.id)
+        movie_stats = dm.get_movies_stats(
+            movie.id for _, movie, __ in user_movies)
+        return render_fragment("comp/movies_grid.html", user=user,
+                               user_movies=user_movies,
+                               movie_stats=movie_stats)
+
+    return cached_render(render_grid, "user_movies_grid", user.id,
+                         is_owner(user),
+                         *dm.change_versions.get_many(f"user:{user.id}",
+                                                      "movie_stats"))
@@ -1,21 +1,33 @@
-from flask import Blueprint, request, render_template, redirect, url_for, flash
+from flask import Blueprint, request, render_template, redirect, url_for, \
+    flash, current_app
 from flask_login import login_required, current_user
-from my_app import db
-from data_manager.dm_sqlite import SqliteDataManager, Movie
+from my_app.jobs import add_movie_jobs
+from my_app.render_cache import render_user_movies_grid
+from data_manager.dm_sqlite import Movie
+from my_app import dm
+from config import ADD_MOVIE_ASYNC
 
 user_bp = Blueprint('user', __name__)
-dm = SqliteDataManager(db.session)
 
 
 @user_bp.route('/add_movie', methods=['GET', 'POST'])
 @login_required
 def add_movie():
     """Add movie to user's favorite movies list, and handles any errors.
-    If movie is not in database fetches from omdb api"""
+    If movie is not in database fetches from omdb api,
+    in async mode the lookup is queued as a background job"""
     if request.method == "POST":
         user_id = current_user.id
+        if ADD_MOVIE_ASYNC:
+            add_movie_jobs.submit(current_app._get_current_object(),
+                                  user_id, request.form)
+            flash(f"Looking up {request.form.get('title')}, it will be "
+                  f"added to your movies shortly", "info")
+            return redirect(url_for("user.profile"))
         try:
-            dm.add_user_movie(user_id, request.form)
+            movie = dm.add_user_movie(user_id, request.form)
+            flash(f"New movie {movie.name} successfully added to user",
+                  "success")
             return redirect(url_for("user.profile"))
 
         except ValueError as error:
@@ -29,9 +41,10 @@ def add_movie():
 @login_required
 def profile():
     """Current logged-in user profile page"""
-    user_movies = dm.get_user_movies(user_id=current_user.id)
-    user = dm.get_entry_by_id(current_user.id)
-    return render_template("user/profile.html", user_movies=user_movies, user=user)
+    user = current_user._get_current_object()
+    movies_grid = render_user_movies_grid(dm, user)
+    return render_template("user/profile.html", movies_grid=movies_grid,
+                           user=user)
 
 
 @user_bp.route('/add_review/<int:movie_id>', methods=['GET', 'POST'])
@@ -41,7 +54,10 @@ def add_review(movie_id):
     POST: Adds user review to the specified movie"""
     if request.method == "POST":
         user_id = current_user.id
-        dm.add_movie_review(user_id, movie_id, request.form)
+        review, created = dm.add_movie_review(user_id, movie_id,
+                                              request.form)
+        operation = "added" if created else "updated"
+        flash(f"Successfully {operation} {review}", "success")
         return redirect(url_for("user.review_page", movie_id=movie_id))
     movie = dm.get_entry_by_id(movie_id, db_model=Movie)
     return render_template("user/add_review.html", movie=movie)
@@ -64,6 +80,7 @@ def delete_movie(movie_id):
     by deleting it from users_movies database"""
     user_id = current_user.id
     dm.delete_user_movie(user_id, movie_id)
+    flash("User favorite movie successfully deleted", "success")
     return redirect(url_for("user.profile"))
 
 
@@ -73,6 +90,7 @@ def delete_user():
     """Deletes the user from database"""
     user_id = current_user.id
     dm.delete_user(user_id)
+    flash("User successfully deleted", "success")
     return redirect(url_for("main.home"))
 
 
@@ -81,10 +99,11 @@ def delete_user():
 def update_user():
     """GET: Renders update user page
     POST: Updates user details"""
-    if request.method == "POST":
-        dm.update_user(current_user.id, request.form)
-    user = dm.get_entry_by_id(current_user.id, )
-    return render_template("user/update_user.html", user=user)
+    if request.method == "POST" and \
+            dm.update_user(current_user.id, request.form):
+        flash("Successfully updated user details", "success")
+    return render_template("user/update_user.html",
+                           user=current_user._get_current_object())
 
 
 @user_bp.route('/change_password', methods=['POST'])
@@ -96,6 +115,7 @@ def change_password():
     password = request.form.get("password")
     repeat_password = request.form.get("repeat_password")
     if dm.authenticate_password(current_user, input_password) and \
-            dm.passwords_match(password, repeat_password):
-        dm.update_user(current_user.id, request.form)
+            dm.passwords_match(password, repeat_password) and \
+            dm.update_user(current_user.id, request.form):
+        flash("Successfully updated user details", "success")
     return redirect(url_for("user.profile"))
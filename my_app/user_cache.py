@@ -0,0 +1,77 @@
+import time
+from flask import current_app
+from werkzeug.local import LocalProxy
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from my_app import dm
+from my_app.models.data_models import User
+from my_app.render_cache import LRUCacheBackend
+from config import USER_CACHE_TTL, USER_CACHE_MAX_ENTRIES
+
+
+class UserCache:
+    """Bounded cache of logged-in users column values, so loading
+    the user of a request does not query the database.
+    Entries expire after ttl seconds, and when the "user:<id>" change
+    version is bumped, which update_user and delete_user do."""
+    def __init__(self, ttl=USER_CACHE_TTL, max_entries=USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._backend = LRUCacheBackend(max_entries)
+
+    @staticmethod
+    def get_values(user) -> dict:
+        """Returns the column values of a user entry"""
+        return {column.key: getattr(user, column.key)
+                for column in User.__table__.columns}
+
+    @staticmethod
+    def attach(session, values) -> User:
+        """Returns a user entry of session built from cached values,
+        without querying the database"""
+        user = User.__mapper__.class_manager.new_instance()
+        for key, value in values.items():
+            set_committed_value(user, key, value)
+        make_transient_to_detached(user)
+        return session.merge(user, load=False)
+
+    def load(self, session, user_id, loader):
+        """Returns the user with user_id from cache,
+        otherwise loads it with loader(user_id) and caches it"""
+        user_id = int(user_id)
+        key = f"user:{user_id}"
+        # Read before loading, so a write committed meanwhile
+        # makes the stored entry stale
+        version = dm.change_versions.get(key)
+        entry = self._backend.get(key)
+        if entry is not None:
+            entry_version, stored_at, values = entry
+            if entry_version == version and \
+                    time.monotonic() - stored_at < self.ttl:
+                self.hits += 1
+                return self.attach(session, values)
+
+        self.misses += 1
+        user = loader(user_id)
+        if user is not None:
+            self._backend.set(key, (version, time.monotonic(),
+                                    self.get_values(user)))
+        return user
+
+    def clear(self) -> None:
+        """Removes all cached users"""
+        self._backend.clear()
+
+    def stats(self) -> dict:
+        """Returns cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+# The users cache of the current app
+user_cache = LocalProxy(lambda: current_app.extensions["user_cache"])
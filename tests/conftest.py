@@ -0,0 +1,70 @@
+import zlib
+import pytest
+import config
+from data_manager.passwords import password_hasher
+
+# Password hashing is not what these tests check
+TEST_BCRYPT_ROUNDS = 4
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Returns a function creating an app on a sqlite database in
+    a subfolder of the test folder, apps made with the same folder name
+    share the database like worker processes"""
+    monkeypatch.setattr(password_hasher, "max_workers", 0)
+    monkeypatch.setattr(password_hasher, "rounds", TEST_BCRYPT_ROUNDS)
+    from my_app import create_app, db
+    apps = []
+
+    def make(folder_name="data"):
+        data_path = tmp_path / folder_name
+        data_path.mkdir(exist_ok=True)
+        monkeypatch.setattr(config, "DATA_FILES_PATH", str(data_path))
+        apps.append(create_app({"TESTING": True}))
+        return apps[-1]
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    """An app on a new empty sqlite database"""
+    return make_app()
+
+
+@pytest.fixture
+def sqlite_dm(app):
+    """The sqlite data manager of the app, in an app context"""
+    from my_app import db, get_data_manager
+    with app.app_context():
+        yield get_data_manager()
+        db.session.remove()
+
+
+@pytest.fixture
+def json_dm(tmp_path):
+    """A json data manager on a new data file"""
+    from data_manager.dm_json import JSONDataManager
+    return JSONDataManager(str(tmp_path / "data.json"))
+
+
+def make_movie_data(name, imdb_id, year="2001") -> dict:
+    """Returns movie data in the format of the OMDb api client"""
+    return {"name": name, "year": year, "director": "Test Director",
+            "imdbID": imdb_id, "rating": 7.5, "genre": "Drama",
+            "img": "N/A", "country": "France", "alpha_2": "FR"}
+
+
+def add_movies(app, *names) -> None:
+    """Stores movies in the database of app, as if fetched from the api"""
+    from my_app import get_data_manager
+    with app.app_context():
+        dm = get_data_manager()
+        dm.upsert_movies([
+            make_movie_data(name, f"tt{zlib.crc32(name.encode())}")
+            for name in names])
+        dm.save_data()
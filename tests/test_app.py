@@ -0,0 +1,61 @@
+from my_app import get_data_manager
+from tests.conftest import add_movies
+
+
+def test_apps_on_separate_databases(make_app):
+    first_app = make_app("first")
+    add_movies(first_app, "First Film", "Second Film")
+    first_page = first_app.test_client().get("/all_movies")
+    assert b"First Film" in first_page.data
+
+    second_app = make_app("second")
+    second_page = second_app.test_client().get("/all_movies")
+    assert second_page.status_code == 200
+    assert b"First Film" not in second_page.data
+    assert second_page.headers["ETag"] != first_page.headers["ETag"]
+
+    add_movies(second_app, "Third Film")
+    second_page = second_app.test_client().get("/all_movies")
+    assert b"Third Film" in second_page.data
+    assert b"First Film" not in second_page.data
+    # The first app still serves its own data
+    first_page = first_app.test_client().get("/all_movies")
+    assert b"First Film" in first_page.data
+    assert b"Third Film" not in first_page.data
+
+
+def test_apps_have_separate_state(make_app):
+    first_app, second_app = make_app("first"), make_app("second")
+    add_movies(first_app, "First Film")
+    # Versions are read at the start of requests
+    for app in (first_app, second_app):
+        app.test_client().get("/all_movies")
+    with first_app.app_context():
+        first_dm = get_data_manager()
+    with second_app.app_context():
+        second_dm = get_data_manager()
+    assert first_dm.change_versions.get("movies") > 0
+    assert second_dm.change_versions.get("movies") == 0
+    for name in ("render_cache", "user_cache", "add_movie_jobs"):
+        assert first_app.extensions[name] is not second_app.extensions[name]
+
+
+def test_recreated_database(app):
+    from my_app import db
+    client = app.test_client()
+    add_movies(app, "First Film")
+    add_movies(app, "Second Film")
+    first_page = client.get("/all_movies")
+    assert b"Second Film" in first_page.data
+
+    # Versions of the new database are lower than the ones read before
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    add_movies(app, "Other Film")
+    second_page = client.get("/all_movies")
+    assert b"Other Film" in second_page.data
+    assert b"Second Film" not in second_page.data
+    assert second_page.headers["ETag"] != first_page.headers["ETag"]
+    assert client.get("/all_movies", headers={
+        "If-None-Match": first_page.headers["ETag"]}).status_code == 200
@@ -0,0 +1,124 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from apis import circuit_breaker
+from apis.circuit_breaker import CircuitBreaker, CircuitOpenError
+from apis.omdb_api import MovieAPIConnection, create_api_session
+
+
+class Clock:
+    """Monotonic clock moved forward by the tests"""
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return clock
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_lets_one_trial_call(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 29
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_trial_success_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    # The failures are counted again from zero
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_trial_failure_opens_again(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+@pytest.fixture
+def failing_api():
+    """A local server answering every request with 503,
+    yields its url and the list of requested paths"""
+    requests_made = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):  # pylint: disable=invalid-name
+            requests_made.append(self.path)
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/", requests_made
+    server.shutdown()
+    server.server_close()
+
+
+def test_every_failed_attempt_counts(failing_api):
+    url, requests_made = failing_api
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+    connection = MovieAPIConnection(
+        base_url=url, breaker=breaker, session=create_api_session(
+            max_retries=2, backoff_factor=0, breaker=breaker))
+
+    # The first attempt and two retries are three failures
+    assert connection.get_movie_data("Test Film", None) == \
+        {"error": "Connection error"}
+    assert len(requests_made) == 3
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    # The circuit opens on the fifth failure, no retry is made after it
+    assert connection.get_movie_data("Test Film", None) == \
+        {"error": "Connection error"}
+    assert len(requests_made) == 5
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert connection.get_movie_data("Test Film", None) == \
+        {"error": "Movie service unavailable, try again later"}
+    assert len(requests_made) == 5
@@ -0,0 +1,113 @@
+"""Conformance tests of the data manager backends, every registered
+backend must give the same results for the same operations.
+The backends have different interfaces for the same data, the drivers
+of benchmarks.backends adapt them, the interface methods of each
+backend are tested in test_dm_sqlite and test_dm_json.
+Movies are looked up on the local OMDb stub server."""
+import itertools
+import pytest
+import config
+from apis import omdb_api
+from data_manager.passwords import password_hasher
+from data_manager.registry import get_backend_names
+from benchmarks.backends import BACKEND_DRIVERS
+from benchmarks.utils import use_stub_api
+
+_user_indexes = itertools.count()
+
+
+@pytest.fixture(scope="module")
+def stub_api(tmp_path_factory):
+    """Points the shared api connection at the OMDb stub server"""
+    shared_connection = omdb_api._shared_connection
+    server = use_stub_api(data_dir=str(tmp_path_factory.mktemp("api")))
+    yield
+    server.shutdown()
+    omdb_api._shared_connection = shared_connection
+
+
+@pytest.fixture(params=get_backend_names())
+def driver(request, stub_api, tmp_path, monkeypatch):
+    """A driver of each registered backend, on new data in tmp_path"""
+    # Restored after the test, the drivers change them
+    monkeypatch.setattr(config, "DATA_FILES_PATH", config.DATA_FILES_PATH)
+    monkeypatch.setattr(password_hasher, "max_workers",
+                        password_hasher.max_workers)
+    monkeypatch.setattr(password_hasher, "rounds", password_hasher.rounds)
+    driver = BACKEND_DRIVERS[request.param](data_dir=str(tmp_path))
+    yield driver
+    driver.close()
+
+
+def register(driver) -> int:
+    """Adds a user with a new index, returns its id"""
+    return driver.register(next(_user_indexes))
+
+
+def test_backends_have_drivers():
+    assert set(get_backend_names()) <= set(BACKEND_DRIVERS)
+
+
+def test_register_users(driver):
+    """Registered users are listed, with distinct ids"""
+    first_id, second_id = register(driver), register(driver)
+    assert first_id != second_id
+    assert {first_id, second_id} <= set(driver.list_users())
+
+
+def test_add_movie(driver):
+    """An added movie is listed in the user movies, without a review"""
+    user_id = register(driver)
+    movie_id = driver.add_movie(user_id, "Conformance Film")
+    assert driver.list_movies(user_id) == [
+        {"id": movie_id, "name": "Conformance Film", "rating": None}]
+
+
+def test_duplicate_movie(driver):
+    """Adding a movie the user already has raises ValueError"""
+    user_id = register(driver)
+    driver.add_movie(user_id, "Twice Film")
+    with pytest.raises(ValueError):
+        driver.add_movie(user_id, "Twice Film")
+
+
+def test_missing_movie(driver):
+    """Adding a movie the api doesn't find raises ValueError"""
+    user_id = register(driver)
+    with pytest.raises(ValueError):
+        driver.add_movie(user_id, "missing film")
+    assert driver.list_movies(user_id) == []
+
+
+def test_review(driver):
+    """A review rating is listed, a second review replaces it"""
+    user_id = register(driver)
+    movie_id = driver.add_movie(user_id, "Reviewed Film")
+    driver.review(user_id, movie_id, 7, "Good")
+    assert driver.list_movies(user_id)[0]["rating"] == 7
+    driver.review(user_id, movie_id, 9, "Better")
+    assert driver.list_movies(user_id)[0]["rating"] == 9
+
+
+def test_delete_movie(driver):
+    """A deleted movie is removed only from its user movies"""
+    user_id, other_user_id = register(driver), register(driver)
+    movie_id = driver.add_movie(user_id, "Shared Film")
+    kept_movie_id = driver.add_movie(user_id, "Kept Film")
+    driver.add_movie(other_user_id, "Shared Film")
+    driver.delete_movie(user_id, movie_id)
+    assert [movie["id"] for movie in driver.list_movies(user_id)] == \
+        [kept_movie_id]
+    assert [movie["name"] for movie in driver.list_movies(other_user_id)] \
+        == ["Shared Film"]
+
+
+def test_delete_user(driver):
+    """A deleted user is not listed, other users are kept"""
+    user_id, other_user_id = register(driver), register(driver)
+    driver.add_movie(user_id, "Deleted User Film")
+    driver.review(user_id, driver.list_movies(user_id)[0]["id"], 5, "Ok")
+    driver.delete_user(user_id)
+    user_ids = driver.list_users()
+    assert user_id not in user_ids
+    assert other_user_id in user_ids
@@ -0,0 +1,38 @@
+import pytest
+import pycountry
+from apis import country_codes
+from apis.country_codes import get_country_alpha_2
+
+
+@pytest.fixture
+def no_fuzzy_search(monkeypatch):
+    """Fails the test if a name is not found in the country index"""
+    def search_fuzzy(country_name):
+        raise AssertionError(f"{country_name} not in country index")
+
+    country_codes.search_country_alpha_2.cache_clear()
+    monkeypatch.setattr(pycountry.countries, "search_fuzzy", search_fuzzy)
+
+
+@pytest.mark.parametrize("country_name, alpha_2", [
+    ("Russia", "RU"),
+    ("Brunei", "BN"),
+    ("The Netherlands", "NL"),
+    ("Netherlands", "NL"),
+    ("UK", "GB"),
+    ("USA", "US"),
+    ("United States", "US"),
+    ("South Korea", "KR"),
+    ("Iran", "IR"),
+    ("Vietnam", "VN"),
+    ("West Germany", "DE"),
+    ("Soviet Union", "RU"),
+    ("The Bahamas", "BS"),
+    ("East Timor", "TL"),
+    ("UAE", "AE"),
+    ("Vatican City", "VA"),
+    ("Democratic Republic of Congo", "CD"),
+    (" côte d'ivoire ", "CI"),
+])
+def test_omdb_country_names(no_fuzzy_search, country_name, alpha_2):
+    assert get_country_alpha_2(country_name) == alpha_2
@@ -0,0 +1,117 @@
+import pytest
+from data_manager.dm_interface import DataManagerInterface
+from data_manager.dm_json import JSONDataManager
+
+
+def add_user(dm, name) -> int:
+    """Adds a user through the interface, returns its id"""
+    user_id = dm.get_new_id_for()
+    dm.add_user({"id": user_id, "name": name,
+                 "email": f"{name}@example.com",
+                 "hashed_password": "hash", "movies": []})
+    return user_id
+
+
+def add_movie(dm, user_id, name) -> int:
+    """Adds a movie to the user through the interface, returns its id"""
+    movie_id = dm.get_new_id_for(user_id)
+    dm.add_user_movie(user_id, {"id": movie_id, "name": name,
+                                "year": "2001", "imdbID": "tt0000001"})
+    return movie_id
+
+
+def test_is_data_manager(json_dm):
+    assert isinstance(json_dm, DataManagerInterface)
+
+
+def test_add_user(json_dm):
+    user_id = add_user(json_dm, "ann")
+    assert json_dm.get_all_users() == [
+        {"id": user_id, "name": "ann", "email": "ann@example.com",
+         "hashed_password": "hash", "movies": []}]
+
+
+def test_update_user(json_dm):
+    user_id = add_user(json_dm, "ann")
+    json_dm.update_user(user_id, {"name": "Ann B"})
+    assert json_dm.get_user_by_key(user_id)["name"] == "Ann B"
+
+
+def test_delete_user(json_dm):
+    user_id = add_user(json_dm, "ann")
+    other_id = add_user(json_dm, "bob")
+    json_dm.delete_user(user_id)
+    assert [user["id"] for user in json_dm.get_all_users()] == [other_id]
+    # Ids of deleted users are not given again
+    assert add_user(json_dm, "cid") not in (user_id, other_id)
+
+
+def test_add_user_movie(json_dm):
+    user_id = add_user(json_dm, "ann")
+    movie_id = add_movie(json_dm, user_id, "Test Film")
+    assert json_dm.get_user_movies(user_id) == [
+        {"id": movie_id, "name": "Test Film", "year": "2001",
+         "imdbID": "tt0000001"}]
+
+
+def test_add_user_movie_rejects_favorite(json_dm):
+    user_id = add_user(json_dm, "ann")
+    add_movie(json_dm, user_id, "Test Film")
+    with pytest.raises(ValueError):
+        add_movie(json_dm, user_id, "Test Film")
+    assert len(json_dm.get_user_movies(user_id)) == 1
+    with pytest.raises(ValueError):
+        add_movie(json_dm, user_id, "test  FILM")
+
+
+def test_movie_names_follow_changes(json_dm):
+    user_id = add_user(json_dm, "ann")
+    movie_id = add_movie(json_dm, user_id, "Test Film")
+    json_dm.update_user_movie(user_id, movie_id, {"name": "Other Film"})
+    add_movie(json_dm, user_id, "Test Film")
+    with pytest.raises(ValueError):
+        add_movie(json_dm, user_id, "Other Film")
+    json_dm.delete_user_movie(user_id, movie_id)
+    add_movie(json_dm, user_id, "Other Film")
+    # Names are indexed again from the files
+    reloaded = JSONDataManager(json_dm.filename)
+    with pytest.raises(ValueError):
+        add_movie(reloaded, user_id, "other film")
+
+
+def test_update_user_movie(json_dm):
+    user_id = add_user(json_dm, "ann")
+    movie_id = add_movie(json_dm, user_id, "Test Film")
+    json_dm.update_user_movie(user_id, movie_id,
+                              {"review_rating": 8.0, "note": "Good"})
+    assert json_dm.get_user_single_movie(user_id, movie_id)["note"] == "Good"
+    # An empty note removes it
+    json_dm.update_user_movie(user_id, movie_id,
+                              {"review_rating": 6.0, "note": ""})
+    movie = json_dm.get_user_single_movie(user_id, movie_id)
+    assert movie["review_rating"] == 6.0
+    assert "note" not in movie
+
+
+def test_delete_user_movie(json_dm):
+    user_id = add_user(json_dm, "ann")
+    movie_id = add_movie(json_dm, user_id, "Test Film")
+    json_dm.delete_user_movie(user_id, movie_id)
+    assert json_dm.get_user_movies(user_id) == []
+    assert add_movie(json_dm, user_id, "Test Film") != movie_id
+
+
+def test_save_data(json_dm):
+    add_user(json_dm, "ann")
+    users = [{"id": 7, "name": "bob", "email": "bob@example.com",
+              "hashed_password": "hash", "movies": []}]
+    json_dm.save_data(users)
+    assert json_dm.get_all_users() == users
+
+
+def test_changes_are_saved(json_dm):
+    user_id = add_user(json_dm, "ann")
+    movie_id = add_movie(json_dm, user_id, "Test Film")
+    json_dm.update_user_movie(user_id, movie_id, {"note": "Good"})
+    reloaded = JSONDataManager(json_dm.filename)
+    assert reloaded.get_all_users() == json_dm.get_all_users()
@@ -0,0 +1,165 @@
+import pytest
+from data_manager.dm_interface import DataManagerInterface
+from data_manager.dm_sqlite import Movie
+from data_manager.movie_catalog import MovieRecord
+from my_app.models.data_models import User
+from tests.conftest import make_movie_data
+
+PASSWORD = "password"
+
+
+def add_user(dm, name):
+    """Adds a user through the interface, returns the user entry"""
+    return dm.add_user({"name": name, "email": f"{name}@example.com",
+                        "password": PASSWORD, "repeat_password": PASSWORD})
+
+
+def add_movie(dm, user_id, name, imdb_id):
+    """Stores a movie as if fetched from the api, then adds it
+    to the user favorites through the interface"""
+    dm.upsert_movies([make_movie_data(name, imdb_id)])
+    dm.save_data()
+    return dm.add_user_movie(user_id, {"title": name})
+
+
+def test_is_data_manager(sqlite_dm):
+    assert isinstance(sqlite_dm, DataManagerInterface)
+
+
+def test_add_user(sqlite_dm):
+    user = add_user(sqlite_dm, "ann")
+    assert user.id is not None
+    assert [entry.id for entry in sqlite_dm.get_all_users()] == [user.id]
+    assert sqlite_dm.authenticate_login(
+        {"email": "ann@example.com", "password": PASSWORD}) == user
+
+
+def test_add_user_rejects_mismatched_passwords(sqlite_dm):
+    with pytest.raises(ValueError):
+        sqlite_dm.add_user({"name": "ann", "email": "ann@example.com",
+                            "password": PASSWORD, "repeat_password": "other"})
+    assert sqlite_dm.get_all_users() == []
+
+
+def test_add_user_rejects_existing_email(sqlite_dm):
+    add_user(sqlite_dm, "ann")
+    with pytest.raises(ValueError):
+        add_user(sqlite_dm, "ann")
+    assert len(sqlite_dm.get_all_users()) == 1
+
+
+def test_update_user(sqlite_dm):
+    user = add_user(sqlite_dm, "ann")
+    assert sqlite_dm.update_user(user.id, {"user_name": "Ann B"})
+    assert sqlite_dm.get_entry_by_id(user.id).name == "Ann B"
+    assert not sqlite_dm.update_user(user.id, {})
+
+
+def test_delete_user(sqlite_dm):
+    user = add_user(sqlite_dm, "ann")
+    other = add_user(sqlite_dm, "bob")
+    movie = add_movie(sqlite_dm, user.id, "Test Film", "tt0000001")
+    sqlite_dm.update_user_movie(user.id, movie.id, {
+        "review_rating": 8, "review_text": "Good", "short_note": ""})
+    sqlite_dm.delete_user(user.id)
+    assert [entry.id for entry in sqlite_dm.get_all_users()] == [other.id]
+    assert sqlite_dm.get_user_movies(user.id) == []
+    stats = sqlite_dm.get_movie_stats(movie.id)
+    assert (stats.favorites_count, stats.reviews_count) == (0, 0)
+
+
+def test_add_user_movie(sqlite_dm):
+    user = add_user(sqlite_dm, "ann")
+    movie = add_movie(sqlite_dm, user.id, "Test Film", "tt0000001")
+    [(user_movie, movie_entry, review)] = sqlite_dm.get_user_movies(user.id)
+    assert (user_movie.movie_id, movie_entry.name, review) == \
+        (movie.id, "Test Film", None)
+    assert sqlite_dm.get_movie_stats(movie.id).favorites_count == 1
+
+
+def test_add_user_movie_rejects_favorite(sqlite_dm):
+    user = add_user(sqlite_dm, "ann")
+    add_movie(sqlite_dm, user.id, "Test Film", "tt0000001")
+    with pytest.raises(ValueError):
+        sqlite_dm.add_user_movie(user.id, {"title": "test  film"})
+    assert len(sqlite_dm.get_user_movies(user.id)) == 1
+
+
+def test_add_user_movie_from_api(sqlite_dm, monkeypatch):
+    class Connection:
+        @staticmethod
+        def get_movie_data(title, year):
+            return make_movie_data("Api Film", "tt0000002")
+
+    monkeypatch.setattr("apis.omdb_api.get_movie_api_connection",
+                        lambda: Connection)
+    user = add_user(sqlite_dm, "ann")
+    other = add_user(sqlite_dm, "bob")
+    movie = sqlite_dm.add_user_movie(user.id, {"title": "api film"})
+    assert movie.imdb_id == "tt0000002"
+    # The second lookup of the movie is answered by the movie catalog
+    assert sqlite_dm.movie_catalog.get_by_imdb_id("tt0000002").id == movie.id
+    other_movie = sqlite_dm.add_user_movie(other.id, {"title": "Api  Film!"})
+    assert isinstance(other_movie, MovieRecord)
+    assert other_movie.id == movie.id
+    assert len(sqlite_dm.get_all_entries_db(Movie)) == 1
+    assert sqlite_dm.get_movie_stats(movie.id).favorites_count == 2
+
+
+def test_bulk_add_user_movies_reports_failed_items(sqlite_dm, monkeypatch):
+    class Connection:
+        @staticmethod
+        def get_movie_data(title, year):
+            if title == "Broken Film":
+                raise ValueError("invalid literal for int(): 'N/A'")
+            if title == "Missing Film":
+                return {"error": "Movie not found!"}
+            return make_movie_data(title, f"tt{len(title):07}")
+
+    monkeypatch.setattr("apis.omdb_api.get_movie_api_connection",
+                        lambda: Connection)
+    user = add_user(sqlite_dm, "ann")
+    add_movie(sqlite_dm, user.id, "Test Film", "tt0000001")
+    report = sqlite_dm.bulk_add_user_movies(user.id, [
+        ("Test Film", None), ("Broken Film", None), ("Api Film", None),
+        ("Missing Film", None)])
+    assert (report["added"], report["already_favorite"],
+            report["failed"]) == (1, 1, 2)
+    assert report["errors"] == [
+        {"title": "Broken Film", "error": "Movie lookup failed"},
+        {"title": "Missing Film", "error": "Movie not found!"}]
+    assert {movie.name for _, movie, __ in
+            sqlite_dm.get_user_movies(user.id)} == {"Test Film", "Api Film"}
+
+
+def test_update_user_movie(sqlite_dm):
+    user = add_user(sqlite_dm, "ann")
+    movie = add_movie(sqlite_dm, user.id, "Test Film", "tt0000001")
+    sqlite_dm.update_user_movie(user.id, movie.id, {
+        "review_rating": 8, "review_text": "Good", "short_note": "seen"})
+    sqlite_dm.update_user_movie(user.id, movie.id, {
+        "review_rating": 6, "review_text": "Fine", "short_note": ""})
+    [(_, __, review)] = sqlite_dm.get_user_movies(user.id)
+    assert (review.rating, review.text, review.short_note) == \
+        (6, "Fine", "seen")
+    stats = sqlite_dm.get_movie_stats(movie.id)
+    assert (stats.reviews_count, stats.rating_avg) == (1, 6)
+
+
+def test_delete_user_movie(sqlite_dm):
+    user = add_user(sqlite_dm, "ann")
+    movie = add_movie(sqlite_dm, user.id, "Test Film", "tt0000001")
+    sqlite_dm.update_user_movie(user.id, movie.id, {
+        "review_rating": 8, "review_text": "Good", "short_note": ""})
+    sqlite_dm.delete_user_movie(user.id, movie.id)
+    assert sqlite_dm.get_user_movies(user.id) == []
+    assert sqlite_dm.get_entry_by_id(movie.id, db_model=Movie) is not None
+    stats = sqlite_dm.get_movie_stats(movie.id)
+    assert (stats.favorites_count, stats.reviews_count) == (0, 0)
+
+
+def test_save_data(sqlite_dm):
+    sqlite_dm.save_data(User(email="ann@example.com", password=PASSWORD,
+                             name="ann"))
+    sqlite_dm.db_session.rollback()
+    assert [user.name for user in sqlite_dm.get_all_users()] == ["ann"]
@@ -0,0 +1,54 @@
+import hashlib
+import io
+import os
+import pytest
+from PIL import Image
+from config import DEFAULT_AVATAR_IMAGE, IMAGE_CACHE_MAX_AGE
+from my_app.image_cache import ImageCache
+from my_app.images import routes
+from my_app.models.data_models import User
+
+
+@pytest.fixture
+def image_cache(tmp_path, monkeypatch):
+    """An offline image cache in tmp_path, used by the image routes"""
+    image_cache = ImageCache(str(tmp_path / "images"), offline=True)
+    monkeypatch.setattr(routes, "get_image_cache", lambda: image_cache)
+    return image_cache
+
+
+def test_default_avatar_url_is_versioned(app, image_cache):
+    with open(os.path.join(app.static_folder, DEFAULT_AVATAR_IMAGE),
+              "rb") as avatar_file:
+        version = hashlib.sha1(avatar_file.read()).hexdigest()[:10]
+    user = User(email="ann@example.com", password="password", name="ann")
+    with app.test_request_context():
+        url = routes.avatar_url(user)
+    assert url.endswith(f"?v={version}")
+
+    response = app.test_client().get(url)
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == IMAGE_CACHE_MAX_AGE
+    # Cached under its version, a new avatar file is a new entry
+    assert image_cache.lookup(f"{DEFAULT_AVATAR_IMAGE}?v={version}",
+                              "full") is not None
+
+
+def make_png(size) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", size).save(output, format="PNG")
+    return output.getvalue()
+
+
+def test_resize(image_cache):
+    resized, mimetype = image_cache.resize(make_png((200, 100)), (50, 50))
+    assert mimetype == "image/webp"
+    assert Image.open(io.BytesIO(resized)).size == (50, 25)
+    assert image_cache.resize(make_png((20, 10)), (50, 50)) is None
+    assert image_cache.resize(b"not an image", (50, 50)) is None
+
+
+def test_resize_rejects_decompression_bombs(image_cache, monkeypatch):
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    assert image_cache.resize(make_png((200, 100)), (50, 50)) is None
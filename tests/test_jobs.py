@@ -0,0 +1,72 @@
+import time
+import pytest
+from my_app import get_data_manager
+from my_app.jobs import DONE, FAILED
+from tests.conftest import make_movie_data
+
+
+class Connection:
+    @staticmethod
+    def get_movie_data(title, year):
+        if title == "Missing Film":
+            return {"error": "Movie not found!"}
+        return make_movie_data(title, f"tt{len(title):07}")
+
+
+@pytest.fixture
+def workers(make_app, monkeypatch):
+    """Two apps on the same database, like two worker processes,
+    and a user"""
+    monkeypatch.setattr("apis.omdb_api.get_movie_api_connection",
+                        lambda: Connection)
+    first_app, second_app = make_app(), make_app()
+    with first_app.app_context():
+        user = get_data_manager().add_user({
+            "name": "ann", "email": "ann@example.com",
+            "password": "password", "repeat_password": "password"})
+        return first_app, second_app, user.id
+
+
+def add_movie_async(app, user_id, title) -> dict:
+    """Queues adding the movie with the api, returns the job"""
+    response = app.test_client().post(
+        f"/api/user/{user_id}/add_movie?async=true", json={"title": title})
+    assert response.status_code == 202
+    return response.get_json()
+
+
+def wait_for_job(app, job_id, timeout=5) -> dict:
+    """Polls the job from app until it is finished, returns it"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = app.test_client().get(f"/api/jobs/{job_id}").get_json()
+        if job["status"] in (DONE, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} didn't finish")
+
+
+def test_job_is_reported_by_any_worker(workers):
+    first_app, second_app, user_id = workers
+    job = add_movie_async(first_app, user_id, "Test Film")
+    assert second_app.test_client().get(f"/api/jobs/{job['id']}")\
+        .status_code == 200
+    job = wait_for_job(second_app, job["id"])
+    assert (job["status"], job["movie"]["name"]) == (DONE, "Test Film")
+
+    job = add_movie_async(second_app, user_id, "Missing Film")
+    job = wait_for_job(first_app, job["id"])
+    assert (job["status"], job["error"]) == (FAILED, "Movie not found!")
+
+
+def test_finished_jobs_are_deleted_oldest_first(workers, monkeypatch):
+    first_app, second_app, user_id = workers
+    monkeypatch.setattr(first_app.extensions["add_movie_jobs"],
+                        "max_finished", 2)
+    job_ids = []
+    for title in ("First Film", "Second Film", "Third Film"):
+        job_ids.append(add_movie_async(first_app, user_id, title)["id"])
+        wait_for_job(first_app, job_ids[-1])
+    client = second_app.test_client()
+    assert [client.get(f"/api/jobs/{job_id}").status_code
+            for job_id in job_ids] == [404, 200, 200]
@@ -0,0 +1,163 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from data_manager.dm_sqlite import SqliteDataManager
+from data_manager.migrations import migrate, MIGRATIONS
+from my_app import db
+from my_app.models import data_models  # noqa: F401, registers the tables
+from tests.conftest import make_movie_data
+
+# Tables of the first release, before any migration
+VERSION_0_SCHEMA = """
+CREATE TABLE movies (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR NOT NULL,
+    release_year VARCHAR(4) NOT NULL, director VARCHAR NOT NULL,
+    imdb_id VARCHAR, imdb_rating FLOAT, genre VARCHAR, img VARCHAR,
+    country VARCHAR, country_alpha_2 VARCHAR(2));
+CREATE TABLE users (
+    id INTEGER NOT NULL PRIMARY KEY, email VARCHAR NOT NULL UNIQUE,
+    password VARCHAR NOT NULL, name VARCHAR NOT NULL, profile_img VARCHAR);
+CREATE TABLE reviews (
+    id INTEGER NOT NULL PRIMARY KEY, text VARCHAR, rating FLOAT NOT NULL,
+    short_note VARCHAR(60));
+CREATE TABLE users_movies (
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    movie_id INTEGER NOT NULL REFERENCES movies (id),
+    review_id INTEGER REFERENCES reviews (id),
+    PRIMARY KEY (user_id, movie_id));
+"""
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """An engine on a new database with the version 0 schema"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'data.sqlite'}")
+    raw_connection = engine.raw_connection()
+    raw_connection.executescript(VERSION_0_SCHEMA)
+    raw_connection.close()
+    yield engine
+    engine.dispose()
+
+
+def seed(engine, movies, favorites=(), reviews=()):
+    """Inserts users 1 to 3, movies as (id, name, imdb id),
+    favorites as (user id, movie id, review id)
+    and reviews as (id, text, rating)"""
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, email, password, name) "
+            "VALUES (:id, :email, 'x', :name)"),
+            [{"id": user_id, "email": f"user{user_id}@example.com",
+              "name": f"User {user_id}"} for user_id in (1, 2, 3)])
+        connection.execute(text(
+            "INSERT INTO movies (id, name, release_year, director, imdb_id) "
+            "VALUES (:id, :name, '2000', 'Director', :imdb_id)"),
+            [{"id": movie_id, "name": name, "imdb_id": imdb_id}
+             for movie_id, name, imdb_id in movies])
+        if reviews:
+            connection.execute(text(
+                "INSERT INTO reviews (id, text, rating) "
+                "VALUES (:id, :text, :rating)"),
+                [{"id": review_id, "text": review_text, "rating": rating}
+                 for review_id, review_text, rating in reviews])
+        if favorites:
+            connection.execute(text(
+                "INSERT INTO users_movies (user_id, movie_id, review_id) "
+                "VALUES (:user_id, :movie_id, :review_id)"),
+                [{"user_id": user_id, "movie_id": movie_id,
+                  "review_id": review_id}
+                 for user_id, movie_id, review_id in favorites])
+
+
+def fetch(engine, statement) -> list:
+    with engine.connect() as connection:
+        return connection.execute(text(statement)).fetchall()
+
+
+def test_migrate_empty_database(engine):
+    assert migrate(engine, db.metadata) == MIGRATIONS[-1][0]
+    assert fetch(engine, "PRAGMA user_version") == [(MIGRATIONS[-1][0],)]
+    # Applied migrations are not run again
+    assert migrate(engine, db.metadata) == MIGRATIONS[-1][0]
+
+
+def test_merges_movies_with_same_name_and_imdb_id(engine):
+    seed(engine,
+         movies=[(1, "Dune", "tt1"), (2, "dune ", "tt1"),
+                 (3, "DUNE", "tt1")],
+         reviews=[(1, "kept", 7), (2, "conflicting", 3), (3, "moved", 9)],
+         favorites=[
+             # Both favorites reviewed, the kept review wins
+             (1, 1, 1), (1, 2, 2),
+             # Only the duplicate reviewed, its review is moved
+             (2, 1, None), (2, 3, 3),
+             # Only the duplicate is a favorite, it is moved
+             (3, 2, None)])
+    migrate(engine, db.metadata)
+
+    assert fetch(engine, "SELECT id, name_key FROM movies") == [(1, "dune")]
+    assert fetch(engine, "SELECT user_id, movie_id, review_id "
+                         "FROM users_movies ORDER BY user_id") == \
+        [(1, 1, 1), (2, 1, 3), (3, 1, None)]
+    assert fetch(engine, "SELECT id, text FROM reviews ORDER BY id") == \
+        [(1, "kept"), (3, "moved")]
+    assert fetch(engine, "SELECT movie_id, favorites_count, reviews_count "
+                         "FROM movie_stats") == [(1, 3, 2)]
+
+
+def test_keeps_remakes(engine):
+    seed(engine,
+         movies=[(1, "Dune", "tt1"), (2, "Dune", "tt2"),
+                 (3, "Dune", None)],
+         reviews=[(1, "original", 7), (2, "remake", 9)],
+         favorites=[(1, 1, 1), (1, 2, 2), (2, 3, None)])
+    migrate(engine, db.metadata)
+
+    # Name lookups find the oldest movie
+    assert fetch(engine, "SELECT id, name_key FROM movies ORDER BY id") == \
+        [(1, "dune"), (2, None), (3, None)]
+    assert fetch(engine, "SELECT user_id, movie_id, review_id "
+                         "FROM users_movies ORDER BY user_id, movie_id") == \
+        [(1, 1, 1), (1, 2, 2), (2, 3, None)]
+    assert len(fetch(engine, "SELECT id FROM reviews")) == 2
+
+
+def test_merges_movies_with_same_imdb_id(engine):
+    seed(engine,
+         movies=[(1, "Dune", "tt1"), (2, "Dune: Part One", "tt1"),
+                 (3, "Arrival", "tt2"), (4, "Arrival (2016)", "tt2"),
+                 (5, "Untitled", None), (6, "Untitled Film", None)],
+         reviews=[(1, "kept", 7), (2, "conflicting", 3)],
+         favorites=[(1, 1, 1), (1, 2, 2), (2, 4, None), (3, 6, None)])
+    migrate(engine, db.metadata)
+
+    # Movies without imdb id are not merged
+    assert fetch(engine, "SELECT id, imdb_id FROM movies ORDER BY id") == \
+        [(1, "tt1"), (3, "tt2"), (5, None), (6, None)]
+    assert fetch(engine, "SELECT user_id, movie_id, review_id "
+                         "FROM users_movies ORDER BY user_id") == \
+        [(1, 1, 1), (2, 3, None), (3, 6, None)]
+    assert fetch(engine, "SELECT id FROM reviews") == [(1,)]
+    with pytest.raises(IntegrityError), engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO movies (name, release_year, director, imdb_id) "
+            "VALUES ('Dune 2', '2000', 'Director', 'tt1')"))
+
+
+def test_upsert_on_migrated_database(engine):
+    seed(engine, movies=[(1, "Dune", "tt1"), (2, "Dune: Part One", "tt1")])
+    migrate(engine, db.metadata)
+
+    with Session(engine) as session:
+        dm = SqliteDataManager(session)
+        # Known imdb id under another name, and known name
+        assert dm.upsert_movies([make_movie_data("Dune (1984)", "tt1"),
+                                 make_movie_data("DUNE", "tt9")]) == 0
+        movie, inserted = dm.upsert_movie(make_movie_data("Dune II", "tt1"))
+        assert (movie.id, inserted) == (1, False)
+        movie, inserted = dm.upsert_movie(make_movie_data("Arrival", "tt2"))
+        assert (movie.id, inserted) == (2, True)
+        session.commit()
+    assert fetch(engine, "SELECT id, imdb_id FROM movies ORDER BY id") == \
+        [(1, "tt1"), (2, "tt2")]
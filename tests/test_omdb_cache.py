@@ -0,0 +1,66 @@
+import sqlite3
+from apis.omdb_cache import OmdbResponseCache
+
+MOVIE = {"name": "Test Film", "year": "2001"}
+
+
+def make_cache(tmp_path, **options):
+    return OmdbResponseCache(str(tmp_path / "omdb_cache.sqlite"), **options)
+
+
+def get_accessed_at(cache, title):
+    return cache._connection.execute(
+        "SELECT accessed_at FROM omdb_cache WHERE title_key = ?",
+        (title,)).fetchone()[0]
+
+
+def test_get_and_set(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get("Test Film", 2001) is None
+    cache.set("Test Film", 2001, MOVIE)
+    assert cache.get("test  film", "2001") == MOVIE
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_hit_updates_access_time_once_per_interval(tmp_path):
+    cache = make_cache(tmp_path, access_interval=60)
+    cache.set("a", None, MOVIE)
+    cache._connection.execute("UPDATE omdb_cache SET accessed_at = 100")
+    cache.get("a", None)
+    accessed_at = get_accessed_at(cache, "a")
+    assert accessed_at > 100
+    cache.get("a", None)
+    assert get_accessed_at(cache, "a") == accessed_at
+
+
+def test_evicts_least_recently_used_when_over_capacity(tmp_path):
+    cache = make_cache(tmp_path, max_entries=10)
+    for index in range(10):
+        cache.set(f"movie {index}", None, MOVIE)
+        cache._connection.execute(
+            "UPDATE omdb_cache SET accessed_at = ? WHERE title_key = ?",
+            (index, f"movie {index}"))
+    assert cache.evictions == 0
+    cache.set("movie 10", None, MOVIE)
+    assert cache.stats()["size"] == 9
+    assert cache.get("movie 0", None) is None
+    assert cache.get("movie 10", None) == MOVIE
+    # Room was made for the next entries
+    cache.set("movie 11", None, MOVIE)
+    assert cache.evictions == 2
+
+
+def test_database_errors_are_misses(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("a", None, MOVIE)
+    locker = sqlite3.connect(str(tmp_path / "omdb_cache.sqlite"))
+    locker.execute("BEGIN EXCLUSIVE")
+    cache._connection.execute("PRAGMA busy_timeout = 0")
+    try:
+        assert cache.get("a", None) is None
+        cache.set("b", None, MOVIE)
+    finally:
+        locker.rollback()
+        locker.close()
+    assert cache.get("a", None) == MOVIE
+    assert cache.get("b", None) is None
@@ -0,0 +1,17 @@
+import pytest
+from data_manager.dm_interface import DataManagerInterface
+from data_manager.registry import create_data_manager, get_backend_names
+
+
+def test_backend_names():
+    assert set(get_backend_names()) == {"sqlite", "json"}
+
+
+def test_create_json_backend(tmp_path):
+    dm = create_data_manager("json", filename=str(tmp_path / "data.json"))
+    assert isinstance(dm, DataManagerInterface)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown"):
+        create_data_manager("nosuch")